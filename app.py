@@ -1,5 +1,6 @@
 import streamlit as st
 import os
+import time
 import asyncio
 from dotenv import load_dotenv
 import logging
@@ -19,8 +20,19 @@ from interior_design_generator import (
     reset_session_state,
     TEST_MODE,
     TEST_RESPONSES_DIR,
-    run_async_generate_content
+    TEXT_MODEL_NAME,
+    IMAGE_MODEL_NAME,
+    report_job,
+    report_from_job_result,
+    session_waiter
 )
+from job_runner import get_job_runner, request_key, JOB_POLL_INTERVAL, SUCCEEDED, CANCELLED
+from tracing import start_metrics_server
+from model_backends import start_model_prewarm
+from storage import start_garbage_collector, job_dir, validate_job_id
+from report_writer import REPORT_FILE_NAME, PARTIAL_REPORT_TAIL, is_complete_report
+from report_document import ImageRef
+from image_previews import preview_for
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -29,6 +41,79 @@ logger = logging.getLogger(__name__)
 # Load environment variables
 load_dotenv()
 
+def display_section_image(image: ImageRef, output_dir: str):
+    """Show the preview of one of a section's images if its file is still there; originals go in the ZIP."""
+    full_image_path = os.path.join(output_dir, image.filename)
+    if os.path.exists(full_image_path):
+        st.image(preview_for(full_image_path), caption=image.caption)
+
+def display_partial_report(job_id: str):
+    """
+    Offer the sections a running job has finished so far as one HTML file.
+
+    The file is only re-read when its size or mtime changes; the ZIP with the
+    images is built once the job is done.
+    """
+    html_path = os.path.join(job_dir(job_id), REPORT_FILE_NAME)
+    try:
+        html_stat = os.stat(html_path)
+    except FileNotFoundError:
+        return
+    fingerprint = (html_path, html_stat.st_size, html_stat.st_mtime_ns)
+    partial_report = st.session_state.get('partial_report')
+    if not partial_report or partial_report['fingerprint'] != fingerprint:
+        with open(html_path, "rb") as f:
+            html = f.read()
+        if not is_complete_report(html):
+            html += PARTIAL_REPORT_TAIL.encode("utf-8")
+        partial_report = {'fingerprint': fingerprint, 'data': html}
+        st.session_state.partial_report = partial_report
+    st.download_button(
+        label="Download Partial Report (HTML)",
+        data=partial_report['data'],
+        file_name="interior_design_report_partial.html",
+        mime="text/html"
+    )
+
+def forget_job():
+    """Stop following the session's report job."""
+    st.session_state.pop('job_id', None)
+    st.session_state.pop('partial_report', None)
+    if "job" in st.query_params:
+        del st.query_params["job"]
+
+def follow_report_job(job_id: str):
+    """Show a running report job's progress, or load its result once it has finished."""
+    try:
+        validate_job_id(job_id)
+    except ValueError as e:
+        logger.warning(f"Ignoring job from URL: {e}")
+        st.warning("This design could not be found. Please generate it again.")
+        forget_job()
+        return
+    job = get_job_runner().get(job_id, session_waiter())
+    if job is None or job.kind != "report":
+        st.warning("This design could not be found. Please generate it again.")
+        forget_job()
+    elif not job.finished:
+        st.progress(job.progress, text=job.message)
+        # The sections finished so far are already in the report on disk
+        display_partial_report(job_id)
+        time.sleep(JOB_POLL_INTERVAL)
+        st.rerun()
+    elif job.status == SUCCEEDED:
+        st.session_state.generated_content = report_from_job_result(job.result)
+        st.session_state.job_id = job_id
+        st.session_state.pop('partial_report', None)
+    elif job.status == CANCELLED:
+        st.warning("This design was cancelled. Please generate it again.")
+        forget_job()
+    else:
+        st.error(job.error)
+        if job.error_details and job.error_details.get('markdown_text'):
+            st.markdown(job.error_details['markdown_text'])
+        forget_job()
+
 def main():
     st.set_page_config(
         page_title="Interior Design Generator",
@@ -36,6 +121,10 @@ def main():
         layout="wide"
     )
 
+    start_metrics_server()
+    start_garbage_collector()
+    start_model_prewarm([TEXT_MODEL_NAME], [IMAGE_MODEL_NAME])
+
     st.title("Interior Design Generator")
     st.write("Generate beautiful interior design concepts with AI-powered text and images.")
 
@@ -58,6 +147,7 @@ def main():
         st.session_state.generated_content = {
             'html_path': None,
             'output_dir': None,
+            'sections': None,
             'markdown_content': None
         }
 
@@ -166,60 +256,52 @@ def main():
             'inspirational_photo_details': inspirational_photo_details
         }
 
-        with st.spinner("Generating your interior design concept..."):
-            run_async_generate_content(
-                room_type=room_type,
-                design_style=st.session_state.form_data['design_style'],
-                color_palette=color_palette,
-                key_elements=key_elements or "Not specified",
-                inspirational_photo_details=inspirational_photo_details or "None provided"
-            )
+        # Generate on a background worker; the id in the URL lets a refresh pick the report up again.
+        # An identical request already in flight (a double click, or another user) is joined instead.
+        runner = get_job_runner()
+        inputs = {
+            'room_type': room_type,
+            'design_style': st.session_state.form_data['design_style'],
+            'color_palette': color_palette,
+            'key_elements': key_elements or "Not specified",
+            'inspirational_photo_details': inspirational_photo_details or "None provided"
+        }
+        job_id = runner.submit("report", report_job, key=request_key("report", **inputs), waiter=session_waiter(), **inputs)
+        previous_job_id = st.session_state.get('job_id')
+        if previous_job_id and previous_job_id != job_id:
+            runner.release(previous_job_id, session_waiter())
+        st.session_state.job_id = job_id
+        st.query_params["job"] = job_id
+
+    # Follow this session's job, or the one in the URL after a refresh or reconnect
+    job_id = st.session_state.get('job_id') or st.query_params.get("job")
+    if job_id and st.session_state.generated_content.get('request_id') != job_id:
+        follow_report_job(job_id)
     
+    # The storage garbage collector may have removed an old report this session still points at
+    html_path = st.session_state.generated_content['html_path']
+    if html_path and not os.path.exists(html_path):
+        st.warning("This design report has expired and was removed. Please generate it again.")
+        reset_session_state()
+
     # Display content if it exists
     if st.session_state.generated_content['html_path'] and st.session_state.generated_content['output_dir']:
         # Create a container for the content
         content_container = st.container()
         
         with content_container:
-            # Split the content into sections
-            sections = st.session_state.generated_content['markdown_content'].split('\n\n')
-            
-            for section in sections:
-                # Check if the section contains an image
-                if '<div class="section-image">' in section:
-                    # Split the section into parts
-                    parts = section.split('<div class="section-image">')
-                    
-                    # Display the text before the image (section title)
-                    if parts[0].strip():
-                        st.markdown(parts[0].strip())
-                    
-                    # Extract and display the image
-                    img_start = parts[1].find('<img src="') + 10
-                    img_end = parts[1].find('"', img_start)
-                    img_path = parts[1][img_start:img_end]
-                    
-                    caption_start = parts[1].find('<div class="image-caption">') + 25
-                    caption_end = parts[1].find('</div>', caption_start)
-                    caption = parts[1][caption_start:caption_end]
-                    
-                    # Get the full path to the image
-                    full_image_path = os.path.join(
-                        st.session_state.generated_content['output_dir'],
-                        img_path
-                    )
-                    
-                    # Display the image if it exists
-                    if os.path.exists(full_image_path):
-                        st.image(full_image_path, caption=caption)
-                    
-                    # Display the remaining content after the image
-                    content_start = parts[1].find('</div>', caption_end) + 6
-                    if content_start < len(parts[1]):
-                        st.markdown(parts[1][content_start:].strip())
-                else:
-                    # If no image, just display the text
-                    st.markdown(section)
+            output_dir = st.session_state.generated_content['output_dir']
+            for section in st.session_state.generated_content.get('sections') or []:
+                st.markdown(f"## {section.title}")
+
+                # The lead image sits under the title, the other views follow the text
+                lead_images, more_images = section.images[:1], section.images[1:]
+                for image in lead_images:
+                    display_section_image(image, output_dir)
+                if section.body.strip():
+                    st.markdown(section.body)
+                for image in more_images:
+                    display_section_image(image, output_dir)
         
         # Display the download button
         display_html_report(
@@ -0,0 +1,230 @@
+"""
+Headless batch generation of interior design reports.
+
+Reads a JSONL file with one design request per line, for example:
+
+    {"id": "lr-01", "room_type": "Living Room", "design_style": ["Japandi"],
+     "color_palette": "Warm neutrals", "key_elements": "Low sofa"}
+
+and runs each through the generate_report pipeline with bounded concurrency,
+writing one output directory per request. Ids must be unique within a file;
+later lines reusing an id are skipped. Finished requests are recorded in a
+checkpoint file, so re-running the same command resumes where it stopped, and
+a request that is run again starts from an empty directory.
+
+Usage:
+    python batch_generate.py designs.jsonl --output-root batch_output --concurrency 2
+"""
+import os
+import re
+import sys
+import json
+import time
+import shutil
+import asyncio
+import hashlib
+import argparse
+import logging
+from typing import List, Dict, Any, Set
+
+from dotenv import load_dotenv
+
+from interior_design_generator import generate_report
+from tracing import start_metrics_server
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+REQUIRED_FIELDS = ('room_type', 'design_style', 'color_palette')
+
+
+def normalize_request(record: Dict[str, Any]) -> Dict[str, Any]:
+    """Map a JSONL record onto generate_report's arguments."""
+    design_style = record.get('design_style', '')
+    if isinstance(design_style, list):
+        design_style = ', '.join(design_style)
+    request = {
+        'room_type': record.get('room_type', ''),
+        'design_style': design_style,
+        # generate_images.py calls the same field "color_scheme"
+        'color_palette': record.get('color_palette') or record.get('color_scheme', ''),
+        'key_elements': record.get('key_elements') or "Not specified",
+        'inspirational_photo_details': record.get('inspirational_photo_details') or "None provided",
+    }
+    missing = [field for field in REQUIRED_FIELDS if not request[field]]
+    if missing:
+        raise ValueError(f"missing required fields: {', '.join(missing)}")
+    return request
+
+
+def request_id_for(record: Dict[str, Any], request: Dict[str, Any]) -> str:
+    """
+    Use the record's own id if it has one, otherwise a hash of its inputs.
+
+    Raises:
+        ValueError: If the id is made up only of dots, which would name the output root or its parent.
+    """
+    explicit_id = record.get('request_id') or record.get('id')
+    if explicit_id:
+        request_id = re.sub(r"[^A-Za-z0-9_.-]", "_", str(explicit_id))
+        if not request_id.strip('.'):
+            raise ValueError(f"invalid id {explicit_id!r}")
+        return request_id
+    canonical = json.dumps(request, sort_keys=True)
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()[:16]
+
+
+def load_requests(path: str) -> List[Dict[str, Any]]:
+    """Read and validate the JSONL input; invalid lines and repeated ids are logged and skipped."""
+    requests = []
+    first_lines: Dict[str, int] = {}
+    with open(path, 'r', encoding='utf-8') as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+                request = normalize_request(record)
+                request_id = request_id_for(record, request)
+            except (json.JSONDecodeError, ValueError) as e:
+                logger.error(f"Skipping line {line_number}: {e}")
+                continue
+            if request_id in first_lines:
+                # Both would write to the same output directory and checkpoint entry
+                logger.error(f"Skipping line {line_number}: id {request_id!r} is already used on line {first_lines[request_id]}")
+                continue
+            first_lines[request_id] = line_number
+            requests.append({'id': request_id, 'request': request})
+    return requests
+
+
+def request_output_dir(output_root: str, request_id: str) -> str:
+    """
+    Directory a request writes its report to.
+
+    Raises:
+        ValueError: If the id would resolve to a path outside output_root.
+    """
+    output_dir = os.path.join(output_root, request_id)
+    root = os.path.realpath(output_root)
+    if os.path.dirname(os.path.realpath(output_dir)) != root:
+        raise ValueError(f"id {request_id!r} does not name a directory inside {output_root}")
+    return output_dir
+
+
+def load_checkpoint(path: str) -> Set[str]:
+    """Return the ids of requests a previous run already finished."""
+    completed = set()
+    if not os.path.exists(path):
+        return completed
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                # A run killed mid-write can leave a truncated last line
+                continue
+            if entry.get('status') == 'done':
+                completed.add(entry['id'])
+    return completed
+
+
+def append_checkpoint(path: str, entry: Dict[str, Any]):
+    """Durably append one result line to the checkpoint file."""
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(entry) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of values (0 for an empty list)."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, int(round(pct / 100.0 * len(ordered))))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+async def run_batch(requests: List[Dict[str, Any]], output_root: str, checkpoint_path: str, concurrency: int, stream: bool) -> Dict[str, Any]:
+    """Generate every pending request with at most `concurrency` reports in flight."""
+    completed = load_checkpoint(checkpoint_path)
+    pending = [item for item in requests if item['id'] not in completed]
+    logger.info(f"{len(requests)} requests, {len(requests) - len(pending)} already done, {len(pending)} to run")
+
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    latencies = []
+    failures = []
+
+    async def run_one(item: Dict[str, Any]):
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                output_dir = request_output_dir(output_root, item['id'])
+                # A run that failed or was interrupted may have left images behind
+                shutil.rmtree(output_dir, ignore_errors=True)
+                result = await generate_report(**item['request'], output_dir=output_dir, stream=stream, request_id=item['id'])
+            except Exception as e:
+                latency = time.perf_counter() - started
+                logger.error(f"Request {item['id']} failed after {latency:.1f}s: {e}", exc_info=True)
+                failures.append(item['id'])
+                append_checkpoint(checkpoint_path, {'id': item['id'], 'status': 'failed', 'error': str(e), 'latency_s': latency})
+                return
+            latency = time.perf_counter() - started
+            latencies.append(latency)
+            logger.info(f"Request {item['id']} done in {latency:.1f}s: {result['html_path']}")
+            append_checkpoint(checkpoint_path, {'id': item['id'], 'status': 'done', 'html_path': result['html_path'], 'latency_s': latency})
+
+    started = time.perf_counter()
+    await asyncio.gather(*(run_one(item) for item in pending))
+    wall_time = time.perf_counter() - started
+
+    return {
+        'total': len(requests),
+        'skipped': len(requests) - len(pending),
+        'succeeded': len(latencies),
+        'failed': len(failures),
+        'wall_time_s': wall_time,
+        'throughput_per_min': (len(latencies) / wall_time * 60) if wall_time > 0 else 0.0,
+        'latency_p50_s': percentile(latencies, 50),
+        'latency_p95_s': percentile(latencies, 95),
+        'latency_max_s': max(latencies) if latencies else 0.0,
+    }
+
+
+def print_summary(summary: Dict[str, Any]):
+    print("\nBatch summary")
+    print(f"  requests:   {summary['total']} total, {summary['skipped']} skipped (already done)")
+    print(f"  results:    {summary['succeeded']} succeeded, {summary['failed']} failed")
+    print(f"  wall time:  {summary['wall_time_s']:.1f}s")
+    print(f"  throughput: {summary['throughput_per_min']:.2f} reports/min")
+    print(f"  latency:    p50 {summary['latency_p50_s']:.1f}s, p95 {summary['latency_p95_s']:.1f}s, "
+          f"max {summary['latency_max_s']:.1f}s")
+
+
+def main():
+    load_dotenv()
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("input", help="JSONL file of design requests")
+    parser.add_argument("--output-root", default="batch_output", help="Directory that receives one folder per request")
+    parser.add_argument("--checkpoint", help="Checkpoint file (default: <output-root>/checkpoint.jsonl)")
+    parser.add_argument("--concurrency", type=int, default=2, help="Reports generated at the same time")
+    parser.add_argument("--stream", action="store_true", help="Stream text and start images as sections complete")
+    args = parser.parse_args()
+
+    os.makedirs(args.output_root, exist_ok=True)
+    start_metrics_server()
+    checkpoint_path = args.checkpoint or os.path.join(args.output_root, "checkpoint.jsonl")
+    requests = load_requests(args.input)
+    if not requests:
+        logger.error(f"No valid requests found in {args.input}")
+        sys.exit(1)
+
+    summary = asyncio.run(run_batch(requests, args.output_root, checkpoint_path, args.concurrency, args.stream))
+    print_summary(summary)
+    if summary['failed']:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
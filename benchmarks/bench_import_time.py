@@ -0,0 +1,89 @@
+"""
+Measure how long the app's entry modules take to import.
+
+Each module is imported in a fresh interpreter with -X importtime, so the
+numbers are cold-start costs (what a Streamlit page or batch run pays before
+doing any work). Pass --baseline REV to measure a git revision side by side,
+e.g. the commit before the lazy imports.
+
+Run from the repository root:
+    python -m benchmarks.bench_import_time [--baseline REV] [--repeat N] [--module NAME]
+"""
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tarfile
+import tempfile
+import time
+from typing import Dict, List, Optional
+
+DEFAULT_MODULES = ["interior_design_generator", "batch_generate", "app", "generate_images"]
+
+IMPORTTIME_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|(\s+)(\S+)$")
+
+
+def import_once(module: str, tree: str) -> Dict[str, float]:
+    """Import module in a new interpreter; returns its cumulative import time and the process wall time in ms."""
+    env = dict(os.environ, PYTHONPATH=tree, MODEL_BACKEND="fake")
+    start = time.perf_counter()
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=tree, env=env, capture_output=True, text=True
+    )
+    wall_ms = (time.perf_counter() - start) * 1000
+    if completed.returncode != 0:
+        raise RuntimeError(f"import {module} failed in {tree}:\n{completed.stderr[-2000:]}")
+    for line in completed.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        # The module itself is the top-level entry (a single space of indentation)
+        if match and match.group(4) == module and len(match.group(3)) == 1:
+            return {'import_ms': int(match.group(2)) / 1000, 'wall_ms': wall_ms}
+    raise RuntimeError(f"No importtime entry for {module}")
+
+
+def measure(module: str, tree: str, repeat: int) -> Dict[str, float]:
+    runs = [import_once(module, tree) for _ in range(repeat)]
+    return {name: statistics.median(run[name] for run in runs) for name in ('import_ms', 'wall_ms')}
+
+
+def export_revision(revision: str, destination: str) -> str:
+    """Extract the tree of a git revision into destination and return its path."""
+    archive = subprocess.run(["git", "archive", "--format=tar", revision], capture_output=True, check=True).stdout
+    archive_path = os.path.join(destination, "tree.tar")
+    with open(archive_path, "wb") as f:
+        f.write(archive)
+    tree = os.path.join(destination, "tree")
+    with tarfile.open(archive_path) as tar:
+        tar.extractall(tree)
+    return tree
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--baseline", help="Git revision to compare against")
+    parser.add_argument("--repeat", type=int, default=5, help="Fresh interpreters per module")
+    parser.add_argument("--module", action="append", help="Module to import (repeatable)")
+    args = parser.parse_args()
+    modules: List[str] = args.module or DEFAULT_MODULES
+
+    with tempfile.TemporaryDirectory(prefix="import_bench_") as scratch:
+        baseline_tree: Optional[str] = export_revision(args.baseline, scratch) if args.baseline else None
+
+        header = f"{'module':28} {'import ms':>10} {'process ms':>11}"
+        if baseline_tree:
+            header += f" {'baseline ms':>12} {'saved ms':>9}"
+        print(header)
+        for module in modules:
+            current = measure(module, os.getcwd(), args.repeat)
+            line = f"{module:28} {current['import_ms']:10.1f} {current['wall_ms']:11.1f}"
+            if baseline_tree:
+                baseline = measure(module, baseline_tree, args.repeat)
+                line += f" {baseline['import_ms']:12.1f} {baseline['import_ms'] - current['import_ms']:9.1f}"
+            print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+Compare the NumPy palette extractor against colorgram and ColorThief.
+
+Run from the repository root:
+    python -m benchmarks.bench_palette_extraction [--images DIR] [--repeat N]
+"""
+import argparse
+import glob
+import os
+import statistics
+import time
+
+import colorgram
+from colorthief import ColorThief
+
+from palette_extractor import extract_palette
+
+DEFAULT_IMAGE_DIR = "generated_content_20250609_160305"
+
+
+def time_call(fn, repeat):
+    """Run fn repeat times and return the median wall time in milliseconds."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--images", default=DEFAULT_IMAGE_DIR, help="Directory of sample images")
+    parser.add_argument("--num-colors", type=int, default=6)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    image_paths = sorted(
+        path for path in glob.glob(os.path.join(args.images, "*"))
+        if path.lower().endswith((".jpg", ".jpeg", ".png"))
+    )
+    if not image_paths:
+        raise SystemExit(f"No sample images found in {args.images}")
+
+    # Warm up NumPy/PIL so the first measurement isn't dominated by import costs
+    extract_palette(image_paths[0], args.num_colors)
+
+    print(f"{'image':40} {'numpy ms':>10} {'colorgram ms':>14} {'colorthief ms':>15}")
+    totals = {"numpy": 0.0, "colorgram": 0.0, "colorthief": 0.0}
+    for path in image_paths:
+        numpy_ms = time_call(lambda: extract_palette(path, args.num_colors), args.repeat)
+        colorgram_ms = time_call(lambda: colorgram.extract(path, args.num_colors), args.repeat)
+        colorthief_ms = time_call(lambda: ColorThief(path).get_palette(color_count=args.num_colors), args.repeat)
+        totals["numpy"] += numpy_ms
+        totals["colorgram"] += colorgram_ms
+        totals["colorthief"] += colorthief_ms
+        print(f"{os.path.basename(path):40} {numpy_ms:10.1f} {colorgram_ms:14.1f} {colorthief_ms:15.1f}")
+
+    print(f"\nTotal: numpy {totals['numpy']:.1f} ms, colorgram {totals['colorgram']:.1f} ms, "
+          f"colorthief {totals['colorthief']:.1f} ms")
+    print(f"Speedup vs colorgram: {totals['colorgram'] / totals['numpy']:.1f}x, "
+          f"vs colorthief: {totals['colorthief'] / totals['numpy']:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
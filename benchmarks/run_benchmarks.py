@@ -0,0 +1,268 @@
+"""
+Benchmark suite for the generation pipeline's hot paths.
+
+Micro benchmarks time the pure-Python/Pillow steps (section parsing, HTML
+rendering, section assembly, report ZIP build, palette extraction, palette
+visualization and image previews); end-to-end benchmarks run generate_content and the
+generate_images.py options flow against the fake model backend, so they measure
+our own overhead rather than Vertex AI. Results are written as JSON for
+comparing releases.
+
+Run from the repository root:
+    python -m benchmarks.run_benchmarks [--output benchmark_results.json] [--repeat N] [--only NAME]
+
+The fake backend defaults to zero latency; set FAKE_TEXT_LATENCY /
+FAKE_IMAGE_LATENCY to simulate model time in the end-to-end cases.
+"""
+import os
+
+# Configure the simulated backend before any pipeline module reads the environment
+os.environ.setdefault("MODEL_BACKEND", "fake")
+os.environ.setdefault("FAKE_TEXT_LATENCY", "0")
+os.environ.setdefault("FAKE_IMAGE_LATENCY", "0")
+os.environ.setdefault("FAKE_IMAGE_SIZE", "512")
+os.environ.setdefault("RESPONSE_CACHE_ENABLED", "False")
+os.environ.setdefault("TEST_MODE", "False")
+# Background palette analysis would compete with the timed runs and touch their scratch directories
+os.environ.setdefault("PALETTE_PREFETCH", "False")
+os.environ.setdefault("VERTEX_RATE_LIMITS", "gemini-2.0-flash-001=1000:1000,imagegeneration@006=1000:1000")
+
+import io
+import sys
+import glob
+import json
+import time
+import shutil
+import asyncio
+import logging
+import argparse
+import contextlib
+import platform
+import tempfile
+import statistics
+import subprocess
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional
+
+import streamlit as st
+
+import interior_design_generator as idg
+import generate_images
+from color_palette_generator import generate_color_palette, visualize_color_palette
+from fake_vertex import FakeTextModel, render_synthetic_image
+from palette_extractor import extract_palette
+from report_document import sections_to_markdown
+from image_previews import render_preview, preview_for
+from palette_renderer import render_palette, clear_render_cache
+
+BENCHMARK_ROOM = ("Living Room", "Japandi", "Warm neutrals", "Low sofa, oak coffee table", "None provided")
+
+SAMPLE_PALETTE = [
+    {'name': 'Warm Brown', 'hex': '#8B5A2B', 'type': 'primary'},
+    {'name': 'Light Beige', 'hex': '#E8DCC4', 'type': 'primary'},
+    {'name': 'Soft White', 'hex': '#F5F3EE', 'type': 'primary'},
+    {'name': 'Charcoal', 'hex': '#36454F', 'type': 'secondary'},
+    {'name': 'Sage Green', 'hex': '#9CAF88', 'type': 'secondary'},
+    {'name': 'Terracotta', 'hex': '#C66B3D', 'type': 'secondary'},
+]
+
+
+def summarize(timings_ms: List[float]) -> Dict[str, float]:
+    """Summary statistics of one benchmark's timings in milliseconds."""
+    ordered = sorted(timings_ms)
+    p95_index = max(0, int(round(0.95 * len(ordered))) - 1)
+    return {
+        'min_ms': ordered[0],
+        'median_ms': statistics.median(ordered),
+        'mean_ms': statistics.fmean(ordered),
+        'p95_ms': ordered[p95_index],
+        'max_ms': ordered[-1],
+        'stdev_ms': statistics.stdev(ordered) if len(ordered) > 1 else 0.0,
+    }
+
+
+def measure(fn: Callable[[], Any], repeat: int, warmup: int = 1, setup: Optional[Callable[[], Any]] = None) -> Dict[str, Any]:
+    """Time fn repeat times after warmup runs; setup (untimed) runs before every call."""
+    for _ in range(warmup):
+        if setup:
+            setup()
+        fn()
+    timings = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    return {'repeat': repeat, **summarize(timings)}
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def sample_markdown() -> str:
+    """A report-sized markdown document, as the text model returns it."""
+    room_type, design_style, color_palette, key_elements, photo_details = BENCHMARK_ROOM
+    prompt = idg.TEXT_GENERATION_PROMPT_TEMPLATE.format(
+        user_room_type=room_type, user_design_style=design_style, user_color_scheme=color_palette,
+        user_key_design_elements=key_elements, user_inspirational_photo_details=photo_details,
+    )
+    return FakeTextModel(idg.TEXT_MODEL_NAME)._render(prompt)
+
+
+def sample_images(workdir: str, image_dir: Optional[str], count: int = 6) -> List[str]:
+    """Images for the palette benchmarks: from image_dir if given, otherwise synthetic."""
+    if image_dir:
+        paths = sorted(
+            path for path in glob.glob(os.path.join(image_dir, "*"))
+            if path.lower().endswith((".jpg", ".jpeg", ".png"))
+        )
+        if paths:
+            return paths
+    paths = []
+    for index in range(count):
+        path = os.path.join(workdir, f"sample_{index}.jpeg")
+        with open(path, "wb") as f:
+            f.write(render_synthetic_image("benchmark room", index, 1024, "4:3"))
+        paths.append(path)
+    return paths
+
+
+def build_cases(workdir: str, image_dir: Optional[str]) -> List[Dict[str, Any]]:
+    """Every benchmark as {'name', 'kind', 'fn', 'setup'}."""
+    room_type, design_style, color_palette, key_elements, photo_details = BENCHMARK_ROOM
+    markdown_text = sample_markdown()
+    sections = idg.parse_sections(markdown_text)
+    images = sample_images(workdir, image_dir)
+
+    # A rendered report with its images, for the HTML and ZIP benchmarks
+    report_dir = os.path.join(workdir, "report")
+    os.makedirs(report_dir, exist_ok=True)
+    processed = asyncio.run(idg.process_sections_concurrently(sections, room_type, design_style, color_palette, report_dir))
+    report_markdown = sections_to_markdown(processed)
+    html_path = idg.save_to_html(report_markdown, report_dir)
+    archive_path = os.path.join(report_dir, idg.REPORT_ARCHIVE_NAME)
+
+    def remove_archive():
+        if os.path.exists(archive_path):
+            os.remove(archive_path)
+
+    def fresh_dir(name: str) -> Callable[[], str]:
+        path = os.path.join(workdir, name)
+
+        def setup():
+            shutil.rmtree(path, ignore_errors=True)
+            os.makedirs(path)
+        return setup
+
+    with open(images[0], "rb") as f:
+        image_bytes = f.read()
+
+    section_dir = os.path.join(workdir, "section")
+    palette_png = os.path.join(workdir, "palette.png")
+    e2e_report_dir = os.path.join(workdir, "e2e_report")
+    options_dir = os.path.join(workdir, "e2e_options")
+
+    def run_visualize():
+        with contextlib.redirect_stdout(io.StringIO()):
+            visualize_color_palette(generate_color_palette(SAMPLE_PALETTE), filename=palette_png)
+
+    def run_generate_content():
+        # generate_content is the Streamlit wrapper; it writes its report under the (scratch) working directory
+        st.session_state.generated_content = None
+        asyncio.run(idg.generate_content(room_type, design_style, color_palette, key_elements, photo_details))
+        if not st.session_state.generated_content:
+            raise RuntimeError("generate_content produced no report")
+
+    def run_design_options():
+        generate_images.generate_design_options(room_type, [design_style], color_palette, key_elements, options_dir)
+
+    return [
+        {'name': 'parse_sections', 'kind': 'micro', 'fn': lambda: idg.parse_sections(markdown_text)},
+        {'name': 'extract_section_title', 'kind': 'micro',
+         'fn': lambda: [idg.extract_section_title(section.to_markdown()) for section in sections]},
+        {'name': 'sections_to_markdown', 'kind': 'micro', 'fn': lambda: sections_to_markdown(processed)},
+        {'name': 'save_to_html', 'kind': 'micro', 'fn': lambda: idg.save_to_html(report_markdown, report_dir)},
+        {'name': 'process_single_section', 'kind': 'micro', 'setup': fresh_dir("section"),
+         'fn': lambda: asyncio.run(idg.process_single_section(sections[2], room_type, design_style, color_palette, section_dir))},
+        {'name': 'report_zip_build_cold', 'kind': 'micro', 'setup': remove_archive,
+         'fn': lambda: idg.build_report_archive(html_path, report_dir)},
+        {'name': 'report_zip_build_cached', 'kind': 'micro',
+         'fn': lambda: idg.build_report_archive(html_path, report_dir)},
+        {'name': 'palette_extraction', 'kind': 'micro', 'fn': lambda: extract_palette(images[0], 6)},
+        {'name': 'visualize_color_palette', 'kind': 'micro', 'fn': run_visualize},
+        {'name': 'palette_render_cold', 'kind': 'micro', 'setup': clear_render_cache,
+         'fn': lambda: render_palette(generate_color_palette(SAMPLE_PALETTE))},
+        {'name': 'palette_render_svg_cold', 'kind': 'micro', 'setup': clear_render_cache,
+         'fn': lambda: render_palette(generate_color_palette(SAMPLE_PALETTE), "svg")},
+        {'name': 'image_preview_render', 'kind': 'micro', 'fn': lambda: render_preview(image_bytes)},
+        {'name': 'image_preview_cached', 'kind': 'micro', 'fn': lambda: preview_for(images[0])},
+        {'name': 'generate_report', 'kind': 'e2e', 'setup': fresh_dir("e2e_report"),
+         'fn': lambda: asyncio.run(idg.generate_report(room_type, design_style, color_palette, key_elements, photo_details,
+                                                       output_dir=e2e_report_dir, stream=False))},
+        {'name': 'generate_report_streaming', 'kind': 'e2e', 'setup': fresh_dir("e2e_report"),
+         'fn': lambda: asyncio.run(idg.generate_report(room_type, design_style, color_palette, key_elements, photo_details,
+                                                       output_dir=e2e_report_dir, stream=True))},
+        {'name': 'generate_content', 'kind': 'e2e', 'fn': run_generate_content},
+        {'name': 'generate_design_options', 'kind': 'e2e', 'setup': fresh_dir("e2e_options"), 'fn': run_design_options},
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--output", default="benchmark_results.json", help="Where to write the JSON results")
+    parser.add_argument("--repeat", type=int, default=20, help="Timed runs per micro benchmark")
+    parser.add_argument("--e2e-repeat", type=int, default=5, help="Timed runs per end-to-end benchmark")
+    parser.add_argument("--only", action="append", help="Run only benchmarks whose name contains this (repeatable)")
+    parser.add_argument("--skip-e2e", action="store_true", help="Run the micro benchmarks only")
+    parser.add_argument("--images", help="Directory of sample images for the palette benchmarks (default: synthetic)")
+    args = parser.parse_args()
+
+    # The pipeline modules log every step at INFO; keep the table readable
+    logging.getLogger().setLevel(logging.WARNING)
+    for name in list(logging.root.manager.loggerDict):
+        if name.startswith("streamlit"):
+            # Bare-mode warnings ("missing ScriptRunContext") on every st.* call
+            logging.getLogger(name).setLevel(logging.ERROR)
+
+    workdir = tempfile.mkdtemp(prefix="interior_bench_")
+    # generate_content writes its reports relative to the working directory
+    original_cwd = os.getcwd()
+    output_path = os.path.abspath(args.output)
+    os.chdir(workdir)
+    try:
+        cases = build_cases(workdir, args.images and os.path.join(original_cwd, args.images))
+        results = []
+        for case in cases:
+            if args.skip_e2e and case['kind'] == 'e2e':
+                continue
+            if args.only and not any(pattern in case['name'] for pattern in args.only):
+                continue
+            repeat = args.e2e_repeat if case['kind'] == 'e2e' else args.repeat
+            stats = measure(case['fn'], repeat, setup=case.get('setup'))
+            results.append({'name': case['name'], 'kind': case['kind'], **stats})
+            print(f"{case['name']:28} {case['kind']:6} median {stats['median_ms']:9.2f} ms   "
+                  f"p95 {stats['p95_ms']:9.2f} ms   (n={repeat})")
+    finally:
+        os.chdir(original_cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        'timestamp': datetime.now(timezone.utc).isoformat(),
+        'git_revision': git_revision(),
+        'python': sys.version.split()[0],
+        'platform': platform.platform(),
+        'environment': {key: os.environ[key] for key in sorted(os.environ) if key.startswith(("FAKE_", "MODEL_BACKEND", "SECTION_CONCURRENCY"))},
+        'results': results,
+    }
+    with open(output_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults written to {output_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+from functools import lru_cache
+from typing import List, Sequence, Tuple, Union
+
+import numpy as np
+
+from palette_extractor import rgb_to_lab
+from xkcd_colors import XKCD_COLORS
+
+# Bits per RGB channel in the dense lookup table (5 bits -> 32x32x32 cells)
+LUT_BITS = 5
+
+# Closest names remembered per table cell; lookups pick the best of these
+CANDIDATES_PER_CELL = 8
+
+# Rows of CIELAB distances computed at once
+_BUILD_CHUNK_SIZE = 4096
+
+# XKCD survey names that are accurate but not something to show a client
+_UNFIT_NAME_WORDS = {
+    "barf", "bile", "booger", "diarrhea", "dirt", "dirty", "gross", "piss", "poo", "poop",
+    "puke", "shit", "sick", "sickly", "snot", "ugly", "vomit",
+}
+
+ColorInput = Union[str, Tuple[int, int, int]]
+
+
+def hex_to_rgb(hex_code: str) -> Tuple[int, int, int]:
+    """Convert '#RRGGBB' (or 'RRGGBB', or '#RGB') to an (r, g, b) tuple."""
+    value = hex_code.lstrip("#")
+    if len(value) == 3:
+        value = "".join(c * 2 for c in value)
+    return int(value[0:2], 16), int(value[2:4], 16), int(value[4:6], 16)
+
+
+def load_color_name_dictionary() -> Tuple[List[str], np.ndarray]:
+    """
+    Load the named colors the index is built over.
+
+    Uses the ~950 names from the XKCD color survey (see xkcd_colors.py),
+    title-cased, with a handful of unflattering names removed.
+
+    Returns:
+        tuple: (list of names, (N, 3) uint8 array of their RGB values)
+    """
+    names = []
+    rgbs = []
+    for name, hex_code in XKCD_COLORS.items():
+        if _UNFIT_NAME_WORDS.intersection(name.split()):
+            continue
+        names.append(name.title())
+        rgbs.append(hex_to_rgb(hex_code))
+    return names, np.array(rgbs, dtype=np.uint8)
+
+
+class ColorNameIndex:
+    """
+    Nearest named color lookup in CIELAB.
+
+    At build time every cell of a dense RGB lookup table records the few names
+    closest to its center in CIELAB. A lookup then only compares a color against
+    its cell's candidates, which keeps batch naming fully vectorized and exact
+    in practice. ``exact=True`` compares against every name instead.
+    """
+
+    def __init__(self, names: Sequence[str], rgbs: np.ndarray, lut_bits: int = LUT_BITS,
+                 candidates_per_cell: int = CANDIDATES_PER_CELL):
+        self.names = list(names)
+        self.lut_bits = lut_bits
+        self._name_lab = rgb_to_lab(np.asarray(rgbs, dtype=np.float64))
+        self._name_norms = (self._name_lab ** 2).sum(axis=1)
+        self._candidates = self._build_lut(min(candidates_per_cell, len(self.names)))
+
+    def _squared_distances(self, lab: np.ndarray) -> np.ndarray:
+        # |a - b|^2 = |a|^2 + |b|^2 - 2ab, so the bulk of the work is one matrix product
+        return (lab ** 2).sum(axis=1)[:, None] + self._name_norms[None, :] - 2 * lab @ self._name_lab.T
+
+    def _build_lut(self, candidates_per_cell: int) -> np.ndarray:
+        cells = 1 << self.lut_bits
+        step = 256 / cells
+        centers = (np.arange(cells) + 0.5) * step
+        grid = np.stack(np.meshgrid(centers, centers, centers, indexing="ij"), axis=-1).reshape(-1, 3)
+        grid_lab = rgb_to_lab(grid)
+
+        candidates = np.empty((len(grid_lab), candidates_per_cell), dtype=np.int32)
+        for start in range(0, len(grid_lab), _BUILD_CHUNK_SIZE):
+            distances = self._squared_distances(grid_lab[start:start + _BUILD_CHUNK_SIZE])
+            candidates[start:start + _BUILD_CHUNK_SIZE] = np.argpartition(
+                distances, candidates_per_cell - 1, axis=1
+            )[:, :candidates_per_cell]
+        return candidates.reshape(cells, cells, cells, candidates_per_cell)
+
+    def nearest(self, colors: Union[Sequence[ColorInput], np.ndarray], exact: bool = False) -> List[str]:
+        """
+        Name a batch of colors in one vectorized call.
+
+        Args:
+            colors: Hex strings, (r, g, b) tuples, or an (N, 3) array of 0-255 values.
+            exact (bool): Compare against every name instead of the lookup table candidates.
+
+        Returns:
+            list: The closest name for each color, in input order.
+        """
+        if isinstance(colors, np.ndarray):
+            rgb = colors.reshape(-1, 3).astype(np.int64)
+        else:
+            rgb = np.array([hex_to_rgb(c) if isinstance(c, str) else tuple(c) for c in colors],
+                           dtype=np.int64).reshape(-1, 3)
+        rgb = np.clip(rgb, 0, 255)
+        lab = rgb_to_lab(rgb)
+
+        if exact:
+            indices = np.concatenate([
+                self._squared_distances(lab[start:start + _BUILD_CHUNK_SIZE]).argmin(axis=1)
+                for start in range(0, len(lab), _BUILD_CHUNK_SIZE)
+            ]) if len(lab) else np.empty(0, dtype=np.int64)
+        else:
+            q = rgb >> (8 - self.lut_bits)
+            candidates = self._candidates[q[:, 0], q[:, 1], q[:, 2]]
+            distances = ((self._name_lab[candidates] - lab[:, None, :]) ** 2).sum(axis=2)
+            indices = candidates[np.arange(len(candidates)), distances.argmin(axis=1)]
+        return [self.names[i] for i in indices]
+
+
+@lru_cache(maxsize=1)
+def get_color_name_index() -> ColorNameIndex:
+    """Build the process-wide color name index on first use."""
+    names, rgbs = load_color_name_dictionary()
+    return ColorNameIndex(names, rgbs)
+
+
+def nearest_color_names(colors: Union[Sequence[ColorInput], np.ndarray], exact: bool = False) -> List[str]:
+    """Return the closest named color for each hex string or RGB tuple."""
+    return get_color_name_index().nearest(colors, exact=exact)
+
+
+def nearest_color_name(color: ColorInput, exact: bool = False) -> str:
+    """Return the closest named color for a single hex string or RGB tuple."""
+    return nearest_color_names([color], exact=exact)[0]
@@ -3,6 +3,8 @@ from vertexai.generative_models import GenerativeModel, Part
 import base64
 import os
 
+from image_payload import load_image_payload
+
 # --- Re-initialize Vertex AI (or ensure it's still initialized from Step 1) ---
 # If running as a single script, this will already be initialized.
 # For clarity, assuming it's part of a larger workflow.
@@ -30,10 +32,8 @@ image_to_analyze_path = "C:\InteriorGenie\generated_content_20250608_234846\Mid_
 
 # --- Prepare the image for the multimodal prompt ---
 try:
-    with open(image_to_analyze_path, "rb") as image_file:
-        image_bytes = image_file.read()
-    encoded_image = base64.b64encode(image_bytes).decode("utf-8")
-    mime_type = "image/jpeg" # Assuming JPEG, adjust if your image generation creates PNG etc.
+    # Downscaled raw bytes with the MIME type sniffed from the file itself
+    payload = load_image_payload(image_to_analyze_path)
     print(f"Image for color palette analysis: {image_to_analyze_path}")
 except FileNotFoundError:
     print(f"Error: The image '{image_to_analyze_path}' was not found.")
@@ -46,7 +46,7 @@ text_prompt_for_palette = "Based on the provided interior design image, generate
 # --- Construct the multimodal content for Gemini ---
 contents_for_palette = [
     Part.from_text(text_prompt_for_palette),
-    Part.from_data(data=encoded_image, mime_type=mime_type)
+    Part.from_data(data=payload.data, mime_type=payload.mime_type)
 ]
 
 # --- Send the request to Gemini to generate the color palette image ---
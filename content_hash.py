@@ -0,0 +1,41 @@
+import os
+import hashlib
+import threading
+from typing import Dict, Tuple
+
+# Digests of files we've already hashed, keyed by (path, mtime, size)
+_file_digests: Dict[Tuple[str, int, int], str] = {}
+_file_digests_lock = threading.Lock()
+_MAX_FILE_DIGESTS = 4096
+
+
+def bytes_digest(data: bytes) -> str:
+    """Return the SHA-256 hex digest of data."""
+    return hashlib.sha256(data).hexdigest()
+
+
+def file_digest(path: str) -> str:
+    """
+    Return the SHA-256 hex digest of a file's contents.
+
+    Results are remembered per (path, mtime, size), so asking again about a file
+    that hasn't changed costs a single stat() call instead of a full read.
+    """
+    st = os.stat(path)
+    memo_key = (os.path.abspath(path), st.st_mtime_ns, st.st_size)
+    with _file_digests_lock:
+        digest = _file_digests.get(memo_key)
+    if digest is not None:
+        return digest
+
+    hasher = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            hasher.update(block)
+    digest = hasher.hexdigest()
+
+    with _file_digests_lock:
+        if len(_file_digests) >= _MAX_FILE_DIGESTS:
+            _file_digests.clear()
+        _file_digests[memo_key] = digest
+    return digest
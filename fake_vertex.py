@@ -0,0 +1,205 @@
+"""
+Local stand-in for the Vertex AI models, for development and load testing.
+
+Select it with MODEL_BACKEND=fake. Text calls return realistic markdown (or a
+palette JSON block for multimodal requests), image calls return deterministic
+synthetic JPEGs, and both follow a configurable latency distribution and
+inject errors at configurable rates:
+
+    FAKE_TEXT_LATENCY     median seconds per text call (default 2.0)
+    FAKE_IMAGE_LATENCY    median seconds per image call (default 6.0)
+    FAKE_LATENCY_SIGMA    log-normal sigma of the latency (default 0.3)
+    FAKE_ERROR_RATE       share of calls failing with a 503 (default 0)
+    FAKE_QUOTA_RATE       share of calls failing with a 429 (default 0)
+    FAKE_IMAGE_SIZE       longest side of generated images (default 1024)
+    FAKE_SEED             seed for latencies and injected errors (default 0)
+"""
+import io
+import os
+import re
+import json
+import time
+import random
+import asyncio
+import hashlib
+import threading
+from types import SimpleNamespace
+from typing import Any, List, Optional
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+
+class FakeServiceUnavailable(Exception):
+    """Injected transient server error."""
+    code = 503
+
+
+class FakeQuotaExceeded(Exception):
+    """Injected quota error, shaped like Vertex's 429 ResourceExhausted."""
+    code = 429
+
+
+class FakeBackendConfig:
+    """Latency and error injection settings, read from the environment by default."""
+
+    def __init__(self, text_latency: Optional[float] = None, image_latency: Optional[float] = None,
+                 latency_sigma: Optional[float] = None, error_rate: Optional[float] = None,
+                 quota_rate: Optional[float] = None, image_size: Optional[int] = None, seed: Optional[int] = None):
+        self.text_latency = text_latency if text_latency is not None else float(os.getenv("FAKE_TEXT_LATENCY", "2.0"))
+        self.image_latency = image_latency if image_latency is not None else float(os.getenv("FAKE_IMAGE_LATENCY", "6.0"))
+        self.latency_sigma = latency_sigma if latency_sigma is not None else float(os.getenv("FAKE_LATENCY_SIGMA", "0.3"))
+        self.error_rate = error_rate if error_rate is not None else float(os.getenv("FAKE_ERROR_RATE", "0"))
+        self.quota_rate = quota_rate if quota_rate is not None else float(os.getenv("FAKE_QUOTA_RATE", "0"))
+        self.image_size = image_size if image_size is not None else int(os.getenv("FAKE_IMAGE_SIZE", "1024"))
+        self.seed = seed if seed is not None else int(os.getenv("FAKE_SEED", "0"))
+
+
+class _FakeModelBase:
+    def __init__(self, model_name: str, config: Optional[FakeBackendConfig] = None):
+        self.model_name = model_name
+        self.config = config or FakeBackendConfig()
+        self._rng = random.Random(self.config.seed)
+        self._rng_lock = threading.Lock()
+
+    def _sample_latency(self, median: float) -> float:
+        if median <= 0:
+            return 0.0
+        with self._rng_lock:
+            return median * self._rng.lognormvariate(0.0, self.config.latency_sigma)
+
+    def _maybe_fail(self):
+        with self._rng_lock:
+            roll = self._rng.random()
+        if roll < self.config.quota_rate:
+            raise FakeQuotaExceeded(f"429 Quota exceeded for {self.model_name} (injected)")
+        if roll < self.config.quota_rate + self.config.error_rate:
+            raise FakeServiceUnavailable(f"503 Service unavailable for {self.model_name} (injected)")
+
+
+def _text_response(text: str) -> SimpleNamespace:
+    """Build an object shaped like a GenerationResponse."""
+    part = SimpleNamespace(text=text, inline_data=None)
+    candidate = SimpleNamespace(content=SimpleNamespace(parts=[part]))
+    return SimpleNamespace(text=text, candidates=[candidate])
+
+
+def _prompt_text(contents: Any) -> str:
+    if isinstance(contents, str):
+        return contents
+    texts = []
+    for part in contents:
+        try:
+            text = part if isinstance(part, str) else part.text
+        except (AttributeError, ValueError):
+            # Image parts have no text
+            continue
+        if text:
+            texts.append(text)
+    return "\n".join(texts)
+
+
+class FakeTextModel(_FakeModelBase):
+    """Stand-in for GenerativeModel: returns design markdown, or a palette for image inputs."""
+
+    def _render(self, contents: Any) -> str:
+        prompt = _prompt_text(contents)
+        if not isinstance(contents, str) and len(contents) > 1:
+            return self._render_palette(prompt)
+        return self._render_design(prompt)
+
+    def _render_palette(self, prompt: str) -> str:
+        seed = int(hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:8], 16)
+        rng = random.Random(seed)
+        names = ["Warm Brown", "Light Beige", "Soft White", "Charcoal", "Sage Green", "Dusty Blue", "Terracotta"]
+        colors = [
+            {"name": name, "hex": "#{:02X}{:02X}{:02X}".format(*(rng.randrange(256) for _ in range(3))),
+             "type": "primary" if idx < 2 else "secondary"}
+            for idx, name in enumerate(rng.sample(names, 6))
+        ]
+        return "```json\n" + json.dumps(colors, indent=2) + "\n```"
+
+    def _render_design(self, prompt: str) -> str:
+        match = re.search(r"for a (.+?) in (.+?) style with a (.+?) color scheme", prompt)
+        room, style, colors = match.groups() if match else ("room", "modern", "neutral")
+        return (
+            f"## Overall Concept and Style\n"
+            f"This {room} embraces a {style} aesthetic built around a {colors} palette. "
+            f"Clean sight lines and layered textures keep the space calm while still feeling personal. "
+            f"Natural light is maximized and every piece earns its place.\n\n"
+            f"## Color Scheme and Materials\n"
+            f"- **Walls:** A soft base drawn from the {colors} scheme\n"
+            f"- **Accents:** Deeper tones repeated in textiles and artwork\n"
+            f"- **Materials:** Oak, linen, brushed brass and matte ceramic\n\n"
+            f"## Furniture Recommendations\n"
+            f"- A low-profile sofa in a performance fabric\n"
+            f"- A solid wood coffee table with rounded edges\n"
+            f"- A pair of sculptural accent chairs\n\n"
+            f"## Lighting Plan\n"
+            f"- Warm 2700K ambient lighting on dimmers\n"
+            f"- A statement pendant as the focal point\n\n"
+            f"## Decorative Elements\n"
+            f"- Large-scale art in {style} spirit\n"
+            f"- Potted greenery and a hand-knotted rug\n"
+        )
+
+    def generate_content(self, contents: Any, **kwargs: Any) -> SimpleNamespace:
+        time.sleep(self._sample_latency(self.config.text_latency))
+        self._maybe_fail()
+        return _text_response(self._render(contents))
+
+    async def generate_content_async(self, contents: Any, stream: bool = False, **kwargs: Any):
+        self._maybe_fail()
+        text = self._render(contents)
+        latency = self._sample_latency(self.config.text_latency)
+        if not stream:
+            await asyncio.sleep(latency)
+            return _text_response(text)
+
+        async def chunks():
+            # Spread the latency over the response like a real token stream
+            pieces = [text[i:i + 48] for i in range(0, len(text), 48)]
+            for piece in pieces:
+                await asyncio.sleep(latency / len(pieces))
+                yield _text_response(piece)
+
+        return chunks()
+
+
+def render_synthetic_image(prompt: str, index: int, size: int = 1024, aspect_ratio: str = "1:1") -> bytes:
+    """Render a deterministic JPEG for a prompt: a gradient 'room' with a few blocks of 'furniture'."""
+    width_ratio, height_ratio = (int(x) for x in aspect_ratio.split(":"))
+    if width_ratio >= height_ratio:
+        width, height = size, size * height_ratio // width_ratio
+    else:
+        width, height = size * width_ratio // height_ratio, size
+
+    seed = int(hashlib.sha256(f"{prompt}|{index}".encode("utf-8")).hexdigest()[:8], 16)
+    rng = np.random.default_rng(seed)
+    top, bottom = rng.integers(60, 240, size=(2, 3))
+    ramp = np.linspace(0.0, 1.0, height)[:, None, None]
+    pixels = (top * (1 - ramp) + bottom * ramp).repeat(width, axis=1).astype(np.uint8)
+
+    image = Image.fromarray(pixels, "RGB")
+    draw = ImageDraw.Draw(image)
+    for _ in range(int(rng.integers(3, 7))):
+        x0, y0 = int(rng.integers(0, width * 3 // 4)), int(rng.integers(height // 3, height * 3 // 4))
+        x1, y1 = x0 + int(rng.integers(width // 10, width // 3)), y0 + int(rng.integers(height // 10, height // 4))
+        draw.rectangle([x0, y0, x1, y1], fill=tuple(int(c) for c in rng.integers(0, 256, size=3)))
+
+    buffer = io.BytesIO()
+    image.save(buffer, format="JPEG", quality=90)
+    return buffer.getvalue()
+
+
+class FakeImageModel(_FakeModelBase):
+    """Stand-in for ImageGenerationModel returning synthetic JPEGs."""
+
+    def generate_images(self, prompt: str, number_of_images: int = 1, aspect_ratio: str = "1:1", **kwargs: Any) -> SimpleNamespace:
+        time.sleep(self._sample_latency(self.config.image_latency))
+        self._maybe_fail()
+        images: List[SimpleNamespace] = [
+            SimpleNamespace(_image_bytes=render_synthetic_image(prompt, i, self.config.image_size, aspect_ratio))
+            for i in range(number_of_images)
+        ]
+        return SimpleNamespace(images=images)
@@ -6,6 +6,8 @@ from colormap import rgb2hex, hex2rgb
 import ast
 import re
 
+from palette_extractor import extract_palette
+
 def string_to_rgb_tuple_regex(rgb_string):
     """
     Extracts r, g, b values from the string using regular expressions
@@ -27,14 +29,7 @@ def get_colors_and_proportions(image_path, num_colors=5):
     Extracts dominant colors and their proportions as a list of dictionaries,
     with RGB as plain numeric tuples.
     """
-    colors_raw = colorgram.extract(image_path, num_colors)
-    result = []
-    for color_obj in colors_raw:
-        result.append({
-            'rgb': tuple(color_obj.rgb), # Convert namedtuple to plain tuple
-            'proportion': color_obj.proportion
-        })
-    return result
+    return extract_palette(image_path, num_colors)
 
 if __name__ == '__main__':
     print("hello")
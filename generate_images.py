@@ -1,11 +1,18 @@
 import streamlit as st
 import os
+import time
+import uuid
 from dotenv import load_dotenv
 from interior_design_generatorv2 import run_async_generate_content, get_text_model, get_image_model
 import asyncio
-import base64
-from datetime import datetime
-from get_image_colors import get_image_colors
+from palette_prefetch import prefetch_palettes, cancel_prefetch, palette_for
+from image_sink import write_images
+from image_previews import create_previews, preview_for
+from vertex_client import call_with_retry, acall_with_retry
+from tracing import trace_request, span, start_metrics_server
+from model_backends import start_model_prewarm
+from storage import create_job_dir, start_garbage_collector, touch_job, validate_job_id
+from job_runner import get_job_runner, request_key, JobError, JOB_POLL_INTERVAL, SUCCEEDED, CANCELLED
 import json
 import logging
 
@@ -16,11 +23,17 @@ logger = logging.getLogger(__name__)
 # Load environment variables (moved outside main function)
 load_dotenv()
 
+# Models served by get_text_model / get_image_model; used to pick rate limits
+TEXT_MODEL_NAME = "gemini-2.0-flash-001"
+IMAGE_MODEL_NAME = "imagegeneration@006"
+
 def select_image_callback(image_path, option_number):
     """Callback function to set selected image and option in session state."""
     logger.info(f"Callback: Option {option_number} selected")
     st.session_state.selected_image = image_path
     st.session_state.selected_option = option_number
+    # The other options' palettes won't be shown; skip the analyses that haven't started
+    cancel_prefetch(path for path in st.session_state.generated_images or [] if path != image_path)
     logger.info(f"DEBUG: Callback: Selected image set to: {st.session_state.selected_image}")
 
 def generate_content(text_model, text_prompt):
@@ -35,7 +48,10 @@ def generate_content(text_model, text_prompt):
         
         # Generate content
         logger.info("Calling generate_content_async")
-        response = loop.run_until_complete(text_model.generate_content_async(text_prompt))
+        with span("text_generation", source="model"):
+            response = loop.run_until_complete(
+                acall_with_retry(TEXT_MODEL_NAME, text_model.generate_content_async, text_prompt)
+            )
         logger.info("Received response from model")
         
         if response and hasattr(response, 'text') and response.text:
@@ -53,33 +69,50 @@ def generate_content(text_model, text_prompt):
         # Don't close the loop here as it might be needed for other operations
         pass
 
-def regenerate_images_callback():
-    """Callback function to regenerate images with the same parameters."""
-    logger.info("Regenerating images with same parameters")
-    if st.session_state.form_data:
-        # Create new output directory
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        output_dir = f"generated_content_{timestamp}"
-        os.makedirs(output_dir, exist_ok=True)
-        logger.info(f"Created new output directory: {output_dir}")
-        st.session_state.output_dir = output_dir
-
-        # Generate images
-        image_model = get_image_model()
-        
-        # Build the image prompt
-        key_elements_text = f". Key elements: {st.session_state.form_data['key_elements']}" if st.session_state.form_data.get('key_elements') else ""
-        image_prompt = (
-            f"High-quality interior design photograph. "
-            f"Room type: {st.session_state.form_data['room_type']}. "
-            f"Design style: {', '.join(st.session_state.form_data['design_style'])}. "
-            f"Color palette: {st.session_state.form_data['color_scheme']}"
-            f"{key_elements_text}. "
-            f"The image should be a realistic, professional interior design photograph."
+def save_design_options(images, output_dir):
+    """Write the raw bytes of each generated option (and its preview) to disk in parallel and return their paths."""
+    with span("image_save", images=len(images)):
+        image_paths = write_images(
+            (image._image_bytes, os.path.join(output_dir, f"design_option_{i+1}.jpeg"))
+            for i, image in enumerate(images)
         )
-        
-        # Generate images synchronously
-        response = image_model.generate_images(
+    # Analyze every option's colors in the background so a selection shows its palette at once
+    prefetch_palettes(image_paths)
+    # Display-sized previews for the option grid, cached by content hash
+    with span("image_preview", images=len(images)):
+        create_previews(image._image_bytes for image in images)
+    for i, image_path in enumerate(image_paths):
+        logger.info(f"Saved image {i+1} to {image_path}")
+    return image_paths
+
+class DesignGenerationError(Exception):
+    """Raised with a user-facing message when a step of the design flow fails."""
+
+def build_concept_prompt(room_type, design_style, color_scheme, key_elements):
+    """Build the prompt for the short Overall Concept and Style text."""
+    return f"""Create a detailed interior design concept for a {room_type} in {', '.join(design_style)} style with a {color_scheme} color scheme{f' and featuring {key_elements}' if key_elements else ''}.
+
+Please provide a concise 5-sentence design plan focusing on the Overall Concept and Style section only. Each sentence should be impactful and informative.
+
+Format the response in markdown with a clear section header (##) for the Overall Concept and Style section."""
+
+def build_image_prompt(room_type, design_style, color_scheme, key_elements):
+    """Build the prompt for the design option images."""
+    return f"High-quality interior design photograph. Room type: {room_type}. Design style: {', '.join(design_style)}. Color palette: {color_scheme}{f'. Key elements: {key_elements}' if key_elements else ''}. The image should be a realistic, professional interior design photograph."
+
+def generate_option_images(image_prompt, output_dir):
+    """Generate the three design options and save them to output_dir; returns their paths."""
+    logger.info("Initializing image model")
+    image_model = get_image_model()
+    if not image_model:
+        raise DesignGenerationError("Failed to initialize image model. Please try again.")
+
+    # Generate images synchronously
+    logger.info("Generating images")
+    with span("option_images"):
+        response = call_with_retry(
+            IMAGE_MODEL_NAME,
+            image_model.generate_images,
             prompt=image_prompt,
             number_of_images=3,
             language="en",
@@ -88,24 +121,116 @@ def regenerate_images_callback():
             person_generation="allow_adult"
         )
 
-        if response and response.images:
-            # Save images and store paths in session state
-            image_paths = []
-            for i, image in enumerate(response.images):
-                image_data = base64.b64encode(image._image_bytes).decode('utf-8')
-                image_filename = f"design_option_{i+1}.jpeg"
-                image_path = os.path.join(output_dir, image_filename)
-                
-                with open(image_path, "wb") as f:
-                    f.write(base64.b64decode(image_data))
-                
-                image_paths.append(image_path)
-                logger.info(f"Saved image {i+1} to {image_path}")
-            
-            st.session_state.generated_images = image_paths
-            logger.info("Stored new generated image paths in session state.")
-        else:
-            st.error("Failed to generate new images. Please try again.")
+    if not (response and response.images):
+        raise DesignGenerationError("Failed to generate images. Please try again.")
+    return save_design_options(response.images, output_dir)
+
+def generate_design_options(room_type, design_style, color_scheme, key_elements, output_dir, request_id=None, progress=None, concept_text=None):
+    """
+    Run the concept text and option image generation without touching Streamlit.
+
+    The stage timings are written to trace.json in output_dir. progress, if given,
+    is called with (fraction done, message) before each stage. Passing concept_text
+    (e.g. to regenerate the images) skips the text generation.
+
+    Returns:
+        dict: 'concept_text', 'image_paths', 'output_dir' and 'request_id'.
+    """
+    report_progress = progress or (lambda fraction, message: None)
+    with trace_request(output_dir, request_id) as trace, span("design_options"):
+        if not concept_text:
+            # Generate text content for overall concept
+            logger.info("Initializing text model")
+            text_model = get_text_model()
+            if not text_model:
+                raise DesignGenerationError("Failed to initialize text model. Please try again.")
+
+            logger.info(f"[{trace.request_id}] Generating concept text")
+            report_progress(0.05, "Writing the design concept")
+            concept_text = generate_content(text_model, build_concept_prompt(room_type, design_style, color_scheme, key_elements))
+            if not concept_text:
+                raise DesignGenerationError("Failed to generate concept text. Please try again.")
+
+        report_progress(0.3, "Generating the design options")
+        image_paths = generate_option_images(build_image_prompt(room_type, design_style, color_scheme, key_elements), output_dir)
+        return {'concept_text': concept_text, 'image_paths': image_paths, 'output_dir': output_dir, 'request_id': trace.request_id}
+
+def design_options_job(job_id, progress, room_type, design_style, color_scheme, key_elements, concept_text=None):
+    """Job runner entry point: generate the concept (unless given) and design options into the job's own directory."""
+    output_dir = create_job_dir(job_id)
+    logger.info(f"Created output directory: {output_dir}")
+    try:
+        return generate_design_options(room_type, design_style, color_scheme, key_elements, output_dir,
+                                       request_id=job_id, progress=progress, concept_text=concept_text)
+    except DesignGenerationError as e:
+        raise JobError(str(e))
+
+def session_waiter():
+    """This browser session's id as a waiter on background jobs."""
+    if 'waiter_id' not in st.session_state:
+        st.session_state.waiter_id = uuid.uuid4().hex
+    return st.session_state.waiter_id
+
+def forget_design_job():
+    """Stop following the session's design options job."""
+    st.session_state.pop('design_job_id', None)
+    if "job" in st.query_params:
+        del st.query_params["job"]
+
+def follow_design_job(job_id):
+    """Show a running design options job's progress, or load its result once it has finished."""
+    try:
+        validate_job_id(job_id)
+    except ValueError as e:
+        logger.warning(f"Ignoring job from URL: {e}")
+        st.warning("These design options could not be found. Please generate them again.")
+        forget_design_job()
+        return
+    job = get_job_runner().get(job_id, session_waiter())
+    if job is None or job.kind != "design_options":
+        st.warning("These design options could not be found. Please generate them again.")
+        forget_design_job()
+    elif not job.finished:
+        st.progress(job.progress, text=job.message)
+        time.sleep(JOB_POLL_INTERVAL)
+        st.rerun()
+    elif job.status == SUCCEEDED:
+        st.session_state.concept_text = job.result['concept_text']
+        st.session_state.generated_images = job.result['image_paths']
+        st.session_state.output_dir = job.result['output_dir']
+        st.session_state.loaded_design_job_id = job_id
+        st.session_state.design_job_id = job_id
+        logger.info("Stored concept text and generated image paths from the finished job in session state")
+    elif job.status == CANCELLED:
+        st.warning("These design options were cancelled. Please generate them again.")
+        forget_design_job()
+    else:
+        st.error(job.error)
+        forget_design_job()
+
+def regenerate_images_callback():
+    """Callback function to regenerate images with the same parameters, keeping the concept text."""
+    logger.info("Regenerating images with same parameters")
+    if st.session_state.form_data:
+        # The current options are being replaced; don't analyze them any further
+        cancel_prefetch(st.session_state.generated_images or [])
+
+        # New images are wanted, so this never joins an in-flight job (no key)
+        runner = get_job_runner()
+        form_data = st.session_state.form_data
+        job_id = runner.submit(
+            "design_options", design_options_job, waiter=session_waiter(),
+            room_type=form_data['room_type'],
+            design_style=form_data['design_style'],
+            color_scheme=form_data['color_scheme'],
+            key_elements=form_data.get('key_elements'),
+            concept_text=st.session_state.concept_text
+        )
+        previous_job_id = st.session_state.get('design_job_id')
+        if previous_job_id and previous_job_id != job_id:
+            runner.release(previous_job_id, session_waiter())
+        st.session_state.design_job_id = job_id
+        st.query_params["job"] = job_id
 
 def start_over_callback():
     """Callback function to reset all session state variables."""
@@ -121,9 +246,15 @@ def start_over_callback():
         except Exception as e:
             logger.info(f"No active event loop to clean up: {str(e)}")
 
+        # Let go of a running job; it is cancelled if no other session is waiting for it
+        if st.session_state.get('design_job_id') and st.session_state.get('waiter_id'):
+            get_job_runner().release(st.session_state.design_job_id, st.session_state.waiter_id)
+
         # Clear all session state variables
         for key in list(st.session_state.keys()):
             del st.session_state[key]
+        if "job" in st.query_params:
+            del st.query_params["job"]
         logger.info("All session state variables cleared")
     except Exception as e:
         logger.error(f"Error during reset: {str(e)}", exc_info=True)
@@ -157,6 +288,9 @@ def main():
     )
 
     logger.info("Starting main function")
+    start_metrics_server()
+    start_garbage_collector()
+    start_model_prewarm([TEXT_MODEL_NAME], [IMAGE_MODEL_NAME])
 
     # Load custom styling
     load_css()
@@ -325,85 +459,27 @@ def main():
         if key_elements:
             st.write(f"**Key Design Elements:** {key_elements}")
 
-        # Generate content
-        with st.spinner("Generating your interior design concept and images..."):
-            try:
-                # Create output directory
-                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                output_dir = f"generated_content_{timestamp}"
-                os.makedirs(output_dir, exist_ok=True)
-                logger.info(f"Created output directory: {output_dir}")
-                st.session_state.output_dir = output_dir
-
-                # Generate text content for overall concept
-                logger.info("Initializing text model")
-                text_model = get_text_model()
-                if not text_model:
-                    logger.error("Failed to initialize text model")
-                    st.error("Failed to initialize text model. Please try again.")
-                    return
-
-                text_prompt = f"""Create a detailed interior design concept for a {room_type} in {', '.join(design_style)} style with a {color_scheme} color scheme{f' and featuring {key_elements}' if key_elements else ''}.
-
-Please provide a concise 5-sentence design plan focusing on the Overall Concept and Style section only. Each sentence should be impactful and informative.
-
-Format the response in markdown with a clear section header (##) for the Overall Concept and Style section."""
-                
-                logger.info("Generating concept text")
-                concept_text = generate_content(text_model, text_prompt)
-                if concept_text:
-                    st.session_state.concept_text = concept_text
-                    logger.info("Successfully stored concept text in session state")
-                else:
-                    logger.error("Failed to generate concept text")
-                    st.error("Failed to generate concept text. Please try again.")
-                    return
-
-                # Generate images
-                logger.info("Initializing image model")
-                image_model = get_image_model()
-                if not image_model:
-                    logger.error("Failed to initialize image model")
-                    st.error("Failed to initialize image model. Please try again.")
-                    return
-
-                image_prompt = f"High-quality interior design photograph. Room type: {room_type}. Design style: {', '.join(design_style)}. Color palette: {color_scheme}{f'. Key elements: {key_elements}' if key_elements else ''}. The image should be a realistic, professional interior design photograph."
-                
-                # Generate images synchronously
-                logger.info("Generating images")
-                response = image_model.generate_images(
-                    prompt=image_prompt,
-                    number_of_images=3,
-                    language="en",
-                    aspect_ratio="4:3",
-                    safety_filter_level="block_some",
-                    person_generation="allow_adult"
-                )
-
-                if response and response.images:
-                    # Save images and store paths in session state
-                    image_paths = []
-                    for i, image in enumerate(response.images):
-                        image_data = base64.b64encode(image._image_bytes).decode('utf-8')
-                        image_filename = f"design_option_{i+1}.jpeg"
-                        image_path = os.path.join(output_dir, image_filename)
-                        
-                        with open(image_path, "wb") as f:
-                            f.write(base64.b64decode(image_data))
-                        
-                        image_paths.append(image_path)
-                        logger.info(f"Saved image {i+1} to {image_path}")
-                    
-                    st.session_state.generated_images = image_paths
-                    logger.info("Successfully stored generated image paths in session state")
-                else:
-                    logger.error("Failed to generate images")
-                    st.error("Failed to generate images. Please try again.")
-                    return
-            except Exception as e:
-                logger.error(f"Error during generation: {str(e)}", exc_info=True)
-                st.error("An error occurred during generation. Please try again.")
-                return
+        # Generate on a background worker; the id in the URL lets a refresh pick the options up again.
+        # An identical request already in flight (a double click, or another user) is joined instead.
+        runner = get_job_runner()
+        inputs = {
+            'room_type': room_type,
+            'design_style': design_style,
+            'color_scheme': color_scheme,
+            'key_elements': key_elements
+        }
+        job_id = runner.submit("design_options", design_options_job, key=request_key("design_options", **inputs),
+                               waiter=session_waiter(), **inputs)
+        previous_job_id = st.session_state.get('design_job_id')
+        if previous_job_id and previous_job_id != job_id:
+            runner.release(previous_job_id, session_waiter())
+        st.session_state.design_job_id = job_id
+        st.query_params["job"] = job_id
+
+    # Follow this session's job, or the one in the URL after a refresh or reconnect
+    job_id = st.session_state.get('design_job_id') or st.query_params.get("job")
+    if job_id and st.session_state.get('loaded_design_job_id') != job_id:
+        follow_design_job(job_id)
 
     # Display the concept text if it exists in session state
     if st.session_state.concept_text:
@@ -413,6 +489,8 @@ Format the response in markdown with a clear section header (##) for the Overall
 
     # Display generated images and selection buttons if images exist in session state
     if st.session_state.generated_images:
+        # Showing the options keeps them from being garbage collected for a while
+        touch_job(os.path.dirname(st.session_state.generated_images[0]))
         # Add regenerate images button if no image is selected
         if not st.session_state.selected_image:
             col1, col2 = st.columns([3, 1])
@@ -428,7 +506,7 @@ Format the response in markdown with a clear section header (##) for the Overall
         
         for i, image_path in enumerate(st.session_state.generated_images):
             with cols[i]:
-                st.image(image_path, caption=f"Option {i+1}")
+                st.image(preview_for(image_path), caption=f"Option {i+1}")
                 # Use on_click callback to reliably set session state before rerun
                 st.button(f"Select Option {i+1}", key=f"select_{i}", 
                           on_click=select_image_callback, args=(image_path, i+1))
@@ -445,8 +523,10 @@ Format the response in markdown with a clear section header (##) for the Overall
         logger.info(f"Selected image found for color analysis: {st.session_state.selected_image}")
         try:
             with st.spinner("Analyzing colors in the selected image..."):
-                logger.info("Calling get_image_colors")
-                color_palette = get_image_colors(st.session_state.selected_image)
+                logger.info("Looking up the palette of the selected image")
+                # Record the lookup on the timeline of the run that produced the image
+                with trace_request(os.path.dirname(st.session_state.selected_image)):
+                    color_palette = palette_for(st.session_state.selected_image)
                 logger.info(f"Color palette received: {color_palette}")
                 if color_palette:
                     colors = json.loads(color_palette)
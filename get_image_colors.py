@@ -1,76 +1,183 @@
-import vertexai
-from vertexai.generative_models import GenerativeModel, Part
-import base64
 import os
 import json
 import re
+import logging
 
-def get_image_colors(image_path):
+from content_hash import file_digest
+from image_payload import load_image_payload
+from palette_extractor import analyze_palette
+from color_names import nearest_color_names
+from vertex_client import call_with_retry
+from model_backends import MODEL_BACKEND, load_text_model
+from response_cache import ResponseCache, make_cache_key
+from tracing import span
+
+logger = logging.getLogger(__name__)
+
+MODEL_NAME = "gemini-2.0-flash-001"
+
+# Bump whenever PALETTE_PROMPT changes so palettes from the old prompt aren't reused
+PALETTE_PROMPT_VERSION = "1"
+
+# Text prompt for color analysis
+PALETTE_PROMPT = (
+    "Analyze the provided interior design image and evaluate the dominant colors "
+    "Provide a list of 5-7 key colors in JSON format. "
+    "For each color, include: "
+    "1. 'name' (common color name, e.g., 'Warm Brown') "
+    "2. 'hex' (hexadecimal color code, e.g., '#RRGGBB') "
+    "3. 'type' ('primary' or 'secondary' based on prominence). "
+    "The JSON should be an array of objects. Do NOT include any additional text or markdown outside the JSON block. "
+    "Example JSON format: "
+    "```json\n"
+    "[\n"
+    "  {\"name\": \"Warm Brown\", \"hex\": \"#876C55\", \"type\": \"primary\"},\n"
+    "  {\"name\": \"Light Beige\", \"hex\": \"#E3DACC\", \"type\": \"secondary\"}\n"
+    "]\n"
+)
+
+# Palettes are cached by image content, in memory and on disk, so reruns and
+# server restarts don't repeat the multimodal call for an image we've seen.
+PALETTE_CACHE_DIR = os.getenv("PALETTE_CACHE_DIR", ".palette_cache")
+PALETTE_CACHE_MAX_BYTES = int(os.getenv("PALETTE_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+palette_cache = ResponseCache(PALETTE_CACHE_DIR, PALETTE_CACHE_MAX_BYTES, memory_items=256)
+
+# "tiered" computes the palette locally and only asks Gemini when the local
+# result is unreliable or friendly names are requested; "llm" always asks Gemini.
+PALETTE_MODE = os.getenv("PALETTE_MODE", "tiered").lower()
+
+# Bump whenever the local palette logic changes so cached local palettes are recomputed
+LOCAL_PALETTE_VERSION = "2"
+LOCAL_PALETTE_NUM_COLORS = 6
+# Below this clustering confidence the local palette is not trusted
+LOCAL_PALETTE_MIN_CONFIDENCE = float(os.getenv("LOCAL_PALETTE_MIN_CONFIDENCE", "0.5"))
+# Colors covering at least this share of the image are labelled primary
+PRIMARY_COLOR_MIN_PROPORTION = 0.15
+
+def get_palette_cache_key(image_path, source="llm"):
+    """
+    Key a palette by the SHA-256 of the image bytes and the version of whatever produced it.
+
+    LLM palettes are also keyed by backend, so a fake backend's made-up palette
+    is never served to a Vertex run.
+    """
+    if source == "local":
+        return make_cache_key(
+            image_sha256=file_digest(image_path),
+            source="local",
+            version=LOCAL_PALETTE_VERSION
+        )
+    return make_cache_key(
+        image_sha256=file_digest(image_path),
+        prompt_version=PALETTE_PROMPT_VERSION,
+        model=MODEL_NAME,
+        backend=MODEL_BACKEND
+    )
+
+def _cache_palette(cache_key, palette_json, image_path):
+    try:
+        palette_cache.put(cache_key, palette_json)
+    except OSError as e:
+        logger.warning(f"Could not cache palette for {image_path}: {e}")
+
+def get_local_palette(image_path):
+    """
+    Compute a palette locally, in the same JSON shape the LLM returns.
+
+    Colors are typed by pixel proportion: those covering at least
+    PRIMARY_COLOR_MIN_PROPORTION of the image (and always the most prominent one)
+    are 'primary', the rest 'secondary'.
+
+    Returns:
+        tuple: (JSON string of the palette, clustering confidence in [0, 1])
+    """
+    colors, confidence = analyze_palette(image_path, LOCAL_PALETTE_NUM_COLORS)
+    names = nearest_color_names([color['rgb'] for color in colors])
+    palette = []
+    for idx, (color, name) in enumerate(zip(colors, names)):
+        is_primary = idx == 0 or color['proportion'] >= PRIMARY_COLOR_MIN_PROPORTION
+        palette.append({
+            "name": name,
+            "hex": "#{:02X}{:02X}{:02X}".format(*color['rgb']),
+            "type": "primary" if is_primary else "secondary"
+        })
+    return json.dumps(palette), confidence
+
+def get_llm_palette(image_path):
+    """Ask Gemini for the palette; returns the JSON string or None if none was found."""
+    # Imported here: most palettes come from the local extractor, which doesn't need the SDK
+    from vertexai.generative_models import Part
+
+    # Load the model (Vertex or the local fake, depending on MODEL_BACKEND)
+    model = load_text_model(MODEL_NAME)
+
+    # Downscaled, correctly typed raw bytes; dominant colors don't need the full image
+    payload = load_image_payload(image_path)
+
+    # Construct the multimodal content
+    contents = [
+        Part.from_text(PALETTE_PROMPT),
+        Part.from_data(data=payload.data, mime_type=payload.mime_type)
+    ]
+
+    # Generate content using the model
+    response = call_with_retry(MODEL_NAME, model.generate_content, contents)
+
+    # Extract the response text
+    raw_text_response = ""
+    for part in response.candidates[0].content.parts:
+        if part.text:
+            raw_text_response += part.text
+
+    # Extract JSON from the response
+    json_match = re.search(r"```json\s*(\{.*\}|\[.*\])\s*```", raw_text_response, re.DOTALL)
+    return json_match.group(1) if json_match else None
+
+def get_image_colors(image_path, use_cache=True, mode=None, friendly_names=False):
     """
     Analyze an image and return its color palette in JSON format.
     
     Args:
         image_path (str): Path to the image file to analyze
+        use_cache (bool): Reuse a previously computed palette for the same image content
+        mode (str): "tiered" or "llm"; defaults to PALETTE_MODE
+        friendly_names (bool): In tiered mode, ask Gemini for human-friendly color names
         
     Returns:
         str: JSON string containing the color palette information
     """
-    MODEL_NAME = "gemini-2.0-flash-001"
-    project_id = os.getenv("GOOGLE_CLOUD_PROJECT")
-    location = os.getenv("GOOGLE_CLOUD_LOCATION")
-
-    # Initialize Vertex AI
-    vertexai.init(project=project_id, location=location)
-    
-    # Load the model
-    model = GenerativeModel(MODEL_NAME)
-
+    mode = (mode or PALETTE_MODE).lower()
     try:
-        # Read and encode the image
-        with open(image_path, "rb") as image_file:
-            image_bytes = image_file.read()
-        encoded_image = base64.b64encode(image_bytes).decode("utf-8")
-        mime_type = "image/jpeg"  # Adjust based on your image type if needed
-
-        # Define the text prompt for color analysis
-        text_prompt = (
-            "Analyze the provided interior design image and evaluate the dominant colors "
-            "Provide a list of 5-7 key colors in JSON format. "
-            "For each color, include: "
-            "1. 'name' (common color name, e.g., 'Warm Brown') "
-            "2. 'hex' (hexadecimal color code, e.g., '#RRGGBB') "
-            "3. 'type' ('primary' or 'secondary' based on prominence). "
-            "The JSON should be an array of objects. Do NOT include any additional text or markdown outside the JSON block. "
-            "Example JSON format: "
-            "```json\n"
-            "[\n"
-            "  {\"name\": \"Warm Brown\", \"hex\": \"#876C55\", \"type\": \"primary\"},\n"
-            "  {\"name\": \"Light Beige\", \"hex\": \"#E3DACC\", \"type\": \"secondary\"}\n"
-            "]\n"
-        )
+        with span("color_analysis", mode=mode) as analysis:
+            if mode == "tiered" and not friendly_names:
+                local_key = get_palette_cache_key(image_path, source="local") if use_cache else None
+                if local_key:
+                    cached_palette = palette_cache.get(local_key)
+                    if cached_palette is not None:
+                        analysis['source'] = "local_cache"
+                        return cached_palette
 
-        # Construct the multimodal content
-        contents = [
-            Part.from_text(text_prompt),
-            Part.from_data(data=encoded_image, mime_type=mime_type)
-        ]
+                palette_json, confidence = get_local_palette(image_path)
+                if confidence >= LOCAL_PALETTE_MIN_CONFIDENCE:
+                    analysis['source'] = "local"
+                    if local_key:
+                        _cache_palette(local_key, palette_json, image_path)
+                    return palette_json
+                logger.info(f"Local palette confidence {confidence:.2f} too low for {image_path}, asking Gemini")
 
-        # Generate content using the model
-        response = model.generate_content(contents)
-        
-        # Extract the response text
-        raw_text_response = ""
-        for part in response.candidates[0].content.parts:
-            if part.text:
-                raw_text_response += part.text
-
-        # Extract JSON from the response
-        json_match = re.search(r"```json\s*(\{.*\}|\[.*\])\s*```", raw_text_response, re.DOTALL)
-        
-        if json_match:
-            return json_match.group(1)
-        else:
-            return None
+            cache_key = None
+            if use_cache:
+                cache_key = get_palette_cache_key(image_path)
+                cached_palette = palette_cache.get(cache_key)
+                if cached_palette is not None:
+                    analysis['source'] = "llm_cache"
+                    return cached_palette
+
+            analysis['source'] = "llm"
+            palette_json = get_llm_palette(image_path)
+            if palette_json and cache_key:
+                _cache_palette(cache_key, palette_json, image_path)
+            return palette_json
 
     except FileNotFoundError:
         raise FileNotFoundError(f"Error: Image not found at {image_path}")
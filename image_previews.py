@@ -0,0 +1,135 @@
+"""
+Display-sized previews of generated images.
+
+Generated images are 1024px+ JPEGs; Streamlit re-reads and re-sends whatever
+st.image gets on every rerun. Previews are rendered once, when an image is
+saved, and cached by the SHA-256 of the original's bytes, so the UI shows a
+small file and the originals are only read for downloads.
+"""
+import io
+import os
+import logging
+from typing import Iterable, List, Optional
+
+from PIL import Image, features
+
+from content_hash import bytes_digest, file_digest
+from image_sink import ImageBytes, run_image_io, submit_image_io, write_image_bytes
+from response_cache import ResponseCache, make_cache_key
+
+logger = logging.getLogger(__name__)
+
+# Bump whenever the preview rendering changes so old previews are re-rendered
+PREVIEW_VERSION = "1"
+
+PREVIEW_CACHE_DIR = os.getenv("PREVIEW_CACHE_DIR", ".preview_cache")
+PREVIEW_CACHE_MAX_BYTES = int(os.getenv("PREVIEW_CACHE_MAX_BYTES", str(128 * 1024 * 1024)))
+# Longest side of a preview; the option grid and report columns are narrower than this
+PREVIEW_MAX_SIDE = int(os.getenv("PREVIEW_MAX_SIDE", "768"))
+PREVIEW_QUALITY = int(os.getenv("PREVIEW_QUALITY", "80"))
+# "jpeg" or "webp"; WebP is smaller but falls back to JPEG if Pillow lacks it
+PREVIEW_FORMAT = os.getenv("PREVIEW_FORMAT", "jpeg").lower()
+if PREVIEW_FORMAT == "webp" and not features.check("webp"):
+    logger.warning("Pillow was built without WebP support; writing JPEG previews")
+    PREVIEW_FORMAT = "jpeg"
+
+
+class PreviewCache(ResponseCache):
+    """The response cache's sharded, LRU-evicted layout, holding image files instead of JSON."""
+
+    def __init__(self, root: str, max_bytes: int, image_format: str):
+        super().__init__(root, max_bytes)
+        self.entry_suffix = f".{image_format}"
+
+    def cached_path(self, key: str) -> Optional[str]:
+        """Return the preview's path if it is cached, marking it recently used."""
+        path = self._entry_path(key)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return path
+
+    def put_bytes(self, key: str, data: bytes) -> str:
+        """Atomically store an encoded preview and return its path."""
+        path = write_image_bytes(data, self._entry_path(key))
+        self._record_write(len(data))
+        return path
+
+
+preview_cache = PreviewCache(PREVIEW_CACHE_DIR, PREVIEW_CACHE_MAX_BYTES, PREVIEW_FORMAT)
+
+
+def preview_key(image_sha256: str) -> str:
+    return make_cache_key(
+        image_sha256=image_sha256,
+        max_side=PREVIEW_MAX_SIDE,
+        format=PREVIEW_FORMAT,
+        quality=PREVIEW_QUALITY,
+        version=PREVIEW_VERSION
+    )
+
+
+def render_preview(data: ImageBytes, max_side: int = PREVIEW_MAX_SIDE, image_format: str = PREVIEW_FORMAT,
+                   quality: int = PREVIEW_QUALITY) -> bytes:
+    """Downscale an encoded image so its longest side is at most max_side and re-encode it."""
+    with Image.open(io.BytesIO(data)) as image:
+        # Let the JPEG decoder skip straight to a reduced scale
+        image.draft("RGB", (max_side, max_side))
+        preview = image.convert("RGB")
+    preview.thumbnail((max_side, max_side), Image.LANCZOS)
+    buffer = io.BytesIO()
+    if image_format == "webp":
+        preview.save(buffer, format="WEBP", quality=quality, method=4)
+    else:
+        preview.save(buffer, format="JPEG", quality=quality, optimize=True, progressive=True)
+    return buffer.getvalue()
+
+
+def create_preview(data: ImageBytes) -> Optional[str]:
+    """Render and cache the preview of an image's bytes; returns its path, or None if it can't be rendered."""
+    key = preview_key(bytes_digest(data))
+    path = preview_cache.cached_path(key)
+    if path:
+        return path
+    try:
+        preview = render_preview(data)
+        path = preview_cache.put_bytes(key, preview)
+    except (OSError, ValueError) as e:
+        logger.warning(f"Could not create image preview: {e}")
+        return None
+    logger.debug(f"Created preview {os.path.basename(path)}: {len(data)} -> {len(preview)} bytes")
+    return path
+
+
+async def create_preview_async(data: ImageBytes) -> Optional[str]:
+    """create_preview on the image I/O executor."""
+    return await run_image_io(create_preview, data)
+
+
+def create_previews(images: Iterable[ImageBytes]) -> List[Optional[str]]:
+    """Create previews for several images in parallel from synchronous code."""
+    futures = [submit_image_io(create_preview, data) for data in images]
+    return [future.result() for future in futures]
+
+
+def preview_for(image_path: str) -> str:
+    """
+    Path to show in the UI for image_path: its cached preview, created on demand.
+
+    Falls back to the original if no preview can be made, so display never breaks.
+    """
+    try:
+        path = preview_cache.cached_path(preview_key(file_digest(image_path)))
+        if path:
+            return path
+        with open(image_path, "rb") as f:
+            data = f.read()
+    except OSError as e:
+        logger.warning(f"Could not read {image_path} for preview: {e}")
+        return image_path
+    return create_preview(data) or image_path
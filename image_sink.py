@@ -0,0 +1,73 @@
+import os
+import asyncio
+import tempfile
+import functools
+import logging
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Iterable, List, Tuple, TypeVar, Union
+
+logger = logging.getLogger(__name__)
+
+# Dedicated threads for image writes, so disk I/O never runs on the event loop
+# and doesn't compete with model calls for the default executor.
+IMAGE_IO_WORKERS = int(os.getenv("IMAGE_IO_WORKERS", "4"))
+
+# fsync every image before it is renamed into place (slower, survives power loss)
+IMAGE_SINK_FSYNC = os.getenv("IMAGE_SINK_FSYNC", "False").lower() == "true"
+
+_io_executor = ThreadPoolExecutor(max_workers=IMAGE_IO_WORKERS, thread_name_prefix="image-io")
+
+ImageBytes = Union[bytes, bytearray, memoryview]
+T = TypeVar("T")
+
+
+def write_image_bytes(data: ImageBytes, image_path: str, fsync: bool = IMAGE_SINK_FSYNC) -> str:
+    """
+    Write raw image bytes to image_path atomically.
+
+    The bytes are written as-is (a memoryview avoids any copy) to a hidden
+    temporary file in the same directory, which is then renamed over the
+    target, so readers never see a partially written image.
+    """
+    directory = os.path.dirname(image_path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".", suffix=".part")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(memoryview(data))
+            if fsync:
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(tmp_path, image_path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+    return image_path
+
+
+async def run_image_io(fn: Callable[..., T], *args: Any) -> T:
+    """Run blocking image work (writes, resizes) on the image I/O executor."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_io_executor, functools.partial(fn, *args))
+
+
+def submit_image_io(fn: Callable[..., T], *args: Any) -> "Future[T]":
+    """Queue blocking image work on the image I/O executor from synchronous code."""
+    return _io_executor.submit(fn, *args)
+
+
+async def save_image_bytes(data: ImageBytes, image_path: str, fsync: bool = IMAGE_SINK_FSYNC) -> str:
+    """Write raw image bytes on the image I/O executor without blocking the event loop."""
+    return await run_image_io(write_image_bytes, data, image_path, fsync)
+
+
+def write_images(images: Iterable[Tuple[ImageBytes, str]], fsync: bool = IMAGE_SINK_FSYNC) -> List[str]:
+    """Write several (bytes, path) pairs in parallel from synchronous code; returns the paths in order."""
+    futures = [
+        submit_image_io(write_image_bytes, data, image_path, fsync)
+        for data, image_path in images
+    ]
+    return [future.result() for future in futures]
@@ -1,40 +1,33 @@
 import os
 import asyncio
-import base64
-import re
-import json
 import shutil
+import hashlib
+import tempfile
+import uuid
 from datetime import datetime
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Tuple, Union, Callable
 from functools import lru_cache
 import logging
-from markdown import markdown
-import io
 import zipfile
-import streamlit as st
+# Streamlit and the Vertex AI SDK are imported where they are first used, so
+# batch runs and job workers start without them (see model_backends)
 
-import google.generativeai as genai
-import vertexai
-from vertexai.generative_models import GenerativeModel
-from vertexai.preview.vision_models import ImageGenerationModel
-
-
-from google.cloud import aiplatform
-from google.cloud.aiplatform.gapic.schema import predict
-from google.protobuf import json_format
-import google.protobuf.struct_pb2
+from response_cache import ResponseCache, make_cache_key
+from image_sink import save_image_bytes
+from image_previews import create_preview_async
+from vertex_client import acall_with_retry
+from model_backends import MODEL_BACKEND, load_text_model, load_image_model
+from tracing import trace_request, span, new_request_id
+from report_document import ImageRef, Section, split_title, sections_to_markdown
+from report_writer import IncrementalReportWriter, PARTIAL_REPORT_TAIL, is_complete_report
+from storage import create_job_dir, job_dir, touch_job
+from job_runner import JobError, get_job_runner
 
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Your existing code
-project_id = os.getenv("GOOGLE_CLOUD_PROJECT")
-location = os.getenv("GOOGLE_CLOUD_LOCATION")
-
-vertexai.init(project=project_id, location=location)
-
 # Initialize API keys and configurations
 #genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
 
@@ -43,6 +36,36 @@ vertexai.init(project=project_id, location=location)
 TEST_MODE = os.getenv("TEST_MODE", "False").lower() == "true"
 TEST_RESPONSES_DIR = "test_responses"
 
+# Maximum number of sections whose images are generated at the same time
+SECTION_CONCURRENCY = int(os.getenv("SECTION_CONCURRENCY", "4"))
+
+# Stream the text response and start image work as each section completes
+STREAM_TEXT = os.getenv("STREAM_TEXT", "False").lower() == "true"
+
+# Downloadable report archive, cached next to generated.html
+REPORT_ARCHIVE_NAME = "interior_design_report.zip"
+# Formats that are already compressed; deflating them only burns CPU
+PRECOMPRESSED_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp')
+
+# Content-addressed cache for text responses, shared by every process on the host
+RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE_ENABLED", "True").lower() == "true"
+RESPONSE_CACHE_DIR = os.getenv("RESPONSE_CACHE_DIR", ".response_cache")
+RESPONSE_CACHE_MAX_BYTES = int(os.getenv("RESPONSE_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+response_cache = ResponseCache(RESPONSE_CACHE_DIR, RESPONSE_CACHE_MAX_BYTES)
+
+TEXT_MODEL_NAME = "gemini-2.0-flash-001"
+IMAGE_MODEL_NAME = "imagegeneration@006"
+# Generation parameters sent with every text request (part of the cache key)
+TEXT_GENERATION_CONFIG: Dict[str, Any] = {}
+
+# Share of a report's progress bar given to writing the text; the images get the rest
+TEXT_PROGRESS_SHARE = 0.3
+
+# Images requested for every section before they were planned per section; kept for the savings report
+LEGACY_IMAGES_PER_SECTION = 4
+# Keywords in a section's title that earn it one extra view after the body
+EXTRA_SECTION_VIEWS = ("furniture", "lighting")
+
 # Define the prompt template for text generation
 TEXT_GENERATION_PROMPT_TEMPLATE = """
 Create a detailed interior design concept for a {user_room_type} in {user_design_style} style with a {user_color_scheme} color scheme.
@@ -60,167 +83,95 @@ Please provide a comprehensive design plan including:
 Format the response in markdown with clear section headers (##) for each major component.
 """
 
+# Default text used in test mode when nothing has been cached for a prompt yet
+DEFAULT_TEST_RESPONSE = """
+## Overall Concept and Style
+This is a test response for the interior design generator. It demonstrates the structure and formatting of the output.
+
+## Color Scheme and Materials
+- Primary colors: Test colors
+- Materials: Test materials
+
+## Furniture and Layout
+- Test furniture arrangement
+- Test layout details
+
+## Decorative Elements
+- Test decorative items
+- Test styling elements
+"""
+
 def ensure_test_responses_dir():
     """Ensure the test responses directory exists."""
     os.makedirs(TEST_RESPONSES_DIR, exist_ok=True)
 
-def get_test_response_key(room_type: str, design_style: str, color_palette: str) -> str:
-    """Generate a unique key for test responses based on input parameters."""
-    if TEST_MODE:
-        return "test_response"  # Always return the same key in test mode
-    return f"{room_type}_{design_style}_{color_palette}".lower().replace(" ", "_")
-
-def save_test_response(key: str, response: str):
-    """Save a test response to a file."""
-    ensure_test_responses_dir()
-    file_path = os.path.join(TEST_RESPONSES_DIR, f"{key}.json")
-    with open(file_path, 'w', encoding='utf-8') as f:
-        json.dump({'response': response}, f)
-
-def load_test_response(key: str) -> Optional[str]:
-    """Load a test response from a file."""
-    if TEST_MODE and not os.path.exists(os.path.join(TEST_RESPONSES_DIR, f"{key}.json")):
-        # If in test mode and no test response exists, create a default one
-        default_response = """
-        ## Overall Concept and Style
-        This is a test response for the interior design generator. It demonstrates the structure and formatting of the output.
-        
-        ## Color Scheme and Materials
-        - Primary colors: Test colors
-        - Materials: Test materials
-        
-        ## Furniture and Layout
-        - Test furniture arrangement
-        - Test layout details
-        
-               
-        ## Decorative Elements
-        - Test decorative items
-        - Test styling elements
-        
-        """
-        save_test_response(key, default_response)
-        return default_response
+def get_text_cache_key(text_prompt: str) -> str:
+    """Key a text response by the rendered prompt, model, generation parameters and backend."""
+    return make_cache_key(
+        prompt=text_prompt,
+        model=TEXT_MODEL_NAME,
+        generation_config=TEXT_GENERATION_CONFIG,
+        # The fake backend's canned text must never be served to a Vertex run
+        backend=MODEL_BACKEND
+    )
 
-    file_path = os.path.join(TEST_RESPONSES_DIR, f"{key}.json")
-    if os.path.exists(file_path):
-        with open(file_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-            return data.get('response')
-    return None
+def get_cached_text_response(cache_key: str) -> Optional[str]:
+    """Return a cached text response, if caching is enabled and one exists."""
+    if not (RESPONSE_CACHE_ENABLED or TEST_MODE):
+        return None
+    return response_cache.get(cache_key)
+
+def cache_text_response(cache_key: str, response: str):
+    """Store a non-empty text response in the response cache; test mode never writes to it."""
+    if TEST_MODE or not RESPONSE_CACHE_ENABLED or not response or not response.strip():
+        return
+    try:
+        response_cache.put(cache_key, response)
+    except OSError as e:
+        logger.warning(f"Could not cache text response: {e}")
 
 # Cache for model instances
 @lru_cache(maxsize=2)
 def get_text_model():
-    vertexai.init(project=project_id, location=location)
-    model = GenerativeModel("gemini-2.0-flash-001")
+    # Vertex or the local fake, depending on MODEL_BACKEND
+    model = load_text_model(TEXT_MODEL_NAME)
     # return genai.GenerativeModel(model_name='gemini-1.5-flash')
     return model
 
 
 @lru_cache(maxsize=1)
 def get_image_model():
-    vertexai.init(project=project_id, location=location)
-    return ImageGenerationModel.from_pretrained("imagegeneration@006")
+    return load_image_model(IMAGE_MODEL_NAME)
 
 def setup_output_directory() -> str:
-    """Create a timestamped output directory and return its path."""
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    output_dir = f"generated_content_{timestamp}"
-    os.makedirs(output_dir, exist_ok=True)
-    return output_dir
-
-def save_to_html(content: str, output_dir: str) -> str:
-    """Save markdown content as HTML file."""
-    # First, convert the content to HTML
-    html_content = markdown(content, extensions=['extra', 'codehilite'], output_format='html5')
-    
-    # Remove any ">" characters that might have been added to captions
-    html_content = html_content.replace('&gt;', '')
-    
-    # Create the full HTML document
-    full_html = f"""<!DOCTYPE html>
-    <html>
-    <head>
-        <meta charset="UTF-8">
-        <meta name="viewport" content="width=device-width, initial-scale=1.0">
-        <title>Generated Interior Design Content</title>
-        <style>
-            body {{ 
-                font-family: Arial, sans-serif; 
-                line-height: 1.6; 
-                max-width: 1200px; 
-                margin: 0 auto; 
-                padding: 20px;
-                color: #333;
-            }}
-            h1, h2 {{ 
-                color: #2c3e50;
-                margin-top: 1.5em;
-                margin-bottom: 0.5em;
-            }}
-            .section {{
-                margin-bottom: 40px;
-                padding: 20px;
-                background: #fff;
-                border-radius: 8px;
-                box-shadow: 0 1px 3px rgba(0,0,0,0.1);
-            }}
-            .section-image {{
-                margin-bottom: 20px;
-                text-align: center;
-            }}
-            .section-image img {{ 
-                max-width: 100%;
-                height: auto;
-                max-height: 500px;
-                object-fit: cover;
-                border-radius: 8px;
-                box-shadow: 0 2px 4px rgba(0,0,0,0.1);
-            }}
-            .image-caption {{
-                margin-top: 8px;
-                font-size: 1.1em;
-                color: #666;
-                font-style: italic;
-            }}
-            p {{
-                margin-bottom: 1em;
-            }}
-            @media (max-width: 768px) {{
-                .section-image img {{
-                    max-height: 300px;
-                }}
-            }}
-        </style>
-    </head>
-    <body>
-    {html_content}
-    </body>
-    </html>"""
-    
-    html_path = os.path.join(output_dir, "generated.html")
-    with open(html_path, "w", encoding="utf-8") as f:
-        f.write(full_html)
-    return html_path
-
-def save_image_from_base64(base64_image_bytes: str, image_alt: str, section_title: str, output_dir: str) -> str:
-    """Saves a base64 encoded image to a file in the output directory."""
+    """Create a unique job directory under OUTPUT_ROOT and return its path."""
+    return create_job_dir()
+
+def save_to_html(content: Union[str, List[Section]], output_dir: str) -> str:
+    """Save markdown content (or the report's sections) as HTML file."""
+    with span("html_render"):
+        writer = IncrementalReportWriter(output_dir)
+        if isinstance(content, str):
+            writer.add_markdown(0, content)
+            return writer.finalize()
+        return writer.finalize(content)
+
+async def save_section_image(image_bytes: bytes, image_alt: str, section_title: str, output_dir: str) -> str:
+    """Saves raw image bytes to a file in the output directory."""
     try:
-        image_data = base64.b64decode(base64_image_bytes)
         # Create a shorter, unique filename
         timestamp = datetime.now().strftime("%H%M%S")
         safe_section_title = "".join(c if c.isalnum() else "_" for c in section_title)[:30]
         safe_image_alt = "".join(c if c.isalnum() else "_" for c in image_alt[:10])
-        image_filename = f"{safe_section_title}_{safe_image_alt}_{timestamp}.jpeg"
+        image_filename = f"{safe_section_title}_{safe_image_alt}_{timestamp}_{uuid.uuid4().hex[:6]}.jpeg"
         image_path = os.path.join(output_dir, image_filename)
 
-        # Ensure the output directory exists
-        os.makedirs(output_dir, exist_ok=True)
-
-        # Save the image
-        with open(image_path, "wb") as f:
-            f.write(image_data)
+        # Save the image on the image I/O executor
+        with span("image_save", bytes=len(image_bytes)):
+            await save_image_bytes(memoryview(image_bytes), image_path)
+        # Render the display-sized preview now, so the report view never resizes on a rerun
+        with span("image_preview"):
+            await create_preview_async(image_bytes)
         
         logger.info(f"Saved image as {image_filename}")
         return image_path
@@ -228,60 +179,83 @@ def save_image_from_base64(base64_image_bytes: str, image_alt: str, section_titl
         logger.error(f"Could not save image '{image_alt}': {e}")
         return ""
 
-def parse_sections(full_markdown_text: str) -> List[str]:
-    """Efficiently parse markdown sections."""
-    parts = full_markdown_text.split("\n## ")
-    sections = []
-    
-    if not parts:
+class SectionStreamParser:
+    """Incrementally split streamed markdown into Sections as each one closes.
+
+    A section is complete once the next "\n## " header arrives; the last one is
+    only complete when the stream ends, so call close() to flush it.
+    """
+
+    def __init__(self):
+        self._buffer = ""
+        self._parts_seen = 0
+
+    def _clean_part(self, part: str) -> Optional[str]:
+        if not part.strip():
+            return None
+        # Leading text before the first header is kept as an introduction
+        if self._parts_seen == 0 and not part.lstrip().startswith("## "):
+            return part.strip()
+        # Remove any leading ## if present and clean up the section
+        clean_part = part.strip()
+        if clean_part.startswith("##"):
+            clean_part = clean_part[2:].strip()
+        return clean_part
+
+    def feed(self, text: str) -> List[Section]:
+        """Add a chunk of text and return any sections it completed."""
+        self._buffer += text
+        parts = self._buffer.split("\n## ")
+        # The trailing part may still grow (or hold half a delimiter)
+        self._buffer = parts.pop()
+        sections = []
+        for part in parts:
+            section = self._clean_part(part)
+            self._parts_seen += 1
+            if section:
+                sections.append(Section.from_markdown(section))
         return sections
-        
-    # Handle first section (introduction)
-    if not full_markdown_text.lstrip().startswith("## ") and parts[0].strip():
-        sections.append(parts[0].strip())
-        parts = parts[1:]
-    
-    # Handle remaining sections
-    for part in parts:
-        if part.strip():
-            # Remove any leading ## if present and clean up the section
-            clean_part = part.strip()
-            if clean_part.startswith("##"):
-                clean_part = clean_part[2:].strip()
-            sections.append(clean_part)  # Don't add ## prefix here
-    
-    return sections
+
+    def close(self) -> List[Section]:
+        """Flush the final section once the stream has ended."""
+        section = self._clean_part(self._buffer)
+        self._buffer = ""
+        self._parts_seen += 1
+        return [Section.from_markdown(section)] if section else []
+
+    @property
+    def pending_title(self) -> Optional[str]:
+        """Title of the section still being streamed, once its header line is complete."""
+        if "\n" not in self._buffer.lstrip() or self._clean_part(self._buffer) is None:
+            return None
+        return split_title(self._clean_part(self._buffer))[0]
+
+def parse_sections(full_markdown_text: str) -> List[Section]:
+    """Parse the model's markdown into Sections, once."""
+    parser = SectionStreamParser()
+    return parser.feed(full_markdown_text) + parser.close()
 
 def extract_section_title(section_content: str) -> str:
     """Extract section title from markdown content."""
-    # First try to match ## prefix
-    match = re.match(r"##\s*(.*?)\n", section_content, re.IGNORECASE)
-    if match:
-        return match.group(1).strip()
-    
-    # If no ## prefix, try to get the first line
-    first_line = section_content.split('\n')[0].strip()
-    if first_line:
-        return first_line
-    
-    return "Untitled Section"
+    return split_title(section_content)[0]
 
-async def generate_section_image(section_content: str, section_title: str, room_type: str, design_style: str, color_palette: str, output_dir: str) -> List[str]:
-    """Generate image for a section using cached model."""
+async def generate_section_image(section_body: str, section_title: str, room_type: str, design_style: str, color_palette: str, output_dir: str, number_of_images: int = LEGACY_IMAGES_PER_SECTION) -> List[str]:
+    """Generate number_of_images images for a section using cached model."""
     if TEST_MODE:
         # In test mode, use existing images from test_responses folder
+        ensure_test_responses_dir()
         test_images = [f for f in os.listdir(TEST_RESPONSES_DIR) if f.endswith(('.jpg', '.jpeg', '.png'))]
         if test_images:
             # Use the first available test image
             test_image_path = os.path.join(TEST_RESPONSES_DIR, test_images[0])
             # Copy the test image to the output directory with section-specific name
             output_image_path = os.path.join(output_dir, f"{section_title}.jpeg")
-            shutil.copy2(test_image_path, output_image_path)
+            await asyncio.to_thread(shutil.copy2, test_image_path, output_image_path)
             return [output_image_path]
         return []
     
     # Normal mode - generate image using the model
-    image_prompt_text_body = re.sub(r"##+\s*.*?\n", '', section_content, count=1).strip()[:300]
+    image_prompt_text_body = section_body.strip()[:300]
     image_prompt = (
         f"High-quality interior design photograph. Room type: {room_type}. "
         f"Design style: {design_style}. Color palette: {color_palette}. "
@@ -290,32 +264,26 @@ async def generate_section_image(section_content: str, section_title: str, room_
     
     try:
         img_model = get_image_model()
-        logger.info(f"Generating images for section: {section_title}")
-        response = await asyncio.to_thread(
-            img_model.generate_images,
-            prompt=image_prompt,
-            number_of_images=4,
-            language="en",
-            aspect_ratio="1:1",
-            safety_filter_level="block_some",
-            person_generation="allow_adult"
-        )
+        logger.info(f"Generating {number_of_images} images for section: {section_title}")
+        with span("section_image", section=section_title, requested=number_of_images):
+            response = await acall_with_retry(
+                IMAGE_MODEL_NAME,
+                img_model.generate_images,
+                prompt=image_prompt,
+                number_of_images=number_of_images,
+                language="en",
+                aspect_ratio="1:1",
+                safety_filter_level="block_some",
+                person_generation="allow_adult"
+            )
         
         if response and response.images:
-            # Save all generated images
-            image_paths = []
-            for i, image in enumerate(response.images):
-                logger.info(f"Processing image {i+1} for section: {section_title}")
-                generated_image_bytes_base64 = base64.b64encode(image._image_bytes).decode('utf-8')
-                image_path = save_image_from_base64(
-                    generated_image_bytes_base64,
-                    f"view_{i+1}",
-                    section_title,
-                    output_dir
-                )
-                if image_path:
-                    image_paths.append(image_path)
-                    logger.info(f"Saved image {i+1} to: {image_path}")
+            # Save all generated images concurrently, straight from the raw bytes
+            saved_paths = await asyncio.gather(*(
+                save_section_image(image._image_bytes, f"view_{i+1}", section_title, output_dir)
+                for i, image in enumerate(response.images)
+            ))
+            image_paths = [image_path for image_path in saved_paths if image_path]
             
             if image_paths:
                 logger.info(f"Successfully generated {len(image_paths)} images for section: {section_title}")
@@ -329,157 +297,286 @@ async def generate_section_image(section_content: str, section_title: str, room_
     
     return []
 
-async def process_single_section(section_md_content: str, room_type: str, design_style: str, color_palette: str, output_dir: str) -> str:
-    """Process a single section including text and image generation."""
-    section_title = extract_section_title(section_md_content)
+def plan_section_images(section: Section) -> List[str]:
+    """
+    Captions of the images a section will show, in display order.
+
+    The length is how many images to request for it. Sections with only a title
+    show none; the rest get a lead image under the title and a second view after
+    the body, plus the extra views their title calls for.
+    """
+    if not section.body:
+        return []
+    title = section.title.lower()
+    view_count = min(2 + sum(keyword in title for keyword in EXTRA_SECTION_VIEWS), LEGACY_IMAGES_PER_SECTION)
+    # Views are numbered by where they appear, whichever keywords added them
+    return [section.title] + [f"{section.title} - View {view}" for view in range(2, view_count + 1)]
+
+async def process_single_section(section: Section, room_type: str, design_style: str, color_palette: str, output_dir: str) -> Section:
+    """Process a single section including text and image generation; returns it with its images attached."""
+    section_title = section.title
     logger.info(f"Processing section: {section_title}")
-    logger.info(f"Raw section content: {section_md_content[:100]}...")  # Log first 100 chars of content
-    
-    # Generate images for the section
+    logger.info(f"Raw section content: {section.body[:100]}...")  # Log first 100 chars of content
+
+    captions = plan_section_images(section)
+    if not captions:
+        # A section with only a title is shown without images, so don't generate any
+        return section
+
+    # Generate only the images the section will show
     try:
-        image_paths = await generate_section_image(section_md_content, section_title, room_type, design_style, color_palette, output_dir)
-        logger.info(f"Received {len(image_paths)} images for section: {section_title}")
-        
-        if image_paths:
-            # Split the section content at the first newline to insert image after title
-            section_lines = section_md_content.split('\n', 1)
-            if len(section_lines) > 1:
-                # Create HTML for the section
-                section_with_image = f"""## {section_title}
-
-{section_lines[1]}"""
-
-                # Add first image only to main title section
-                #if "overall concept" in section_title.lower() and len(image_paths) > 0:
-                first_image_path = image_paths[0]
-                first_image_filename = os.path.basename(first_image_path)
-                logger.info(f"Adding first image to main title section: {first_image_filename}")
-                section_with_image = f"""## {section_title}
-
-<div class="section-image">
-    <img src="{first_image_filename}" alt="{section_title}">
-    <div class="image-caption">{section_title}</div>
-</div>
-
-{section_lines[1]}"""
-
-                # Add second image only to Color Scheme section
-                #if "color scheme" in section_title.lower() and len(image_paths) > 1:
-                second_image_path = image_paths[1]
-                second_image_filename = os.path.basename(second_image_path)
-                logger.info(f"Adding second image to Color Scheme section: {second_image_filename}")
-                section_with_image += f"""
-
-<div class="section-image">
-    <img src="{second_image_filename}" alt="{section_title} - View 2">
-    <div class="image-caption">{section_title} - View 2</div>
-</div>"""
-
-                # Add third image only to Furniture section
-                if "furniture" in section_title.lower() and len(image_paths) > 2:
-                    third_image_path = image_paths[2]
-                    third_image_filename = os.path.basename(third_image_path)
-                    logger.info(f"Adding third image to Furniture section: {third_image_filename}")
-                    section_with_image += f"""
-
-<div class="section-image">
-    <img src="{third_image_filename}" alt="{section_title} - View 3">
-    <div class="image-caption">{section_title} - View 3</div>
-</div>"""
-
-                # Add fourth image only to Lighting section
-                if "lighting" in section_title.lower() and len(image_paths) > 3:
-                    fourth_image_path = image_paths[3]
-                    fourth_image_filename = os.path.basename(fourth_image_path)
-                    logger.info(f"Adding fourth image to Lighting section: {fourth_image_filename}")
-                    section_with_image += f"""
-
-<div class="section-image">
-    <img src="{fourth_image_filename}" alt="{section_title} - View 4">
-    <div class="image-caption">{section_title} - View 4</div>
-</div>"""
-            else:
-                # If no newline in content, just add the section title
-                section_with_image = f"""## {section_title}"""
-            
-            return section_with_image
+        image_paths = await generate_section_image(
+            section.body, section_title, room_type, design_style, color_palette, output_dir,
+            number_of_images=len(captions)
+        )
+        logger.info(f"Received {len(image_paths)} of {len(captions)} images for section: {section_title}")
+
+        # The model may return fewer images than asked for (e.g. safety filtering); show what came back
+        images = [
+            ImageRef(os.path.basename(image_path), caption, caption)
+            for image_path, caption in zip(image_paths, captions)
+        ]
+        if images:
+            return section.with_images(images)
     except Exception as e:
         logger.error(f"Error processing section '{section_title}': {e}", exc_info=True)
     
-    return section_md_content
-
-async def generate_content(room_type: str, design_style: str, color_palette: str, key_elements: str, inspirational_photo_details: str):
-    """Generate interior design content and display it in Streamlit."""
-    output_dir = setup_output_directory()
-    logger.info(f"Created output directory: {output_dir}")
-
-    text_prompt = TEXT_GENERATION_PROMPT_TEMPLATE.format(
-        user_room_type=room_type,
-        user_design_style=design_style,
-        user_color_scheme=color_palette,
-        user_key_design_elements=key_elements,
-        user_inspirational_photo_details=inspirational_photo_details
+    return section
+
+async def _process_section_with_limit(semaphore: asyncio.Semaphore, section: Section, room_type: str, design_style: str, color_palette: str, output_dir: str, index: int = 0, on_done: Optional[Callable[[int, Section], None]] = None) -> Section:
+    """Process a single section once a concurrency slot is free; on_done gets its index and the result."""
+    async with semaphore:
+        processed = await process_single_section(section, room_type, design_style, color_palette, output_dir)
+    if on_done:
+        on_done(index, processed)
+    return processed
+
+def _collect_section_results(sections: List[Section], results: List[Any]) -> List[Section]:
+    """Pair gathered results with their sections, keeping the text of failed ones."""
+    processed_sections = []
+    for section, result in zip(sections, results):
+        if isinstance(result, BaseException):
+            # Keep the section text so one failure doesn't drop it from the report
+            logger.error(f"Section failed, keeping its text without images: {result}", exc_info=result)
+            result = section
+        if result:
+            processed_sections.append(result)
+    return processed_sections
+
+async def process_sections_concurrently(sections: List[Section], room_type: str, design_style: str, color_palette: str, output_dir: str, max_concurrency: int = SECTION_CONCURRENCY, on_section_done: Optional[Callable[[int, Section, int], None]] = None) -> List[Section]:
+    """Process all sections at once, bounded by max_concurrency, preserving section order.
+
+    on_section_done, if given, is called with the section's index, the processed
+    section and the number of sections started so far each time one finishes.
+    """
+    semaphore = asyncio.Semaphore(max(1, max_concurrency))
+    on_done = (lambda index, processed: on_section_done(index, processed, len(sections))) if on_section_done else None
+    results = await asyncio.gather(
+        *(_process_section_with_limit(semaphore, section, room_type, design_style, color_palette, output_dir, index, on_done)
+          for index, section in enumerate(sections)),
+        return_exceptions=True
     )
+    return _collect_section_results(sections, results)
+
+async def stream_and_process_sections(text_model, text_prompt: str, room_type: str, design_style: str, color_palette: str, output_dir: str, max_concurrency: int = SECTION_CONCURRENCY, on_section_done: Optional[Callable[[int, Section, int], None]] = None) -> Tuple[str, List[Section]]:
+    """Stream the text response and start each section's images as soon as it closes.
+
+    Returns the full markdown text and the processed sections in their original order.
+    """
+    semaphore = asyncio.Semaphore(max(1, max_concurrency))
+    parser = SectionStreamParser()
+    sections = []
+    tasks = []
+    chunks = []
+    on_done = (lambda index, processed: on_section_done(index, processed, len(sections))) if on_section_done else None
+
+    def start_sections(completed: List[Section]):
+        for section in completed:
+            logger.info(f"Section complete in stream: {section.title}")
+            tasks.append(asyncio.create_task(
+                _process_section_with_limit(semaphore, section, room_type, design_style, color_palette, output_dir, len(sections), on_done)
+            ))
+            sections.append(section)
 
     try:
-        full_markdown_text = None
-        
-        if TEST_MODE:
-            # Try to load from test responses
-            test_key = get_test_response_key(room_type, design_style, color_palette)
-            full_markdown_text = load_test_response(test_key)
-            
-            if not full_markdown_text:
-                # If no test response exists, generate one and save it
+        response_stream = await acall_with_retry(
+            TEXT_MODEL_NAME,
+            text_model.generate_content_async,
+            text_prompt,
+            generation_config=TEXT_GENERATION_CONFIG or None,
+            stream=True
+        )
+        async for chunk in response_stream:
+            try:
+                chunk_text = chunk.text
+            except ValueError:
+                # Chunks without text (e.g. safety or finish metadata) carry nothing to parse
+                continue
+            chunks.append(chunk_text)
+            start_sections(parser.feed(chunk_text))
+        start_sections(parser.close())
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        raise
+
+    results = await asyncio.gather(*tasks, return_exceptions=True)
+    return "".join(chunks), _collect_section_results(sections, results)
+
+class ReportGenerationError(Exception):
+    """Raised when the model output can't be turned into a report."""
+
+    def __init__(self, message: str, markdown_text: Optional[str] = None):
+        super().__init__(message)
+        self.markdown_text = markdown_text
+
+async def generate_report(room_type: str, design_style: str, color_palette: str, key_elements: str, inspirational_photo_details: str, output_dir: Optional[str] = None, stream: bool = STREAM_TEXT, request_id: Optional[str] = None, progress: Optional[Callable[[float, str], None]] = None) -> Dict[str, Any]:
+    """
+    Generate an interior design report without touching Streamlit.
+
+    Every stage is timed under one correlation id (request_id, or a new one) and
+    the timeline is written to trace.json in the output directory. progress, if
+    given, is called with (fraction done, message) as the report advances.
+    generated.html is written as sections finish, so a report still being
+    generated already has a readable prefix on disk.
+
+    Returns:
+        dict: 'html_path', 'output_dir', 'sections' (processed Section objects),
+        'markdown_content' and 'request_id' of the finished report.
+
+    Raises:
+        ReportGenerationError: If the text was empty or contained no sections.
+    """
+    request_id = request_id or new_request_id()
+    report_progress = progress or (lambda fraction, message: None)
+    sections_done = 0
+    writer = None
+
+    def section_done(index: int, section: Section, sections_started: int):
+        nonlocal sections_done
+        sections_done += 1
+        writer.add_section(index, section)
+        report_progress(
+            TEXT_PROGRESS_SHARE + (0.95 - TEXT_PROGRESS_SHARE) * sections_done / max(sections_started, sections_done),
+            f"Illustrated {sections_done} of {sections_started} sections"
+        )
+
+    with trace_request(output_dir, request_id) as trace, span("report") as report_span:
+        if output_dir:
+            os.makedirs(output_dir, exist_ok=True)
+        else:
+            output_dir = setup_output_directory()
+        trace.output_dir = output_dir
+        logger.info(f"[{request_id}] Created output directory: {output_dir}")
+        writer = IncrementalReportWriter(output_dir)
+
+        text_prompt = TEXT_GENERATION_PROMPT_TEMPLATE.format(
+            user_room_type=room_type,
+            user_design_style=design_style,
+            user_color_scheme=color_palette,
+            user_key_design_elements=key_elements,
+            user_inspirational_photo_details=inspirational_photo_details
+        )
+
+        cache_key = get_text_cache_key(text_prompt)
+        processed_sections = None
+
+        report_progress(0.02, "Writing the design concept")
+        with span("text_generation", stream=stream) as text_span:
+            full_markdown_text = get_cached_text_response(cache_key)
+            if full_markdown_text:
+                text_span['source'] = "cache"
+                logger.info(f"[{request_id}] Using cached text response: {cache_key[:12]}")
+            elif TEST_MODE:
+                # Test mode never calls the text model
+                text_span['source'] = "test"
+                full_markdown_text = DEFAULT_TEST_RESPONSE
+            elif stream:
+                # Streaming mode - image work starts as each section arrives, so this
+                # span also covers the section image work that overlaps the stream
+                text_span['source'] = "model_stream"
+                text_model = get_text_model()
+                full_markdown_text, processed_sections = await stream_and_process_sections(
+                    text_model, text_prompt, room_type, design_style, color_palette, output_dir,
+                    on_section_done=section_done
+                )
+                cache_text_response(cache_key, full_markdown_text)
+            else:
+                # Normal mode - generate new content for prompts we haven't seen
+                text_span['source'] = "model"
                 text_model = get_text_model()
-                response = await text_model.generate_content_async(text_prompt)
+                response = await acall_with_retry(
+                    TEXT_MODEL_NAME,
+                    text_model.generate_content_async,
+                    text_prompt,
+                    generation_config=TEXT_GENERATION_CONFIG or None
+                )
                 full_markdown_text = response.text
-                save_test_response(test_key, full_markdown_text)
-                logger.info(f"Saved new test response for key: {test_key}")
-        else:
-            # Normal mode - always generate new content
-            text_model = get_text_model()
-            response = await text_model.generate_content_async(text_prompt)
-            full_markdown_text = response.text
+                cache_text_response(cache_key, full_markdown_text)
 
         if not full_markdown_text or full_markdown_text.strip() == "":
-            st.error('Failed to generate editorial text or text was empty.')
-            return
-
-        # Parse sections more efficiently
-        sections_markdown = parse_sections(full_markdown_text)
-        if not sections_markdown:
-            st.error("No sections found in generated text.")
-            st.markdown(full_markdown_text)
-            return
-
-        # Process sections sequentially to maintain inline order
-        processed_sections = []
-        for section in sections_markdown:
-            processed_section = await process_single_section(section, room_type, design_style, color_palette, output_dir)
-            if processed_section:
-                processed_sections.append(processed_section)
+            raise ReportGenerationError('Failed to generate editorial text or text was empty.')
+
+        if processed_sections is None:
+            # Parse sections more efficiently
+            sections = parse_sections(full_markdown_text)
+            if not sections:
+                raise ReportGenerationError("No sections found in generated text.", full_markdown_text)
+
+            # Process sections concurrently; results come back in inline order
+            report_progress(TEXT_PROGRESS_SHARE, f"Illustrating {len(sections)} sections")
+            processed_sections = await process_sections_concurrently(
+                sections, room_type, design_style, color_palette, output_dir,
+                on_section_done=section_done
+            )
+        elif not processed_sections:
+            raise ReportGenerationError("No sections found in generated text.", full_markdown_text)
+
+        images_planned = sum(len(plan_section_images(section)) for section in processed_sections)
+        images_legacy = LEGACY_IMAGES_PER_SECTION * len(processed_sections)
+        report_span['images_planned'] = images_planned
+        report_span['images_legacy'] = images_legacy
+        logger.info(
+            f"[{request_id}] Planned {images_planned} section images instead of {images_legacy} "
+            f"({images_legacy - images_planned} fewer generated and saved)"
+        )
 
         # Combine all processed sections with their images
-        final_content = "\n\n".join(processed_sections)
-        
-        # Save the complete content as HTML
-        html_path = save_to_html(final_content, output_dir)
-        logger.info(f"Saved HTML content to: {html_path}")
-        
-        # Store the generated content paths in session state
-        st.session_state.generated_content = {
+        final_content = sections_to_markdown(processed_sections)
+    
+        # Write the sections that didn't finish on their own and close the HTML
+        report_progress(0.97, "Rendering the report")
+        with span("html_render"):
+            html_path = writer.finalize(processed_sections)
+        logger.info(f"[{request_id}] Saved HTML content to: {html_path}")
+
+        return {
             'html_path': html_path,
             'output_dir': output_dir,
-            'markdown_content': final_content  # Store the markdown content as well
+            'sections': processed_sections,
+            'markdown_content': final_content,  # Store the markdown content as well
+            'request_id': request_id
         }
 
+async def generate_content(room_type: str, design_style: str, color_palette: str, key_elements: str, inspirational_photo_details: str, stream: bool = STREAM_TEXT):
+    """Generate interior design content and display it in Streamlit."""
+    import streamlit as st
+    try:
+        # Store the generated content paths in session state
+        st.session_state.generated_content = await generate_report(
+            room_type, design_style, color_palette, key_elements, inspirational_photo_details, stream=stream
+        )
+    except ReportGenerationError as e:
+        st.error(str(e))
+        if e.markdown_text:
+            st.markdown(e.markdown_text)
     except Exception as e:
         logger.error(f"An error occurred: {e}", exc_info=True)
         st.error(f"An error occurred: {str(e)}")
 
 def run_async_generate_content(room_type: str, design_style: str, color_palette: str, key_elements: str, inspirational_photo_details: str):
     """Wrapper function to run generate_content in a new event loop."""
+    import streamlit as st
     try:
         # Create a new event loop
         loop = asyncio.new_event_loop()
@@ -504,8 +601,35 @@ def run_async_generate_content(room_type: str, design_style: str, color_palette:
         st.error(f"An error occurred: {str(e)}")
         return None
 
+async def report_job(job_id: str, progress: Callable[[float, str], None], room_type: str, design_style: str, color_palette: str, key_elements: str, inspirational_photo_details: str, stream: bool = STREAM_TEXT) -> Dict[str, Any]:
+    """
+    Job runner entry point: generate a report into the job's own directory.
+
+    Returns the report in JSON-serializable form; report_from_job_result turns it back.
+    """
+    try:
+        report = await generate_report(
+            room_type, design_style, color_palette, key_elements, inspirational_photo_details,
+            output_dir=job_dir(job_id), stream=stream, request_id=job_id, progress=progress
+        )
+    except ReportGenerationError as e:
+        raise JobError(str(e), {'markdown_text': e.markdown_text} if e.markdown_text else None)
+    return {**report, 'sections': [section.to_dict() for section in report['sections']]}
+
+def report_from_job_result(result: Dict[str, Any]) -> Dict[str, Any]:
+    """Rebuild generated_content (with Section objects) from a finished report job."""
+    return {**result, 'sections': [Section.from_dict(section) for section in result['sections']]}
+
+def session_waiter() -> str:
+    """This browser session's id as a waiter on background jobs."""
+    import streamlit as st
+    if 'waiter_id' not in st.session_state:
+        st.session_state.waiter_id = uuid.uuid4().hex
+    return st.session_state.waiter_id
+
 def reset_session_state():
     """Reset all session state variables to their initial state."""
+    import streamlit as st
     st.session_state.form_data = {
         'room_type': '',
         'design_style': '',
@@ -516,34 +640,108 @@ def reset_session_state():
     st.session_state.generated_content = {
         'html_path': None,
         'output_dir': None,
+        'sections': None,
         'markdown_content': None
     }
     if 'zip_content' in st.session_state:
         del st.session_state.zip_content 
+    job_id = st.session_state.pop('job_id', None)
+    if job_id:
+        # Cancels the job if no other session is waiting for it
+        get_job_runner().release(job_id, session_waiter())
+    if "job" in st.query_params:
+        del st.query_params["job"]
+
+def _report_archive_files(html_path: str, output_dir: str) -> List[Tuple[str, str]]:
+    """List (path, name in archive) pairs for the HTML report and its images."""
+    files = [(html_path, os.path.basename(html_path))]
+    for root, _, filenames in os.walk(output_dir):
+        for filename in sorted(filenames):
+            if filename.endswith(('.jpg', '.jpeg', '.png')):
+                # Store images in the root directory of the zip
+                files.append((os.path.join(root, filename), filename))
+    return files
+
+def _report_archive_fingerprint(files: List[Tuple[str, str]]) -> str:
+    """Fingerprint the archive inputs by name, size and modification time."""
+    hasher = hashlib.sha1()
+    for file_path, archive_name in files:
+        file_stat = os.stat(file_path)
+        hasher.update(f"{archive_name}:{file_stat.st_size}:{file_stat.st_mtime_ns}\n".encode("utf-8"))
+    return hasher.hexdigest()
+
+def build_report_archive(html_path: str, output_dir: str) -> str:
+    """
+    Build the downloadable ZIP next to the HTML report, reusing it while the directory is unchanged.
+
+    A report that is still being written is archived as it stands, closed with a
+    note that the remaining sections are missing. The fingerprint of the inputs is stored as the ZIP comment, so checking whether
+    the cached archive is still current only needs a few stat() calls and a read
+    of the archive's tail.
+    """
+    archive_path = os.path.join(output_dir, REPORT_ARCHIVE_NAME)
+    files = _report_archive_files(html_path, output_dir)
+    fingerprint = _report_archive_fingerprint(files)
+
+    if os.path.exists(archive_path):
+        try:
+            with zipfile.ZipFile(archive_path) as existing:
+                if existing.comment == fingerprint.encode("ascii"):
+                    return archive_path
+        except zipfile.BadZipFile:
+            logger.warning(f"Rebuilding unreadable report archive: {archive_path}")
+
+    with span("zip_build", files=len(files)):
+        _write_report_archive(files, fingerprint, archive_path, output_dir)
+    logger.info(f"Built report archive: {archive_path}")
+    return archive_path
+
+def _write_report_archive(files: List[Tuple[str, str]], fingerprint: str, archive_path: str, output_dir: str):
+    """Write the archive to a temp file and move it into place."""
+    fd, tmp_path = tempfile.mkstemp(dir=output_dir, prefix=".", suffix=".part")
+    try:
+        with os.fdopen(fd, "wb") as f, zipfile.ZipFile(f, 'w') as zip_file:
+            for file_path, archive_name in files:
+                # Already-compressed images are stored as-is; only the HTML is deflated
+                compression = zipfile.ZIP_STORED if archive_name.lower().endswith(PRECOMPRESSED_EXTENSIONS) else zipfile.ZIP_DEFLATED
+                if archive_name.lower().endswith('.html'):
+                    with open(file_path, "rb") as html_file:
+                        html = html_file.read()
+                    if not is_complete_report(html):
+                        html += PARTIAL_REPORT_TAIL.encode("utf-8")
+                    zip_file.writestr(archive_name, html, compress_type=compression)
+                else:
+                    zip_file.write(file_path, archive_name, compress_type=compression)
+            zip_file.comment = fingerprint.encode("ascii")
+        os.replace(tmp_path, archive_path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
 
 def display_html_report(html_path: str, output_dir: str):
     """Display the generated HTML report and provide download options."""
-    # Create a zip file containing all generated content
-    zip_buffer = io.BytesIO()
-    with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED) as zip_file:
-        # Add the HTML file
-        zip_file.write(html_path, os.path.basename(html_path))
-        
-        # Add all images from the output directory
-        for root, _, files in os.walk(output_dir):
-            for file in files:
-                if file.endswith(('.jpg', '.jpeg', '.png')):
-                    file_path = os.path.join(root, file)
-                    # Store images in the root directory of the zip
-                    zip_file.write(file_path, os.path.basename(file_path))
-    
-    # Prepare the zip file for download
-    zip_buffer.seek(0)
+    import streamlit as st
+    # Viewing the report keeps it from being garbage collected for a while
+    touch_job(output_dir)
+    # Continue the report's trace so a rebuilt archive shows up on its timeline
+    with trace_request(output_dir):
+        archive_path = build_report_archive(html_path, output_dir)
+
+    # Keep the archive bytes across reruns until the archive itself changes
+    archive_mtime = os.stat(archive_path).st_mtime_ns
+    zip_content = st.session_state.get('zip_content')
+    if not zip_content or zip_content['path'] != archive_path or zip_content['mtime'] != archive_mtime:
+        with open(archive_path, "rb") as f:
+            zip_content = {'path': archive_path, 'mtime': archive_mtime, 'data': f.read()}
+        st.session_state.zip_content = zip_content
     
     # Display download button
     st.download_button(
         label="Download Design Report (ZIP)",
-        data=zip_buffer,
+        data=zip_content['data'],
         file_name="interior_design_report.zip",
         mime="application/zip"
-    ) 
\ No newline at end of file
+    )
\ No newline at end of file
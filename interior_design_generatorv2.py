@@ -13,28 +13,13 @@ import io
 import zipfile
 import streamlit as st
 
-import google.generativeai as genai
-import vertexai
-from vertexai.generative_models import GenerativeModel
-from vertexai.preview.vision_models import ImageGenerationModel
-
-
-from google.cloud import aiplatform
-from google.cloud.aiplatform.gapic.schema import predict
-from google.protobuf import json_format
-import google.protobuf.struct_pb2
+from model_backends import load_text_model, load_image_model
 
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Your existing code
-project_id = os.getenv("GOOGLE_CLOUD_PROJECT")
-location = os.getenv("GOOGLE_CLOUD_LOCATION")
-
-vertexai.init(project=project_id, location=location)
-
 # Initialize API keys and configurations
 #genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
 
@@ -112,16 +97,15 @@ def load_test_response(key: str) -> Optional[str]:
 # Cache for model instances
 @lru_cache(maxsize=2)
 def get_text_model():
-    vertexai.init(project=project_id, location=location)
-    model = GenerativeModel("gemini-2.0-flash-001")
+    # Vertex or the local fake, depending on MODEL_BACKEND
+    model = load_text_model("gemini-2.0-flash-001")
     # return genai.GenerativeModel(model_name='gemini-1.5-flash')
     return model
 
 
 @lru_cache(maxsize=1)
 def get_image_model():
-    vertexai.init(project=project_id, location=location)
-    return ImageGenerationModel.from_pretrained("imagegeneration@006")
+    return load_image_model("imagegeneration@006")
 
 def setup_output_directory() -> str:
     """Create a timestamped output directory and return its path."""
@@ -0,0 +1,320 @@
+"""
+Background jobs for the Streamlit apps.
+
+Generation runs on a worker pool instead of the Streamlit script thread. submit()
+returns a job id at once; the UI polls get() for status and progress and picks
+up the result when the job finishes. Job state is persisted to JOB_STATE_DIR,
+so a browser refresh or reconnect (with the id in the URL) finds the finished
+result instead of generating it again.
+
+Identical requests are coalesced: a job submitted with a key (see request_key)
+attaches to an unfinished job with the same key instead of starting another, and
+every waiter gets the same result. A job is cancelled once all of its waiters
+have released it or stopped polling for JOB_WAITER_TIMEOUT seconds.
+"""
+import os
+import json
+import time
+import asyncio
+import inspect
+import tempfile
+import threading
+import logging
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
+from functools import lru_cache
+from typing import Any, Callable, Dict, Optional, Set, Tuple
+
+from response_cache import make_cache_key
+from storage import OUTPUT_RETENTION_DAYS, new_job_id, validate_job_id
+
+logger = logging.getLogger(__name__)
+
+# Reports generated at the same time in one server process
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_STATE_DIR = os.getenv("JOB_STATE_DIR", ".jobs")
+# Seconds between UI polls of a running job
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "1.0"))
+# A waiter that hasn't polled its job for this many seconds has gone away
+JOB_WAITER_TIMEOUT = float(os.getenv("JOB_WAITER_TIMEOUT", "60"))
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINISHED_STATES = (SUCCEEDED, FAILED, CANCELLED)
+
+ProgressCallback = Callable[[float, str], None]
+
+
+@dataclass
+class Job:
+    """Status of one job; result and error_details must be JSON-serializable."""
+    job_id: str
+    kind: str
+    status: str = QUEUED
+    progress: float = 0.0
+    message: str = "Waiting for a worker"
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+    error_details: Optional[Dict[str, Any]] = None
+    key: Optional[str] = None
+
+    @property
+    def finished(self) -> bool:
+        return self.status in FINISHED_STATES
+
+
+class JobError(Exception):
+    """Raise from a job to fail it with a user-facing message and optional JSON details."""
+
+    def __init__(self, message: str, details: Optional[Dict[str, Any]] = None):
+        super().__init__(message)
+        self.details = details
+
+
+class JobCancelled(Exception):
+    """Raised inside a job once every waiter has gone away."""
+
+
+def _normalize(value: Any) -> Any:
+    if isinstance(value, str):
+        return " ".join(value.split()).casefold()
+    if isinstance(value, (list, tuple)):
+        return [_normalize(item) for item in value]
+    return value
+
+
+def request_key(kind: str, **inputs: Any) -> str:
+    """Key of a request for coalescing; case and whitespace differences in the inputs don't matter."""
+    return make_cache_key(kind=kind, **{name: _normalize(value) for name, value in inputs.items()})
+
+
+class JobRunner:
+    """
+    Run jobs on a thread pool and keep their state in memory and on disk.
+
+    A job function is called as fn(job_id=..., progress=..., **kwargs), where
+    progress(fraction, message) reports how far along it is. Coroutine functions
+    run in their own event loop on the worker thread.
+
+    A waiter is any id for whoever is waiting on a job, e.g. one per browser
+    session. Jobs submitted without a waiter are never cancelled.
+    """
+
+    def __init__(self, max_workers: int = JOB_WORKERS, state_dir: str = JOB_STATE_DIR):
+        self.state_dir = state_dir
+        os.makedirs(state_dir, exist_ok=True)
+        self._executor = ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="job")
+        self._jobs: Dict[str, Job] = {}
+        self._futures: Dict[str, Future] = {}
+        # Unfinished jobs by request key, their waiters' last polls, and their cancel flags
+        self._in_flight: Dict[str, str] = {}
+        self._waiters: Dict[str, Dict[str, float]] = {}
+        self._cancelled: Dict[str, threading.Event] = {}
+        # Jobs submitted without a waiter, which run to completion regardless
+        self._unowned: Set[str] = set()
+        self._loops: Dict[str, Tuple[asyncio.AbstractEventLoop, asyncio.Task]] = {}
+        self._lock = threading.Lock()
+
+    def _state_path(self, job_id: str) -> str:
+        # Ids can come from URLs; never let one point outside the state directory
+        return os.path.join(self.state_dir, f"{validate_job_id(job_id)}.json")
+
+    def _persist(self, job: Job):
+        with self._lock:
+            data = json.dumps(asdict(job))
+        fd, tmp_path = tempfile.mkstemp(dir=self.state_dir, prefix=".", suffix=".part")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(data)
+            os.replace(tmp_path, self._state_path(job.job_id))
+        except OSError as e:
+            logger.warning(f"Could not persist state of job {job.job_id}: {e}")
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+
+    def _update(self, job: Job, **changes: Any):
+        with self._lock:
+            for name, value in changes.items():
+                setattr(job, name, value)
+        self._persist(job)
+
+    def submit(self, kind: str, fn: Callable[..., Any], job_id: Optional[str] = None, key: Optional[str] = None,
+               waiter: Optional[str] = None, **kwargs: Any) -> str:
+        """
+        Queue fn as a new job and return its id.
+
+        With a key, an unfinished job with the same key is joined instead and its
+        id returned, so identical requests run once.
+        """
+        with self._lock:
+            existing_id = self._in_flight.get(key) if key else None
+            if existing_id:
+                self._add_waiter(existing_id, waiter)
+                logger.info(f"Attached to in-flight {kind} job {existing_id}")
+                return existing_id
+            job = Job(job_id or new_job_id(), kind, key=key)
+            self._jobs[job.job_id] = job
+            self._cancelled[job.job_id] = threading.Event()
+            if waiter is None:
+                self._unowned.add(job.job_id)
+            self._add_waiter(job.job_id, waiter)
+            if key:
+                self._in_flight[key] = job.job_id
+        self._persist(job)
+        with self._lock:
+            self._futures[job.job_id] = self._executor.submit(self._run, job, fn, kwargs)
+        logger.info(f"Queued {kind} job {job.job_id}")
+        return job.job_id
+
+    def _add_waiter(self, job_id: str, waiter: Optional[str]):
+        if waiter is not None:
+            self._waiters.setdefault(job_id, {})[waiter] = time.monotonic()
+
+    def release(self, job_id: str, waiter: str):
+        """Stop waiting on a job; it is cancelled when nobody else is waiting."""
+        with self._lock:
+            waiters = self._waiters.get(job_id)
+            if waiters is None or waiters.pop(waiter, None) is None:
+                return
+        self._cancel_if_abandoned(job_id)
+
+    def _cancel_if_abandoned(self, job_id: str):
+        """Cancel a job whose waiters have all released it or stopped polling."""
+        cutoff = time.monotonic() - JOB_WAITER_TIMEOUT
+        with self._lock:
+            waiters = self._waiters.get(job_id)
+            if waiters is None or job_id in self._unowned:
+                return
+            for waiter in [waiter for waiter, last_seen in waiters.items() if last_seen < cutoff]:
+                del waiters[waiter]
+            if waiters:
+                return
+            del self._waiters[job_id]
+            job = self._jobs.get(job_id)
+            cancelled = self._cancelled.get(job_id)
+            if job is None or job.finished or cancelled is None:
+                return
+            cancelled.set()
+            future = self._futures.get(job_id)
+            running_loop = self._loops.get(job_id)
+        logger.info(f"Cancelling job {job_id}: nobody is waiting for it")
+        if future is not None and future.cancel():
+            # It never started
+            self._finish(job, status=CANCELLED, message="Cancelled")
+        elif running_loop is not None:
+            loop, task = running_loop
+            loop.call_soon_threadsafe(task.cancel)
+
+    def _finish(self, job: Job, **changes: Any):
+        with self._lock:
+            if job.key and self._in_flight.get(job.key) == job.job_id:
+                del self._in_flight[job.key]
+            self._waiters.pop(job.job_id, None)
+            self._unowned.discard(job.job_id)
+            self._cancelled.pop(job.job_id, None)
+            self._futures.pop(job.job_id, None)
+        self._update(job, finished_at=time.time(), **changes)
+
+    async def _run_coroutine(self, job: Job, fn: Callable[..., Any], progress: ProgressCallback, kwargs: Dict[str, Any]):
+        with self._lock:
+            self._loops[job.job_id] = (asyncio.get_running_loop(), asyncio.current_task())
+            cancelled = self._cancelled[job.job_id].is_set()
+        if cancelled:
+            raise JobCancelled()
+        try:
+            return await fn(job_id=job.job_id, progress=progress, **kwargs)
+        finally:
+            with self._lock:
+                self._loops.pop(job.job_id, None)
+
+    def _run(self, job: Job, fn: Callable[..., Any], kwargs: Dict[str, Any]):
+        is_coroutine = inspect.iscoroutinefunction(fn)
+        cancelled = self._cancelled[job.job_id]
+
+        def progress(fraction: float, message: str):
+            self._update(job, progress=max(0.0, min(1.0, fraction)), message=message)
+            self._cancel_if_abandoned(job.job_id)
+            if cancelled.is_set() and not is_coroutine:
+                # Synchronous jobs stop at their next progress report
+                raise JobCancelled()
+
+        self._update(job, status=RUNNING, started_at=time.time(), message="Starting")
+        try:
+            if is_coroutine:
+                result = asyncio.run(self._run_coroutine(job, fn, progress, kwargs))
+            else:
+                result = fn(job_id=job.job_id, progress=progress, **kwargs)
+        except (JobCancelled, asyncio.CancelledError):
+            logger.info(f"Job {job.job_id} was cancelled")
+            self._finish(job, status=CANCELLED, message="Cancelled")
+        except JobError as e:
+            logger.error(f"Job {job.job_id} failed: {e}")
+            self._finish(job, status=FAILED, error=str(e), error_details=e.details)
+        except Exception as e:
+            logger.error(f"Job {job.job_id} failed: {e}", exc_info=True)
+            self._finish(job, status=FAILED, error=f"An error occurred: {e}")
+        else:
+            self._finish(job, status=SUCCEEDED, progress=1.0, message="Done", result=result)
+            logger.info(f"Job {job.job_id} finished in {job.finished_at - job.started_at:.1f}s")
+
+    def get(self, job_id: str, waiter: Optional[str] = None) -> Optional[Job]:
+        """
+        Return a job's current state, from memory or from a previous run's state file.
+
+        Polling with a waiter keeps the job alive for that waiter (and joins it, e.g. after a refresh).
+
+        Raises:
+            ValueError: If job_id is not a well-formed job id.
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None and not job.finished:
+                self._add_waiter(job_id, waiter)
+        if job is not None:
+            if not job.finished:
+                self._cancel_if_abandoned(job_id)
+            return job
+        state_path = self._state_path(job_id)
+        try:
+            with open(state_path, "r", encoding="utf-8") as f:
+                job = Job(**json.load(f))
+        except (OSError, ValueError, TypeError):
+            return None
+        if not job.finished:
+            # It was running in a process that has since stopped
+            job.status = FAILED
+            job.error = "The job was interrupted by a server restart. Please try again."
+        with self._lock:
+            self._jobs.setdefault(job_id, job)
+        return job
+
+    def prune(self, max_age_days: float = OUTPUT_RETENTION_DAYS):
+        """Forget finished jobs older than max_age_days (0 keeps them forever)."""
+        if max_age_days <= 0:
+            return
+        cutoff = time.time() - max_age_days * 86400
+        with self._lock:
+            for job_id in [job_id for job_id, job in self._jobs.items() if job.finished and job.created_at < cutoff]:
+                del self._jobs[job_id]
+        for entry in os.scandir(self.state_dir):
+            try:
+                if entry.name.endswith(".json") and entry.stat().st_mtime < cutoff:
+                    os.remove(entry.path)
+            except OSError:
+                continue
+
+
+@lru_cache(maxsize=None)
+def get_job_runner() -> JobRunner:
+    """The process-wide job runner, shared by every Streamlit session."""
+    runner = JobRunner()
+    runner.prune()
+    return runner
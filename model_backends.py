@@ -0,0 +1,102 @@
+import os
+import time
+import threading
+import logging
+from functools import lru_cache
+from typing import Any, List, Optional, Protocol, Sequence
+
+logger = logging.getLogger(__name__)
+
+# "vertex" talks to Vertex AI; "fake" uses the local stand-in in fake_vertex.py
+MODEL_BACKEND = os.getenv("MODEL_BACKEND", "vertex").lower()
+
+# Load the app's models on a background thread at startup, so the first
+# request doesn't pay for importing the SDK and creating the model handles
+PREWARM_MODELS = os.getenv("PREWARM_MODELS", "False").lower() == "true"
+
+_vertex_init_lock = threading.Lock()
+_vertex_initialized = False
+_prewarm_thread = None
+_prewarm_lock = threading.Lock()
+
+
+class TextModel(Protocol):
+    """The subset of vertexai GenerativeModel the app relies on."""
+
+    def generate_content(self, contents: Any, **kwargs: Any) -> Any: ...
+
+    async def generate_content_async(self, contents: Any, **kwargs: Any) -> Any: ...
+
+
+class GeneratedImages(Protocol):
+    images: List[Any]
+
+
+class ImageModel(Protocol):
+    """The subset of vertexai ImageGenerationModel the app relies on."""
+
+    def generate_images(self, prompt: str, number_of_images: int = 1, **kwargs: Any) -> GeneratedImages: ...
+
+
+def init_vertex():
+    """Initialize the Vertex AI SDK once per process."""
+    global _vertex_initialized
+    with _vertex_init_lock:
+        if _vertex_initialized:
+            return
+        import vertexai
+        vertexai.init(project=os.getenv("GOOGLE_CLOUD_PROJECT"), location=os.getenv("GOOGLE_CLOUD_LOCATION"))
+        _vertex_initialized = True
+
+
+@lru_cache(maxsize=None)
+def load_text_model(model_name: str) -> TextModel:
+    """Return the text/multimodal model for the configured backend."""
+    if MODEL_BACKEND == "fake":
+        from fake_vertex import FakeTextModel
+        logger.info(f"Using fake text model for {model_name}")
+        return FakeTextModel(model_name)
+    init_vertex()
+    from vertexai.generative_models import GenerativeModel
+    return GenerativeModel(model_name)
+
+
+@lru_cache(maxsize=None)
+def load_image_model(model_name: str) -> ImageModel:
+    """Return the image generation model for the configured backend."""
+    if MODEL_BACKEND == "fake":
+        from fake_vertex import FakeImageModel
+        logger.info(f"Using fake image model for {model_name}")
+        return FakeImageModel(model_name)
+    init_vertex()
+    from vertexai.preview.vision_models import ImageGenerationModel
+    return ImageGenerationModel.from_pretrained(model_name)
+
+
+def _prewarm(text_models: Sequence[str], image_models: Sequence[str]):
+    start = time.perf_counter()
+    try:
+        for model_name in text_models:
+            load_text_model(model_name)
+        for model_name in image_models:
+            load_image_model(model_name)
+    except Exception as e:
+        # The first real request will load the model again and report the error properly
+        logger.warning(f"Model prewarm failed: {e}")
+        return
+    logger.info(f"Prewarmed {len(text_models) + len(image_models)} models in {time.perf_counter() - start:.2f}s")
+
+
+def start_model_prewarm(text_models: Sequence[str] = (), image_models: Sequence[str] = (),
+                        enabled: bool = PREWARM_MODELS) -> Optional[threading.Thread]:
+    """Load the given models on a daemon thread when PREWARM_MODELS is set, once per process."""
+    global _prewarm_thread
+    if not enabled:
+        return None
+    with _prewarm_lock:
+        if _prewarm_thread is None:
+            _prewarm_thread = threading.Thread(
+                target=_prewarm, args=(tuple(text_models), tuple(image_models)), name="model-prewarm", daemon=True
+            )
+            _prewarm_thread.start()
+        return _prewarm_thread
@@ -1,10 +1,11 @@
 import vertexai
 from vertexai.generative_models import GenerativeModel, Part
-import base64
 import os
 import json
 import re
 
+from image_payload import load_image_payload
+
 MODEL_NAME = "gemini-2.0-flash-001"
 project_id = os.getenv("GOOGLE_CLOUD_PROJECT")
 location = os.getenv("GOOGLE_CLOUD_LOCATION")
@@ -16,11 +17,9 @@ vertexai.init(project=project_id, location=location)
 model = GenerativeModel(MODEL_NAME)
 
 try:
-    with open("C:\InteriorGenie\generated_content_20250608_234846\Mid_Century_Modern_Study__Brow_view_2_234914.jpeg", "rb") as image_file:
-        image_bytes = image_file.read()
-    encoded_image = base64.b64encode(image_bytes).decode("utf-8")
-    mime_type = "image/jpeg" # Adjust based on your image type (e.g., "image/png")
-    print(mime_type)
+    # Downscaled raw bytes with the MIME type sniffed from the file itself
+    payload = load_image_payload("C:\InteriorGenie\generated_content_20250608_234846\Mid_Century_Modern_Study__Brow_view_2_234914.jpeg")
+    print(payload.mime_type)
 except FileNotFoundError:
     print("Error: image.jpg not found. Please provide a valid image path.")
     exit()
@@ -46,10 +45,10 @@ text_prompt = (
 )
 # --- Construct the multimodal content ---
 # The 'contents' parameter expects a list of 'Part' objects.
-# Each 'Part' can be text, inline data (like base64 encoded image), or file data (GCS URI).
+# Each 'Part' can be text, inline data (raw image bytes), or file data (GCS URI).
 contents = [
     Part.from_text(text_prompt),
-    Part.from_data(data=encoded_image, mime_type=mime_type)
+    Part.from_data(data=payload.data, mime_type=payload.mime_type)
 ]
 # --- Send the request ---
 try:
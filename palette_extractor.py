@@ -0,0 +1,154 @@
+from typing import List, Dict, Tuple, Union
+
+import numpy as np
+from PIL import Image
+
+# Longest side, in pixels, that images are downsampled to before clustering.
+# Dominant colors are stable well below the 1024px Imagen output.
+DEFAULT_SAMPLE_SIZE = 160
+
+# Bits kept per RGB channel when quantizing pixels into histogram bins
+QUANTIZE_BITS = 5
+
+KMEANS_MAX_ITERATIONS = 25
+KMEANS_TOLERANCE = 0.5
+
+# Mean CIELAB distance from a pixel to its cluster at which confidence hits zero
+CONFIDENCE_SCALE = 40.0
+
+ImageSource = Union[str, Image.Image]
+
+# D65 reference white and sRGB -> XYZ matrix
+_XYZ_WHITE = np.array([0.95047, 1.0, 1.08883])
+_RGB_TO_XYZ = np.array([
+    [0.4124564, 0.3575761, 0.1804375],
+    [0.2126729, 0.7151522, 0.0721750],
+    [0.0193339, 0.1191920, 0.9503041],
+])
+
+
+def rgb_to_lab(rgb: np.ndarray) -> np.ndarray:
+    """
+    Convert sRGB colors to CIELAB.
+
+    Args:
+        rgb (np.ndarray): Array of shape (..., 3) with channel values in 0-255.
+
+    Returns:
+        np.ndarray: Array of the same shape holding L*, a*, b* values.
+    """
+    srgb = np.asarray(rgb, dtype=np.float64) / 255.0
+    linear = np.where(srgb <= 0.04045, srgb / 12.92, ((srgb + 0.055) / 1.055) ** 2.4)
+    xyz = linear @ _RGB_TO_XYZ.T / _XYZ_WHITE
+    f = np.where(xyz > (6 / 29) ** 3, np.cbrt(xyz), xyz / (3 * (6 / 29) ** 2) + 4 / 29)
+    l_star = 116 * f[..., 1] - 16
+    a_star = 500 * (f[..., 0] - f[..., 1])
+    b_star = 200 * (f[..., 1] - f[..., 2])
+    return np.stack([l_star, a_star, b_star], axis=-1)
+
+
+def load_pixels(image: ImageSource, sample_size: int = DEFAULT_SAMPLE_SIZE) -> np.ndarray:
+    """Load an image as a downsampled (N, 3) uint8 RGB pixel array."""
+    img = Image.open(image) if isinstance(image, str) else image
+    try:
+        # Let the JPEG decoder scale down while decoding; far cheaper than a full decode
+        img.draft("RGB", (sample_size, sample_size))
+        img = img.convert("RGB")
+        img.thumbnail((sample_size, sample_size), Image.BILINEAR)
+        return np.asarray(img, dtype=np.uint8).reshape(-1, 3)
+    finally:
+        if isinstance(image, str):
+            img.close()
+
+
+def _quantize(pixels: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Bucket pixels into a coarse RGB histogram; return each bin's mean color and pixel count."""
+    shift = 8 - QUANTIZE_BITS
+    q = (pixels >> shift).astype(np.int64)
+    bin_ids = (q[:, 0] << (2 * QUANTIZE_BITS)) | (q[:, 1] << QUANTIZE_BITS) | q[:, 2]
+    unique_ids, inverse, counts = np.unique(bin_ids, return_inverse=True, return_counts=True)
+    sums = np.zeros((len(unique_ids), 3))
+    np.add.at(sums, inverse, pixels)
+    return sums / counts[:, None], counts.astype(np.float64)
+
+
+def _weighted_kmeans(points: np.ndarray, weights: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Weighted k-means with deterministic k-means++ seeding; returns centers and labels."""
+    rng = np.random.default_rng(0)
+    k = min(k, len(points))
+    centers = np.empty((k, points.shape[1]))
+    centers[0] = points[np.argmax(weights)]
+    closest = ((points - centers[0]) ** 2).sum(axis=1)
+    for i in range(1, k):
+        probabilities = weights * closest
+        total = probabilities.sum()
+        if total <= 0:
+            centers = centers[:i]
+            break
+        centers[i] = points[rng.choice(len(points), p=probabilities / total)]
+        closest = np.minimum(closest, ((points - centers[i]) ** 2).sum(axis=1))
+
+    labels = np.zeros(len(points), dtype=np.int64)
+    for _ in range(KMEANS_MAX_ITERATIONS):
+        distances = ((points[:, None, :] - centers[None, :, :]) ** 2).sum(axis=2)
+        labels = distances.argmin(axis=1)
+        cluster_weights = np.bincount(labels, weights=weights, minlength=len(centers))
+        new_centers = centers.copy()
+        for dim in range(points.shape[1]):
+            sums = np.bincount(labels, weights=weights * points[:, dim], minlength=len(centers))
+            occupied = cluster_weights > 0
+            new_centers[occupied, dim] = sums[occupied] / cluster_weights[occupied]
+        shift = np.sqrt(((new_centers - centers) ** 2).sum(axis=1)).max()
+        centers = new_centers
+        if shift < KMEANS_TOLERANCE:
+            break
+    return centers, labels
+
+
+def analyze_palette(image: ImageSource, num_colors: int = 5, sample_size: int = DEFAULT_SAMPLE_SIZE) -> Tuple[List[Dict], float]:
+    """
+    Extract dominant colors and report how cleanly the image separates into them.
+
+    Args:
+        image (str or PIL.Image.Image): Path to the image, or an already opened image.
+        num_colors (int): Number of colors to extract.
+        sample_size (int): Longest side the image is downsampled to before clustering.
+
+    Returns:
+        tuple: A list of {'rgb': (r, g, b), 'proportion': float} dictionaries sorted by
+               proportion, and a confidence in [0, 1] (1 means tight, well separated clusters).
+    """
+    pixels = load_pixels(image, sample_size)
+    bin_rgb, bin_counts = _quantize(pixels)
+    bin_lab = rgb_to_lab(bin_rgb)
+    centers, labels = _weighted_kmeans(bin_lab, bin_counts, num_colors)
+
+    total = bin_counts.sum()
+    cluster_counts = np.bincount(labels, weights=bin_counts, minlength=len(centers))
+    result = []
+    for cluster in np.argsort(-cluster_counts):
+        if cluster_counts[cluster] <= 0:
+            continue
+        members = labels == cluster
+        # Report the mean of the original pixels, not the Lab centroid, so colors round-trip exactly
+        rgb = (bin_rgb[members] * bin_counts[members, None]).sum(axis=0) / cluster_counts[cluster]
+        result.append({
+            'rgb': tuple(int(round(channel)) for channel in rgb),
+            'proportion': float(cluster_counts[cluster] / total)
+        })
+
+    spread = np.sqrt(((bin_lab - centers[labels]) ** 2).sum(axis=1))
+    mean_spread = float((spread * bin_counts).sum() / total)
+    confidence = float(np.clip(1.0 - mean_spread / CONFIDENCE_SCALE, 0.0, 1.0))
+    return result, confidence
+
+
+def extract_palette(image: ImageSource, num_colors: int = 5, sample_size: int = DEFAULT_SAMPLE_SIZE) -> List[Dict]:
+    """
+    Extract dominant colors and their proportions.
+
+    Drop-in replacement for the colorgram-based extraction: returns a list of
+    {'rgb': (r, g, b), 'proportion': float} dictionaries sorted by proportion.
+    """
+    return analyze_palette(image, num_colors, sample_size)[0]
+
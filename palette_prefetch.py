@@ -0,0 +1,131 @@
+"""
+Speculative palette analysis of the generated design options.
+
+As soon as the options are saved, each one's palette is analyzed on a small
+background pool and written next to the image as <image>.palette.json. When the
+user selects an option its palette is usually already there; analyses of the
+options that weren't picked are cancelled if they haven't started, and the
+ones that did finish land in the palette cache, so they cost nothing later.
+"""
+import os
+import tempfile
+import threading
+import logging
+from concurrent.futures import CancelledError, Future, ThreadPoolExecutor
+from typing import Dict, Iterable, Optional
+
+from get_image_colors import get_image_colors
+from tracing import span
+
+logger = logging.getLogger(__name__)
+
+PALETTE_PREFETCH = os.getenv("PALETTE_PREFETCH", "True").lower() == "true"
+# Options analyzed at the same time; in "llm" palette mode each one is a Gemini call
+PALETTE_PREFETCH_WORKERS = int(os.getenv("PALETTE_PREFETCH_WORKERS", "2"))
+PALETTE_SIDECAR_SUFFIX = ".palette.json"
+
+_executor = ThreadPoolExecutor(max_workers=max(1, PALETTE_PREFETCH_WORKERS), thread_name_prefix="palette-prefetch")
+_pending: Dict[str, Future] = {}
+_pending_lock = threading.Lock()
+
+
+def sidecar_path(image_path: str) -> str:
+    """design_option_1.jpeg -> design_option_1.palette.json"""
+    return os.path.splitext(image_path)[0] + PALETTE_SIDECAR_SUFFIX
+
+
+def read_sidecar(image_path: str) -> Optional[str]:
+    try:
+        with open(sidecar_path(image_path), "r", encoding="utf-8") as f:
+            return f.read()
+    except OSError:
+        return None
+
+
+def _write_sidecar(image_path: str, palette_json: str):
+    path = sidecar_path(image_path)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or ".", prefix=".", suffix=".part")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(palette_json)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        logger.warning(f"Could not write palette for {image_path}: {e}")
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+
+
+def _analyze(image_path: str) -> Optional[str]:
+    try:
+        with span("palette_prefetch"):
+            palette_json = get_image_colors(image_path)
+    except Exception as e:
+        # Selecting the option analyzes it again and reports the error there
+        logger.warning(f"Palette prefetch failed for {image_path}: {e}")
+        return None
+    if palette_json:
+        _write_sidecar(image_path, palette_json)
+    return palette_json
+
+
+def _forget(image_path: str, future: Future):
+    with _pending_lock:
+        if _pending.get(image_path) is future:
+            del _pending[image_path]
+
+
+def prefetch_palettes(image_paths: Iterable[str], enabled: bool = PALETTE_PREFETCH):
+    """Start analyzing the palettes of image_paths in the background."""
+    if not enabled:
+        return
+    for image_path in image_paths:
+        with _pending_lock:
+            if image_path in _pending or os.path.exists(sidecar_path(image_path)):
+                continue
+            future = _executor.submit(_analyze, image_path)
+            _pending[image_path] = future
+        future.add_done_callback(lambda done, path=image_path: _forget(path, done))
+
+
+def cancel_prefetch(image_paths: Iterable[str]):
+    """Cancel the analyses of image_paths that haven't started yet."""
+    cancelled = 0
+    with _pending_lock:
+        futures = [_pending.get(image_path) for image_path in image_paths]
+    for future in futures:
+        if future is not None and future.cancel():
+            cancelled += 1
+    if cancelled:
+        logger.info(f"Cancelled {cancelled} palette prefetches")
+
+
+def palette_for(image_path: str) -> Optional[str]:
+    """
+    Palette JSON of an image: from its sidecar, from the prefetch still running, or analyzed now.
+
+    Errors from a fresh analysis propagate like get_image_colors'.
+    """
+    with span("palette_lookup") as lookup:
+        palette_json = read_sidecar(image_path)
+        if palette_json is not None:
+            lookup['source'] = "sidecar"
+            return palette_json
+
+        with _pending_lock:
+            future = _pending.get(image_path)
+        if future is not None:
+            try:
+                palette_json = future.result()
+            except CancelledError:
+                palette_json = None
+            if palette_json:
+                lookup['source'] = "prefetch"
+                return palette_json
+
+        lookup['source'] = "analysis"
+        palette_json = get_image_colors(image_path)
+        if palette_json:
+            _write_sidecar(image_path, palette_json)
+        return palette_json
@@ -0,0 +1,199 @@
+"""
+Headless color palette swatches.
+
+Draws the same two-row layout as the old matplotlib figure (primary colors on
+top, secondary below, blocks flush against each other, name and hex code under
+each block) with NumPy and Pillow, as PNG or SVG. No display or matplotlib
+import is needed, and renders are cached by a hash of the palette, so showing
+the same palette again costs a dictionary lookup.
+"""
+import io
+import os
+import json
+import threading
+import logging
+from collections import OrderedDict
+from typing import Dict, List, Tuple
+from xml.sax.saxutils import escape
+
+import numpy as np
+from PIL import Image, ImageColor, ImageDraw, ImageFont
+
+from content_hash import bytes_digest
+
+logger = logging.getLogger(__name__)
+
+# Rendered swatches kept in memory, keyed by (palette hash, format, scale)
+PALETTE_RENDER_CACHE_SIZE = int(os.getenv("PALETTE_RENDER_CACHE_SIZE", "128"))
+
+# Layout in pixels at scale 1, matching the old figure at 100 dpi:
+# 250px per color in the longest row, at least 1000px wide, 700px high
+MIN_WIDTH = 1000
+WIDTH_PER_COLOR = 250
+HEIGHT = 700
+# Vertical positions as fractions of the height, measured from the bottom like the old axes
+BLOCK_HEIGHT = 0.18
+PRIMARY_BLOCK_Y = 0.65
+SECONDARY_BLOCK_Y = 0.25
+TITLE_SIZE = 19
+NAME_SIZE = 14
+HEX_SIZE = 12
+TEXT_COLOR = "#000000"
+HEX_COLOR = "#555555"
+FALLBACK_SWATCH = "#808080"
+
+FONT_FILES = {
+    True: ("DejaVuSans-Bold.ttf", "Arial Bold.ttf", "arialbd.ttf"),
+    False: ("DejaVuSans.ttf", "Arial.ttf", "arial.ttf"),
+}
+
+Row = Tuple[Tuple[str, str], ...]
+
+_renders: "OrderedDict[Tuple[str, str, int], bytes]" = OrderedDict()
+_renders_lock = threading.Lock()
+_fonts: Dict[Tuple[int, bool], ImageFont.ImageFont] = {}
+
+
+def _palette_rows(palette: Dict[str, List[Dict[str, str]]]) -> Tuple[Row, Row]:
+    """The (name, hex) pairs of the primary and secondary rows."""
+    return tuple(
+        tuple((str(color.get('name') or ''), str(color.get('hex') or '')) for color in palette.get(row_type, []))
+        for row_type in ('primary', 'secondary')
+    )
+
+
+def palette_digest(palette: Dict[str, List[Dict[str, str]]]) -> str:
+    """SHA-256 of the palette's colors, independent of dict ordering and extra keys."""
+    return bytes_digest(json.dumps(_palette_rows(palette)).encode("utf-8"))
+
+
+def _font(size: int, bold: bool) -> ImageFont.ImageFont:
+    font = _fonts.get((size, bold))
+    if font is None:
+        for name in FONT_FILES[bold]:
+            try:
+                font = ImageFont.truetype(name, size)
+                break
+            except OSError:
+                continue
+        else:
+            # Pillow's bundled font; scalable when Pillow has FreeType
+            font = ImageFont.load_default(size)
+        _fonts[(size, bold)] = font
+    return font
+
+
+def _rgb(hex_code: str) -> Tuple[int, int, int]:
+    try:
+        return ImageColor.getrgb(hex_code)[:3]
+    except ValueError:
+        logger.warning(f"Invalid color {hex_code!r} in palette; drawing it grey")
+        return ImageColor.getrgb(FALLBACK_SWATCH)
+
+
+def _layout(rows: Tuple[Row, Row], scale: int):
+    """Yield (title, title_y, row, block_top, block_bottom) for each non-empty row, in pixels from the top."""
+    height = HEIGHT * scale
+    secondary_title_y = (PRIMARY_BLOCK_Y - 0.1 + SECONDARY_BLOCK_Y + BLOCK_HEIGHT) / 2 + 0.02
+    specs = (
+        ("Primary Colors", PRIMARY_BLOCK_Y + BLOCK_HEIGHT + 0.07, PRIMARY_BLOCK_Y),
+        ("Secondary Colors", secondary_title_y, SECONDARY_BLOCK_Y),
+    )
+    for (title, title_y, block_y), row in zip(specs, rows):
+        if row:
+            yield title, round((1 - title_y) * height), row, round((1 - block_y - BLOCK_HEIGHT) * height), round((1 - block_y) * height)
+
+
+def _canvas_width(rows: Tuple[Row, Row], scale: int) -> int:
+    return max(MIN_WIDTH, max(len(row) for row in rows) * WIDTH_PER_COLOR) * scale
+
+
+def _block_edges(count: int, width: int) -> List[int]:
+    """x coordinates of the block boundaries, so the blocks fill the row with no gaps."""
+    return [round(i * width / count) for i in range(count + 1)]
+
+
+def _render_png(rows: Tuple[Row, Row], scale: int) -> bytes:
+    width, height = _canvas_width(rows, scale), HEIGHT * scale
+    # Transparent background, like the old savefig(transparent=True)
+    pixels = np.zeros((height, width, 4), dtype=np.uint8)
+    labels = []
+    for title, title_y, row, top, bottom in _layout(rows, scale):
+        labels.append((width / 2, title_y, title, _font(TITLE_SIZE * scale, True), TEXT_COLOR, "ms"))
+        edges = _block_edges(len(row), width)
+        for (name, hex_code), left, right in zip(row, edges, edges[1:]):
+            pixels[top:bottom, left:right] = (*_rgb(hex_code), 255)
+            center = (left + right) / 2
+            labels.append((center, bottom + 0.05 * height, name, _font(NAME_SIZE * scale, True), TEXT_COLOR, "mt"))
+            labels.append((center, bottom + 0.1 * height, hex_code, _font(HEX_SIZE * scale, False), HEX_COLOR, "mt"))
+
+    image = Image.fromarray(pixels, "RGBA")
+    draw = ImageDraw.Draw(image)
+    for x, y, text, font, fill, anchor in labels:
+        draw.text((x, y), text, font=font, fill=fill, anchor=anchor)
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG", optimize=False, compress_level=1)
+    return buffer.getvalue()
+
+
+def _render_svg(rows: Tuple[Row, Row], scale: int) -> bytes:
+    width, height = _canvas_width(rows, scale), HEIGHT * scale
+    font = 'font-family="DejaVu Sans, Arial, sans-serif"'
+    parts = [f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" viewBox="0 0 {width} {height}">']
+    for title, title_y, row, top, bottom in _layout(rows, scale):
+        parts.append(f'<text x="{width / 2:g}" y="{title_y}" {font} font-size="{TITLE_SIZE * scale}" '
+                     f'font-weight="bold" text-anchor="middle" fill="{TEXT_COLOR}">{escape(title)}</text>')
+        edges = _block_edges(len(row), width)
+        for (name, hex_code), left, right in zip(row, edges, edges[1:]):
+            center = (left + right) / 2
+            parts.append(f'<rect x="{left}" y="{top}" width="{right - left}" height="{bottom - top}" '
+                         f'fill="#{"%02x%02x%02x" % _rgb(hex_code)}"/>')
+            parts.append(f'<text x="{center:g}" y="{bottom + 0.05 * height:g}" {font} font-size="{NAME_SIZE * scale}" '
+                         f'font-weight="bold" text-anchor="middle" dominant-baseline="hanging" '
+                         f'fill="{TEXT_COLOR}">{escape(name)}</text>')
+            parts.append(f'<text x="{center:g}" y="{bottom + 0.1 * height:g}" {font} font-size="{HEX_SIZE * scale}" '
+                         f'text-anchor="middle" dominant-baseline="hanging" fill="{HEX_COLOR}">{escape(hex_code)}</text>')
+    parts.append('</svg>')
+    return "\n".join(parts).encode("utf-8")
+
+
+def render_palette(palette: Dict[str, List[Dict[str, str]]], image_format: str = "png", scale: int = 1) -> bytes:
+    """
+    Render a palette from generate_color_palette as PNG or SVG bytes.
+
+    Args:
+        palette (dict): {'primary': [{'name', 'hex'}, ...], 'secondary': [...]}.
+        image_format (str): "png" or "svg".
+        scale (int): Pixel multiplier over the 1000x700 base layout; use 2 or 3 for print.
+    """
+    image_format = image_format.lower()
+    if image_format not in ("png", "svg"):
+        raise ValueError(f"Unsupported palette format: {image_format!r}")
+    rows = _palette_rows(palette)
+    cache_key = (palette_digest(palette), image_format, scale)
+    with _renders_lock:
+        data = _renders.get(cache_key)
+        if data is not None:
+            _renders.move_to_end(cache_key)
+            return data
+
+    data = _render_svg(rows, scale) if image_format == "svg" else _render_png(rows, scale)
+
+    with _renders_lock:
+        _renders[cache_key] = data
+        while len(_renders) > PALETTE_RENDER_CACHE_SIZE:
+            _renders.popitem(last=False)
+    return data
+
+
+def save_palette(palette: Dict[str, List[Dict[str, str]]], filename: str, scale: int = 1) -> str:
+    """Render a palette to filename; the format follows the extension (.svg, otherwise PNG)."""
+    image_format = "svg" if filename.lower().endswith(".svg") else "png"
+    with open(filename, "wb") as f:
+        f.write(render_palette(palette, image_format, scale))
+    return filename
+
+
+def clear_render_cache():
+    with _renders_lock:
+        _renders.clear()
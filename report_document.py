@@ -0,0 +1,72 @@
+"""
+Structured form of a generated report.
+
+The model's markdown is parsed once into Section objects; image generation
+attaches ImageRefs to them, and both the HTML report and the Streamlit view are
+rendered from the sections instead of re-scanning markdown or HTML strings.
+"""
+from dataclasses import asdict, dataclass, field, replace
+from typing import Any, Dict, List, Tuple
+
+UNTITLED_SECTION = "Untitled Section"
+
+
+@dataclass(frozen=True)
+class ImageRef:
+    """An image saved in the report's output directory."""
+    filename: str
+    alt: str
+    caption: str
+
+    def to_html(self) -> str:
+        return f"""<div class="section-image">
+    <img src="{self.filename}" alt="{self.alt}">
+    <div class="image-caption">{self.caption}</div>
+</div>"""
+
+
+@dataclass(frozen=True)
+class Section:
+    """One "## " section of the report: its title, markdown body and images."""
+    title: str
+    body: str
+    images: Tuple[ImageRef, ...] = field(default_factory=tuple)
+
+    @classmethod
+    def from_markdown(cls, text: str) -> "Section":
+        title, body = split_title(text)
+        return cls(title, body)
+
+    def with_images(self, images: List[ImageRef]) -> "Section":
+        return replace(self, images=tuple(images))
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Plain JSON-serializable form, e.g. for persisted job results."""
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Section":
+        return cls(data["title"], data["body"], tuple(ImageRef(**image) for image in data.get("images", ())))
+
+    def to_markdown(self) -> str:
+        """Markdown for the report: title, lead image, body, then the remaining images."""
+        if not self.images:
+            return f"## {self.title}\n\n{self.body}" if self.body else f"## {self.title}"
+        lead_image, *more_images = self.images
+        parts = [f"## {self.title}", lead_image.to_html()]
+        if self.body:
+            parts.append(self.body)
+        parts.extend(image.to_html() for image in more_images)
+        return "\n\n".join(parts)
+
+
+def split_title(text: str) -> Tuple[str, str]:
+    """Split section markdown into its title (first line, without "#" marks) and body."""
+    first_line, _, body = text.partition("\n")
+    title = first_line.strip().lstrip("#").strip()
+    return title or UNTITLED_SECTION, body
+
+
+def sections_to_markdown(sections: List[Section]) -> str:
+    """Join sections into the full report markdown."""
+    return "\n\n".join(section.to_markdown() for section in sections)
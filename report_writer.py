@@ -0,0 +1,167 @@
+"""
+Incremental HTML report writer.
+
+The document head (with the stylesheet) is written as soon as a report starts,
+each section is rendered from markdown the moment its images are done, and the
+sections are appended in report order as soon as every section before them has
+been written. A report that is still generating is therefore a readable,
+downloadable prefix of the final one, and rendering is spread over the run
+instead of landing at its end.
+"""
+import os
+import threading
+from typing import Dict, List, Optional
+
+from markdown import markdown
+
+from report_document import Section
+
+REPORT_FILE_NAME = "generated.html"
+
+REPORT_STYLESHEET = """\
+            body {
+                font-family: Arial, sans-serif;
+                line-height: 1.6;
+                max-width: 1200px;
+                margin: 0 auto;
+                padding: 20px;
+                color: #333;
+            }
+            h1, h2 {
+                color: #2c3e50;
+                margin-top: 1.5em;
+                margin-bottom: 0.5em;
+            }
+            .section {
+                margin-bottom: 40px;
+                padding: 20px;
+                background: #fff;
+                border-radius: 8px;
+                box-shadow: 0 1px 3px rgba(0,0,0,0.1);
+            }
+            .section-image {
+                margin-bottom: 20px;
+                text-align: center;
+            }
+            .section-image img {
+                max-width: 100%;
+                height: auto;
+                max-height: 500px;
+                object-fit: cover;
+                border-radius: 8px;
+                box-shadow: 0 2px 4px rgba(0,0,0,0.1);
+            }
+            .image-caption {
+                margin-top: 8px;
+                font-size: 1.1em;
+                color: #666;
+                font-style: italic;
+            }
+            p {
+                margin-bottom: 1em;
+            }
+            @media (max-width: 768px) {
+                .section-image img {
+                    max-height: 300px;
+                }
+            }
+"""
+
+REPORT_HEAD = """<!DOCTYPE html>
+    <html>
+    <head>
+        <meta charset="UTF-8">
+        <meta name="viewport" content="width=device-width, initial-scale=1.0">
+        <title>Generated Interior Design Content</title>
+        <style>
+""" + REPORT_STYLESHEET + """        </style>
+    </head>
+    <body>
+    """
+
+REPORT_TAIL = """
+    </body>
+    </html>"""
+
+# Closes a report that is still being written, e.g. for a partial download
+PARTIAL_REPORT_TAIL = """
+    <p><em>This report was still being generated; the remaining sections are not included.</em></p>""" + REPORT_TAIL
+
+
+def render_markdown(content: str) -> str:
+    """Render report markdown to an HTML fragment."""
+    html_content = markdown(content, extensions=['extra', 'codehilite'], output_format='html5')
+    # Remove any ">" characters that might have been added to captions
+    return html_content.replace('&gt;', '')
+
+
+def is_complete_report(html: bytes) -> bool:
+    """Whether a report file has been finalized."""
+    return html.rstrip().endswith(REPORT_TAIL.strip().encode("utf-8"))
+
+
+class IncrementalReportWriter:
+    """
+    Write a report to output_dir/generated.html section by section.
+
+    add_section() may be called in any order as sections finish; each is
+    rendered immediately and written once all earlier sections have been.
+    finalize() writes whatever is left and closes the document.
+    """
+
+    def __init__(self, output_dir: str, filename: str = REPORT_FILE_NAME):
+        self.path = os.path.join(output_dir, filename)
+        self._rendered: Dict[int, str] = {}
+        self._next_index = 0
+        self._finalized = False
+        self._lock = threading.Lock()
+        with open(self.path, "w", encoding="utf-8") as f:
+            f.write(REPORT_HEAD)
+
+    def add_markdown(self, index: int, content: str):
+        """Render the markdown of the index-th part of the report and write it if it's next in line."""
+        html = render_markdown(content)
+        with self._lock:
+            if self._finalized or index < self._next_index or index in self._rendered:
+                return
+            self._rendered[index] = html
+            self._flush()
+
+    def add_section(self, index: int, section: Section):
+        self.add_markdown(index, section.to_markdown())
+
+    def _flush(self):
+        """Append the contiguous run of rendered sections that follows what's already written."""
+        chunks = []
+        while self._next_index in self._rendered:
+            html = self._rendered.pop(self._next_index)
+            chunks.append(html if self._next_index == 0 else "\n\n" + html)
+            self._next_index += 1
+        if chunks:
+            with open(self.path, "a", encoding="utf-8") as f:
+                # One write per flush, so a reader sees whole sections
+                f.write("".join(chunks))
+
+    def finalize(self, sections: Optional[List[Section]] = None) -> str:
+        """
+        Write the sections not added yet (e.g. ones whose image work failed) and close the document.
+
+        Returns:
+            str: Path of the finished report.
+        """
+        for index, section in enumerate(sections or []):
+            with self._lock:
+                added = index < self._next_index or index in self._rendered
+            if not added:
+                self.add_section(index, section)
+        with self._lock:
+            if self._finalized:
+                return self.path
+            # Anything still waiting on a missing earlier part is written in order
+            while self._rendered:
+                self._next_index = min(self._rendered)
+                self._flush()
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(REPORT_TAIL)
+            self._finalized = True
+        return self.path
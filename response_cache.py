@@ -0,0 +1,174 @@
+import os
+import json
+import hashlib
+import tempfile
+import threading
+import logging
+from collections import OrderedDict
+from typing import Optional, Dict, Any
+
+from file_lock import file_lock
+
+logger = logging.getLogger(__name__)
+
+# Once the budget is exceeded, evict down to this fraction of it so we don't
+# rescan the cache on every following write.
+EVICTION_LOW_WATERMARK = 0.9
+
+
+def make_cache_key(**fields: Any) -> str:
+    """Build a content-addressed key from everything that affects a response."""
+    canonical = json.dumps(fields, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """
+    Size-bounded, on-disk cache for JSON-serializable model responses.
+
+    Entries live in a sharded layout (``<root>/<key[:2]>/<key>.json``) and are
+    written atomically, so readers in other processes never see partial files.
+    Recency is tracked through file modification times, which lets every process
+    sharing the directory take part in the same LRU eviction.
+    """
+
+    # File extension of cache entries; subclasses storing other payloads override it
+    entry_suffix = ".json"
+
+    def __init__(self, root: str, max_bytes: int, memory_items: int = 0):
+        """
+        Args:
+            root (str): Directory holding the cache.
+            max_bytes (int): Byte budget for all entries on disk.
+            memory_items (int): Number of entries to also keep in process memory.
+        """
+        self.root = root
+        self.max_bytes = max_bytes
+        self.memory_items = memory_items
+        self._memory: "OrderedDict[str, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._approx_bytes: Optional[int] = None
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.evictions = 0
+
+    def _entry_path(self, key: str) -> str:
+        return os.path.join(self.root, key[:2], f"{key}{self.entry_suffix}")
+
+    def _remember(self, key: str, value: Any):
+        if self.memory_items <= 0:
+            return
+        with self._lock:
+            self._memory[key] = value
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_items:
+                self._memory.popitem(last=False)
+
+    def get(self, key: str) -> Optional[Any]:
+        """Return the cached value for key, or None on a miss."""
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return self._memory[key]
+
+        path = self._entry_path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                value = json.load(f)["value"]
+        except (FileNotFoundError, json.JSONDecodeError, KeyError):
+            with self._lock:
+                self.misses += 1
+            return None
+
+        try:
+            # Touch the entry so eviction treats it as recently used
+            os.utime(path)
+        except OSError:
+            pass
+        with self._lock:
+            self.hits += 1
+        self._remember(key, value)
+        return value
+
+    def put(self, key: str, value: Any):
+        """Store a value, evicting least recently used entries if over budget."""
+        path = self._entry_path(key)
+        shard_dir = os.path.dirname(path)
+        os.makedirs(shard_dir, exist_ok=True)
+        data = json.dumps({"value": value}).encode("utf-8")
+
+        fd, tmp_path = tempfile.mkstemp(dir=shard_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+
+        self._remember(key, value)
+        self._record_write(len(data))
+
+    def _record_write(self, size: int):
+        """Count a new entry of size bytes and evict if the cache is over budget."""
+        with self._lock:
+            self.writes += 1
+            if self._approx_bytes is not None:
+                self._approx_bytes += size
+            over_budget = self._approx_bytes is None or self._approx_bytes > self.max_bytes
+        if over_budget:
+            self._evict()
+
+    def _scan(self):
+        entries = []
+        for shard in os.scandir(self.root):
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                if entry.name.endswith(self.entry_suffix):
+                    try:
+                        st = entry.stat()
+                    except FileNotFoundError:
+                        continue
+                    entries.append((st.st_mtime, st.st_size, entry.path))
+        return entries
+
+    def _evict(self):
+        """Delete least recently used entries until the cache fits its budget."""
+        with file_lock(os.path.join(self.root, ".lock")):
+            entries = self._scan()
+            total = sum(size for _, size, _ in entries)
+            evicted = 0
+            if total > self.max_bytes:
+                target = self.max_bytes * EVICTION_LOW_WATERMARK
+                for _, size, path in sorted(entries):
+                    if total <= target:
+                        break
+                    try:
+                        os.remove(path)
+                    except FileNotFoundError:
+                        pass
+                    total -= size
+                    evicted += 1
+                    with self._lock:
+                        self._memory.pop(os.path.basename(path)[:-len(self.entry_suffix)], None)
+        with self._lock:
+            self._approx_bytes = total
+            self.evictions += evicted
+        if evicted:
+            logger.info(f"Evicted {evicted} entries from response cache {self.root}")
+
+    def stats(self) -> Dict[str, int]:
+        """Return hit/miss/write/eviction counters for this process."""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "writes": self.writes,
+                "evictions": self.evictions,
+            }
@@ -0,0 +1,204 @@
+"""
+Storage for generated output: unique job directories plus retention and quota.
+
+Every job gets a collision-free id ("<YYYYmmdd_HHMMSS>_<8 hex>") and a directory
+sharded by date, OUTPUT_ROOT/YYYY/MM/DD/<job id>, so no directory grows with the
+whole history. A garbage collector deletes jobs older than the retention period
+and, when the root exceeds its quota, the oldest jobs until it fits. A job's
+age is that of its most recently modified file (or of the directory, which
+touch_job bumps when a report is viewed). Jobs used within OUTPUT_GC_MIN_AGE
+are never touched, so in-flight and freshly viewed reports survive.
+"""
+import os
+import re
+import time
+import uuid
+import shutil
+import threading
+import logging
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from file_lock import file_lock
+
+logger = logging.getLogger(__name__)
+
+OUTPUT_ROOT = os.getenv("OUTPUT_ROOT", "generated_content")
+# Delete jobs not modified for this many days (0 keeps them forever)
+OUTPUT_RETENTION_DAYS = float(os.getenv("OUTPUT_RETENTION_DAYS", "7"))
+# Keep the whole root under this many bytes (0 means no quota)
+OUTPUT_QUOTA_BYTES = int(os.getenv("OUTPUT_QUOTA_BYTES", str(5 * 1024 * 1024 * 1024)))
+# Never delete a job modified more recently than this many seconds
+OUTPUT_GC_MIN_AGE = float(os.getenv("OUTPUT_GC_MIN_AGE", "3600"))
+# Seconds between background collections (0 disables the collector thread)
+OUTPUT_GC_INTERVAL = float(os.getenv("OUTPUT_GC_INTERVAL", "600"))
+
+JOB_ID_PATTERN = re.compile(r"^(\d{8})_(\d{6})_([0-9a-f]{8})$")
+
+
+def new_job_id(now: Optional[datetime] = None) -> str:
+    """A sortable, collision-free job id."""
+    now = now or datetime.now()
+    return f"{now.strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:8]}"
+
+
+def validate_job_id(job_id: str) -> str:
+    """Return job_id if it is a well-formed job id, e.g. one taken from a URL; raises ValueError otherwise."""
+    if not isinstance(job_id, str) or not JOB_ID_PATTERN.match(job_id):
+        raise ValueError(f"Not a job id: {job_id!r}")
+    return job_id
+
+
+def job_dir(job_id: str, root: str = OUTPUT_ROOT) -> str:
+    """The directory of a job, sharded by the date in its id."""
+    date = validate_job_id(job_id)[:8]
+    return os.path.join(root, date[:4], date[4:6], date[6:8], job_id)
+
+
+def create_job_dir(job_id: Optional[str] = None, root: str = OUTPUT_ROOT) -> str:
+    """Create the directory for a new job and return its path."""
+    path = job_dir(job_id or new_job_id(), root)
+    try:
+        os.makedirs(path)
+    except FileNotFoundError:
+        # The collector removed an empty date directory mid-way; try once more
+        os.makedirs(path)
+    return path
+
+
+def iter_job_dirs(root: str = OUTPUT_ROOT) -> Iterator[os.DirEntry]:
+    """Yield the directory entry of every job under root."""
+    if not os.path.isdir(root):
+        return
+    for year in os.scandir(root):
+        if not (year.is_dir() and year.name.isdigit()):
+            continue
+        for month in os.scandir(year.path):
+            if not month.is_dir():
+                continue
+            for day in os.scandir(month.path):
+                if not day.is_dir():
+                    continue
+                for job in os.scandir(day.path):
+                    if job.is_dir() and JOB_ID_PATTERN.match(job.name):
+                        yield job
+
+
+def job_usage(path: str) -> Tuple[float, int]:
+    """
+    (Last use, bytes) of a job directory.
+
+    Appending to a file (e.g. generated.html while a report is written) doesn't
+    change its directory's mtime, so the last use is the newest mtime of the
+    directory and everything in it. Both come from the same stat() calls.
+    """
+    last_used = os.stat(path).st_mtime
+    total = 0
+    for directory, subdirectories, filenames in os.walk(path):
+        for subdirectory in subdirectories:
+            try:
+                last_used = max(last_used, os.lstat(os.path.join(directory, subdirectory)).st_mtime)
+            except FileNotFoundError:
+                pass
+        for filename in filenames:
+            try:
+                file_stat = os.lstat(os.path.join(directory, filename))
+            except FileNotFoundError:
+                continue
+            last_used = max(last_used, file_stat.st_mtime)
+            total += file_stat.st_size
+    return last_used, total
+
+
+def touch_job(path: str):
+    """Mark a job as just used (e.g. its report was viewed) so the collector keeps it."""
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+
+
+def _remove_empty_parents(path: str, root: str):
+    """Remove the now-empty day/month/year directories above a deleted job."""
+    parent = os.path.dirname(path)
+    while os.path.abspath(parent) != os.path.abspath(root):
+        try:
+            os.rmdir(parent)
+        except OSError:
+            return
+        parent = os.path.dirname(parent)
+
+
+def collect_garbage(root: str = OUTPUT_ROOT, retention_days: float = OUTPUT_RETENTION_DAYS,
+                    quota_bytes: int = OUTPUT_QUOTA_BYTES, min_age: float = OUTPUT_GC_MIN_AGE) -> Dict[str, int]:
+    """
+    Delete expired jobs, then the oldest jobs while root is over its quota.
+
+    Returns:
+        dict: 'jobs' seen, 'deleted' jobs, 'freed_bytes' and 'total_bytes' left.
+    """
+    stats = {'jobs': 0, 'deleted': 0, 'freed_bytes': 0, 'total_bytes': 0}
+    if not os.path.isdir(root):
+        return stats
+
+    now = time.time()
+    with file_lock(os.path.join(root, ".gc.lock")):
+        jobs: List[Tuple[float, int, str]] = []
+        for entry in iter_job_dirs(root):
+            try:
+                last_used, size = job_usage(entry.path)
+            except FileNotFoundError:
+                continue
+            jobs.append((last_used, size, entry.path))
+        jobs.sort()
+        stats['jobs'] = len(jobs)
+        total = sum(size for _, size, _ in jobs)
+
+        for last_used, size, path in jobs:
+            age = now - last_used
+            if age < min_age:
+                # Oldest first, so everything after this is younger still
+                break
+            expired = retention_days > 0 and age > retention_days * 86400
+            over_quota = quota_bytes > 0 and total > quota_bytes
+            if not (expired or over_quota):
+                continue
+            shutil.rmtree(path, ignore_errors=True)
+            _remove_empty_parents(path, root)
+            total -= size
+            stats['deleted'] += 1
+            stats['freed_bytes'] += size
+
+    stats['total_bytes'] = total
+    if quota_bytes > 0 and total > quota_bytes:
+        logger.warning(f"{root} holds {total} bytes, over its {quota_bytes} byte quota, but the rest is too recent to delete")
+    if stats['deleted']:
+        logger.info(f"Deleted {stats['deleted']} old jobs from {root}, freeing {stats['freed_bytes']} bytes")
+    return stats
+
+
+_collector_thread: Optional[threading.Thread] = None
+_collector_lock = threading.Lock()
+
+
+def _collect_forever(interval: float):
+    while True:
+        try:
+            collect_garbage()
+        except Exception as e:
+            logger.error(f"Output garbage collection failed: {e}", exc_info=True)
+        time.sleep(interval)
+
+
+def start_garbage_collector(interval: float = OUTPUT_GC_INTERVAL) -> Optional[threading.Thread]:
+    """Run collect_garbage every interval seconds on a daemon thread, once per process."""
+    global _collector_thread
+    if interval <= 0:
+        return None
+    with _collector_lock:
+        if _collector_thread is None:
+            _collector_thread = threading.Thread(
+                target=_collect_forever, args=(interval,), name="output-gc", daemon=True
+            )
+            _collector_thread.start()
+        return _collector_thread
@@ -0,0 +1,36 @@
+"""
+Shared test setup: every test runs against the fake model backend with no
+simulated latency, and all on-disk state goes to a scratch directory.
+"""
+import os
+import tempfile
+
+# Configure the backend and state directories before any pipeline module reads the environment
+_scratch = tempfile.mkdtemp(prefix="interiorgenie_tests_")
+os.environ["MODEL_BACKEND"] = "fake"
+os.environ.setdefault("FAKE_TEXT_LATENCY", "0")
+os.environ.setdefault("FAKE_IMAGE_LATENCY", "0")
+os.environ.setdefault("FAKE_IMAGE_SIZE", "256")
+os.environ["TEST_MODE"] = "False"
+os.environ["PALETTE_PREFETCH"] = "False"
+os.environ["OUTPUT_ROOT"] = os.path.join(_scratch, "generated_content")
+os.environ["JOB_STATE_DIR"] = os.path.join(_scratch, "jobs")
+os.environ["RESPONSE_CACHE_DIR"] = os.path.join(_scratch, "response_cache")
+os.environ["PREVIEW_CACHE_DIR"] = os.path.join(_scratch, "preview_cache")
+os.environ["PALETTE_CACHE_DIR"] = os.path.join(_scratch, "palette_cache")
+
+import pytest
+
+import interior_design_generator as idg
+from response_cache import ResponseCache
+
+ROOM = ("Living Room", "Japandi", "Warm neutrals", "Low sofa, oak coffee table", "None provided")
+
+
+@pytest.fixture
+def text_cache(tmp_path, monkeypatch):
+    """A fresh, enabled text response cache."""
+    cache = ResponseCache(str(tmp_path / "response_cache"), 1024 * 1024)
+    monkeypatch.setattr(idg, "response_cache", cache)
+    monkeypatch.setattr(idg, "RESPONSE_CACHE_ENABLED", True)
+    return cache
@@ -0,0 +1,87 @@
+import asyncio
+import json
+
+import pytest
+
+from batch_generate import load_checkpoint, load_requests, request_output_dir, run_batch
+
+RECORD = {"room_type": "Living Room", "design_style": ["Japandi"], "color_palette": "Warm neutrals"}
+
+
+def _write_jsonl(path, records):
+    path.write_text("".join(json.dumps(record) + "\n" for record in records))
+    return str(path)
+
+
+def test_repeated_ids_are_skipped(tmp_path, caplog):
+    path = _write_jsonl(tmp_path / "designs.jsonl", [
+        {"id": "lr-01", **RECORD},
+        {"id": "lr_02", **RECORD},
+        {"id": "lr-01", **RECORD, "room_type": "Den"},
+        # Sanitized to the same directory name as lr_02
+        {"id": "lr/02", **RECORD},
+        # No id: keyed by its inputs, so an identical line is a repeat too
+        RECORD,
+        RECORD,
+    ])
+    requests = load_requests(path)
+    assert [item['id'] for item in requests][:2] == ["lr-01", "lr_02"]
+    assert len(requests) == 3
+    assert requests[0]['request']['room_type'] == "Living Room"
+    assert "already used on line 1" in caplog.text
+
+
+def test_rerun_request_starts_from_an_empty_directory(tmp_path, text_cache):
+    output_root = tmp_path / "batch_output"
+    checkpoint = str(output_root / "checkpoint.jsonl")
+    output_root.mkdir()
+    # Left behind by an interrupted run
+    (output_root / "lr-01").mkdir()
+    (output_root / "lr-01" / "orphan_view_1.jpeg").write_bytes(b"stale")
+
+    requests = load_requests(_write_jsonl(tmp_path / "designs.jsonl", [{"id": "lr-01", **RECORD}]))
+    summary = asyncio.run(run_batch(requests, str(output_root), checkpoint, concurrency=1, stream=False))
+
+    assert summary['succeeded'] == 1
+    assert not (output_root / "lr-01" / "orphan_view_1.jpeg").exists()
+    assert (output_root / "lr-01" / "generated.html").exists()
+    assert load_checkpoint(checkpoint) == {"lr-01"}
+
+    # A finished request is skipped, and its directory left alone, on the next run
+    summary = asyncio.run(run_batch(requests, str(output_root), checkpoint, concurrency=1, stream=False))
+    assert summary['skipped'] == 1
+    assert (output_root / "lr-01" / "generated.html").exists()
+
+
+@pytest.mark.parametrize("request_id", [".", "..", "..."])
+def test_dot_only_ids_are_rejected(tmp_path, caplog, request_id):
+    path = _write_jsonl(tmp_path / "designs.jsonl", [{"id": request_id, **RECORD}, {"id": "lr-01", **RECORD}])
+    assert [item['id'] for item in load_requests(path)] == ["lr-01"]
+    assert "invalid id" in caplog.text
+
+
+@pytest.mark.parametrize("request_id", [".", ".."])
+def test_run_never_clears_outside_the_output_root(tmp_path, request_id):
+    output_root = tmp_path / "batch_output"
+    output_root.mkdir()
+    checkpoint = str(output_root / "checkpoint.jsonl")
+    (output_root / "lr-01").mkdir()
+    (output_root / "lr-01" / "generated.html").write_text("done")
+    (tmp_path / "keep.txt").write_text("keep")
+
+    requests = [{'id': request_id, 'request': {}}]
+    summary = asyncio.run(run_batch(requests, str(output_root), checkpoint, concurrency=1, stream=False))
+
+    assert summary['failed'] == 1
+    assert (output_root / "lr-01" / "generated.html").exists()
+    assert (tmp_path / "keep.txt").exists()
+
+
+def test_request_output_dir_stays_inside_the_root(tmp_path):
+    (tmp_path / "outside").mkdir()
+    (tmp_path / "root").mkdir()
+    (tmp_path / "root" / "link").symlink_to(tmp_path / "outside")
+    assert request_output_dir(str(tmp_path / "root"), "lr-01") == str(tmp_path / "root" / "lr-01")
+    for request_id in (".", "..", "link"):
+        with pytest.raises(ValueError):
+            request_output_dir(str(tmp_path / "root"), request_id)
@@ -0,0 +1,32 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+from color_names import nearest_color_name
+from xkcd_colors import XKCD_COLORS
+
+
+def test_naming_colors_does_not_import_matplotlib():
+    code = (
+        "import sys, get_image_colors, color_names\n"
+        "color_names.nearest_color_names(['#ff0000'])\n"
+        "assert 'matplotlib' not in sys.modules\n"
+    )
+    subprocess.run([sys.executable, "-c", code], check=True, cwd=os.path.dirname(os.path.dirname(__file__)))
+
+
+def test_table_matches_matplotlib():
+    colors = pytest.importorskip("matplotlib.colors")
+    assert XKCD_COLORS == {key[len("xkcd:"):]: value for key, value in colors.XKCD_COLORS.items()}
+
+
+@pytest.mark.parametrize("color, name", [
+    ("#ff0000", "Fire Engine Red"),
+    ((20, 30, 200), "Ultramarine"),
+    ("#ffffff", "White"),
+])
+def test_nearest_color_name(color, name):
+    assert nearest_color_name(color) == name
+    assert nearest_color_name(color, exact=True) == name
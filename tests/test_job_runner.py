@@ -0,0 +1,154 @@
+import asyncio
+import json
+import threading
+import time
+
+import pytest
+
+import interior_design_generator as idg
+import job_runner
+from job_runner import CANCELLED, RUNNING, SUCCEEDED, JobCancelled, JobRunner, request_key
+
+from conftest import ROOM
+
+
+@pytest.fixture
+def runner(tmp_path):
+    return JobRunner(max_workers=2, state_dir=str(tmp_path / "jobs"))
+
+
+@pytest.mark.parametrize("job_id", ["../../x", "../secrets", "20250101_120000_abcdef12/../../x", ""])
+def test_get_rejects_ids_outside_the_state_dir(runner, tmp_path, job_id):
+    (tmp_path / "x.json").write_text(json.dumps({'job_id': "x", 'kind': "report"}))
+    with pytest.raises(ValueError):
+        runner.get(job_id)
+
+
+def _wait(runner, job_id, status=None, timeout=10.0):
+    """Poll a job without a waiter until it has finished (or reached status)."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = runner.get(job_id)
+        if (job.status == status) if status else job.finished:
+            return job
+        time.sleep(0.01)
+    raise AssertionError(f"Job {job_id} is still {runner.get(job_id).status}")
+
+
+class Gate:
+    """A job that blocks until opened, counting how often it ran."""
+
+    def __init__(self):
+        self.opened = threading.Event()
+        self.runs = 0
+
+    def sync_job(self, job_id, progress, **inputs):
+        self.runs += 1
+        while not self.opened.wait(0.01):
+            progress(0.5, "Waiting")
+        return {'inputs': inputs}
+
+    async def async_job(self, job_id, progress, **inputs):
+        self.runs += 1
+        while not self.opened.is_set():
+            await asyncio.sleep(0.01)
+        return {'inputs': inputs}
+
+
+def test_request_key_ignores_case_and_whitespace():
+    assert request_key("report", room_type="Living  Room ") == request_key("report", room_type="living room")
+    assert request_key("report", room_type="Den") != request_key("design_options", room_type="Den")
+
+
+def test_identical_requests_share_one_job(runner):
+    gate = Gate()
+    key = request_key("report", room_type="Den")
+    first = runner.submit("report", gate.async_job, key=key, waiter="a", room_type="Den")
+    second = runner.submit("report", gate.async_job, key=key, waiter="b", room_type="Den")
+    assert first == second
+    gate.opened.set()
+    assert _wait(runner, first).status == SUCCEEDED
+    assert gate.runs == 1
+
+    # Once finished, the same request starts a new job
+    third = runner.submit("report", gate.async_job, key=key, waiter="a", room_type="Den")
+    assert third != first
+    assert _wait(runner, third).status == SUCCEEDED
+
+
+def test_job_keeps_running_until_the_last_waiter_leaves(runner):
+    gate = Gate()
+    key = request_key("report", room_type="Den")
+    job_id = runner.submit("report", gate.async_job, key=key, waiter="a", room_type="Den")
+    runner.submit("report", gate.async_job, key=key, waiter="b", room_type="Den")
+    _wait(runner, job_id, RUNNING)
+
+    runner.release(job_id, "a")
+    time.sleep(0.05)
+    assert runner.get(job_id).status == RUNNING
+
+    runner.release(job_id, "b")
+    assert _wait(runner, job_id).status == CANCELLED
+    # A cancelled job no longer absorbs new identical requests
+    assert runner.submit("report", gate.async_job, key=key, waiter="c", room_type="Den") != job_id
+    gate.opened.set()
+
+
+def test_sync_job_stops_at_its_next_progress_report(runner):
+    gate = Gate()
+    job_id = runner.submit("design_options", gate.sync_job, waiter="a")
+    _wait(runner, job_id, RUNNING)
+    runner.release(job_id, "a")
+    assert _wait(runner, job_id).status == CANCELLED
+
+
+def test_queued_job_is_cancelled_before_it_starts(tmp_path):
+    runner = JobRunner(max_workers=1, state_dir=str(tmp_path / "jobs"))
+    gate = Gate()
+    blocker = runner.submit("report", gate.async_job)
+    queued = runner.submit("report", gate.async_job, waiter="a")
+    runner.release(queued, "a")
+    assert runner.get(queued).status == CANCELLED
+    gate.opened.set()
+    assert _wait(runner, blocker).status == SUCCEEDED
+    assert gate.runs == 1
+
+
+def test_jobs_without_a_waiter_are_never_cancelled(runner, monkeypatch):
+    monkeypatch.setattr(job_runner, "JOB_WAITER_TIMEOUT", 0.0)
+    gate = Gate()
+    job_id = runner.submit("report", gate.sync_job)
+    time.sleep(0.05)
+    assert runner.get(job_id).status == RUNNING
+    gate.opened.set()
+    assert _wait(runner, job_id).status == SUCCEEDED
+
+
+def test_waiters_that_stop_polling_are_dropped(runner, monkeypatch):
+    gate = Gate()
+    job_id = runner.submit("report", gate.sync_job, waiter="a")
+    _wait(runner, job_id, RUNNING)
+    # From now on nobody counts as polling, so the job's next progress report cancels it
+    monkeypatch.setattr(job_runner, "JOB_WAITER_TIMEOUT", -1.0)
+    assert _wait(runner, job_id).status == CANCELLED
+
+
+def test_cancelled_exception_from_a_job(runner):
+    def job(job_id, progress):
+        raise JobCancelled()
+    assert _wait(runner, runner.submit("report", job)).status == CANCELLED
+
+
+def test_coalesced_report_jobs_against_the_fake_backend(runner, text_cache):
+    inputs = dict(zip(
+        ("room_type", "design_style", "color_palette", "key_elements", "inspirational_photo_details"), ROOM
+    ))
+    key = request_key("report", **inputs)
+    first = runner.submit("report", idg.report_job, key=key, waiter="a", **inputs)
+    second = runner.submit("report", idg.report_job, key=key, waiter="b", **inputs)
+    assert first == second
+    job = _wait(runner, first, timeout=60)
+    assert job.status == SUCCEEDED
+    report = idg.report_from_job_result(job.result)
+    assert report['request_id'] == first
+    assert [section.title for section in report['sections']][:2] == ["Overall Concept and Style", "Color Scheme and Materials"]
@@ -0,0 +1,20 @@
+import os
+
+import get_image_colors as gic
+from response_cache import ResponseCache
+
+IMAGE = os.path.join(os.path.dirname(os.path.dirname(__file__)), "generated_content_20250609_160305", "design_option_1.jpeg")
+
+
+def test_fake_backend_palette_is_not_served_to_vertex(tmp_path, monkeypatch):
+    cache = ResponseCache(str(tmp_path / "palette_cache"), 1024 * 1024)
+    monkeypatch.setattr(gic, "palette_cache", cache)
+    monkeypatch.setattr(gic, "MODEL_BACKEND", "fake")
+    palette = gic.get_image_colors(IMAGE, mode="llm")
+    fake_key = gic.get_palette_cache_key(IMAGE)
+    assert palette and cache.get(fake_key) == palette
+
+    monkeypatch.setattr(gic, "MODEL_BACKEND", "vertex")
+    vertex_key = gic.get_palette_cache_key(IMAGE)
+    assert vertex_key != fake_key
+    assert cache.get(vertex_key) is None
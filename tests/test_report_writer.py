@@ -0,0 +1,117 @@
+import asyncio
+import re
+import zipfile
+
+import interior_design_generator as idg
+from report_document import Section, sections_to_markdown
+from report_writer import (
+    PARTIAL_REPORT_TAIL, REPORT_HEAD, REPORT_TAIL, IncrementalReportWriter, is_complete_report, render_markdown
+)
+
+from conftest import ROOM
+
+SECTIONS = [Section(f"Section {n}", f"Body of section {n}.") for n in range(4)]
+
+
+def _read(writer):
+    with open(writer.path, "rb") as f:
+        return f.read()
+
+
+def _blocks(html: str) -> str:
+    """HTML with the insignificant whitespace between block tags removed."""
+    return re.sub(r">\s+<", "><", html.strip())
+
+
+def _body(html: bytes) -> str:
+    text = html.decode("utf-8")
+    assert text.startswith(REPORT_HEAD)
+    return text[len(REPORT_HEAD):]
+
+
+def test_head_is_written_immediately(tmp_path):
+    writer = IncrementalReportWriter(str(tmp_path))
+    html = _read(writer)
+    assert _body(html) == ""
+    assert not is_complete_report(html)
+
+
+def test_sections_are_written_in_report_order(tmp_path):
+    writer = IncrementalReportWriter(str(tmp_path))
+    writer.add_section(2, SECTIONS[2])
+    writer.add_section(1, SECTIONS[1])
+    # Nothing can be written until section 0 is there
+    assert _body(_read(writer)) == ""
+
+    writer.add_section(0, SECTIONS[0])
+    body = _body(_read(writer))
+    assert [title in body for title in ("Section 0", "Section 1", "Section 2", "Section 3")] == [True, True, True, False]
+    assert body.index("Section 0") < body.index("Section 1") < body.index("Section 2")
+    assert not is_complete_report(_read(writer))
+
+
+def test_finalize_fills_in_missing_sections_and_closes(tmp_path):
+    writer = IncrementalReportWriter(str(tmp_path))
+    writer.add_section(1, SECTIONS[1])
+    writer.add_section(3, SECTIONS[3])
+    path = writer.finalize(SECTIONS)
+    assert path == writer.path
+
+    html = _read(writer)
+    assert is_complete_report(html)
+    assert html.decode("utf-8").endswith(REPORT_TAIL)
+    assert _blocks(_body(html)) == _blocks(render_markdown(sections_to_markdown(SECTIONS)) + REPORT_TAIL)
+
+    # Further calls change nothing
+    writer.add_section(4, Section("Late", "Too late."))
+    assert writer.finalize() == path
+    assert _read(writer) == html
+
+
+def test_finalize_without_sections_writes_what_it_has(tmp_path):
+    writer = IncrementalReportWriter(str(tmp_path))
+    writer.add_section(2, SECTIONS[2])
+    writer.finalize()
+    body = _body(_read(writer))
+    assert "Section 2" in body and body.endswith(REPORT_TAIL)
+
+
+def test_save_to_html_matches_whole_document_render(tmp_path):
+    (tmp_path / "markdown").mkdir()
+    (tmp_path / "sections").mkdir()
+    markdown_path = idg.save_to_html(sections_to_markdown(SECTIONS), str(tmp_path / "markdown"))
+    sections_path = idg.save_to_html(SECTIONS, str(tmp_path / "sections"))
+    with open(markdown_path, "rb") as a, open(sections_path, "rb") as b:
+        assert _blocks(_body(a.read())) == _blocks(_body(b.read()))
+
+
+def test_partial_and_final_archives(tmp_path):
+    output_dir = str(tmp_path)
+    writer = IncrementalReportWriter(output_dir)
+    writer.add_section(0, SECTIONS[0])
+
+    archive_path = idg.build_report_archive(writer.path, output_dir)
+    with zipfile.ZipFile(archive_path) as archive:
+        partial = archive.read("generated.html").decode("utf-8")
+    assert partial.endswith(PARTIAL_REPORT_TAIL)
+    assert "Section 0" in partial and "Section 1" not in partial
+    # The file on disk is left as it was
+    assert not is_complete_report(_read(writer))
+
+    writer.finalize(SECTIONS)
+    archive_path = idg.build_report_archive(writer.path, output_dir)
+    with zipfile.ZipFile(archive_path) as archive:
+        final = archive.read("generated.html")
+    assert final == _read(writer)
+    assert is_complete_report(final) and PARTIAL_REPORT_TAIL.encode("utf-8") not in final
+
+
+def test_generated_report_is_complete(tmp_path, text_cache):
+    for stream in (False, True):
+        output_dir = str(tmp_path / f"stream_{stream}")
+        report = asyncio.run(idg.generate_report(*ROOM, output_dir=output_dir, stream=stream))
+        with open(report['html_path'], "rb") as f:
+            html = f.read()
+        assert is_complete_report(html)
+        # Sections rendered one by one add up to the whole document rendered at once
+        assert _blocks(_body(html)) == _blocks(render_markdown(report['markdown_content']) + REPORT_TAIL)
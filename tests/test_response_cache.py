@@ -0,0 +1,96 @@
+import os
+
+import pytest
+
+from image_previews import PreviewCache
+from response_cache import EVICTION_LOW_WATERMARK, ResponseCache, make_cache_key
+
+# json.dumps({"value": VALUE}) is exactly ENTRY_BYTES long
+ENTRY_BYTES = 200
+VALUE = "x" * (ENTRY_BYTES - len('{"value": ""}'))
+
+
+def _age(cache, key, seconds_ago):
+    """Backdate an entry, as if it was last used seconds_ago."""
+    path = cache._entry_path(key)
+    when = os.stat(path).st_mtime - seconds_ago
+    os.utime(path, (when, when))
+
+
+def _fill(cache, count):
+    keys = [make_cache_key(n=n) for n in range(count)]
+    for age, key in zip(range(count, 0, -1), keys):
+        cache.put(key, VALUE)
+        # Oldest first, ten seconds apart
+        _age(cache, key, age * 10)
+    return keys
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return ResponseCache(str(tmp_path / "cache"), max_bytes=5 * ENTRY_BYTES, memory_items=10)
+
+
+def test_round_trip_and_stats(cache):
+    key = make_cache_key(prompt="a", model="m")
+    assert cache.get(key) is None
+    cache.put(key, {"text": "hello"})
+    assert cache.get(key) == {"text": "hello"}
+    assert cache.stats() == {"hits": 1, "misses": 1, "writes": 1, "evictions": 0}
+
+
+def test_key_covers_every_field():
+    assert make_cache_key(prompt="a", model="m") == make_cache_key(model="m", prompt="a")
+    assert make_cache_key(prompt="a", model="m") != make_cache_key(prompt="a", model="m", backend="fake")
+
+
+def test_fits_budget_without_evicting(cache):
+    keys = _fill(cache, 5)
+    assert all(os.path.exists(cache._entry_path(key)) for key in keys)
+    assert cache.stats()['evictions'] == 0
+
+
+def test_evicts_least_recently_used_down_to_low_watermark(cache):
+    keys = _fill(cache, 5)
+    newest = make_cache_key(n="newest")
+    cache.put(newest, VALUE)
+
+    remaining = [key for key in keys + [newest] if os.path.exists(cache._entry_path(key))]
+    # 6 entries over a 5-entry budget: the two oldest go, leaving 4 (<= 90% of the budget)
+    assert remaining == keys[2:] + [newest]
+    assert len(remaining) * ENTRY_BYTES <= cache.max_bytes * EVICTION_LOW_WATERMARK
+    assert cache.stats()['evictions'] == 2
+    # Evicted entries are gone from the memory tier too
+    assert cache.get(keys[0]) is None
+
+
+def test_reading_an_entry_protects_it_from_eviction(tmp_path):
+    # No memory tier, so get() has to read (and touch) the file
+    cache = ResponseCache(str(tmp_path / "cache"), max_bytes=5 * ENTRY_BYTES)
+    keys = _fill(cache, 5)
+    assert cache.get(keys[0]) == VALUE
+    cache.put(make_cache_key(n="newest"), VALUE)
+
+    assert os.path.exists(cache._entry_path(keys[0]))
+    assert not os.path.exists(cache._entry_path(keys[1]))
+    assert not os.path.exists(cache._entry_path(keys[2]))
+
+
+def test_a_second_process_shares_the_budget(cache):
+    keys = _fill(cache, 5)
+    other_process = ResponseCache(cache.root, cache.max_bytes)
+    assert other_process.get(keys[4]) == VALUE
+    other_process.put(make_cache_key(n="newest"), VALUE)
+    assert not os.path.exists(cache._entry_path(keys[0]))
+
+
+def test_preview_cache_evicts_image_files(tmp_path):
+    cache = PreviewCache(str(tmp_path / "previews"), max_bytes=3 * 1000, image_format="jpeg")
+    keys = [make_cache_key(n=n) for n in range(4)]
+    for age, key in zip(range(4, 0, -1), keys):
+        path = cache.put_bytes(key, b"\xff\xd8\xff" + b"\0" * 997)
+        assert path.endswith(".jpeg")
+        if age > 1:
+            _age(cache, key, age * 10)
+    assert cache.cached_path(keys[0]) is None
+    assert all(cache.cached_path(key) for key in keys[2:])
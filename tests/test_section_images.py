@@ -0,0 +1,23 @@
+import pytest
+
+from interior_design_generator import plan_section_images
+from report_document import Section
+
+
+@pytest.mark.parametrize("title, captions", [
+    ("Color Scheme", ["Color Scheme", "Color Scheme - View 2"]),
+    ("Furniture Recommendations", [
+        "Furniture Recommendations", "Furniture Recommendations - View 2", "Furniture Recommendations - View 3"
+    ]),
+    ("Lighting Plan", ["Lighting Plan", "Lighting Plan - View 2", "Lighting Plan - View 3"]),
+    ("Furniture and Lighting", [
+        "Furniture and Lighting", "Furniture and Lighting - View 2",
+        "Furniture and Lighting - View 3", "Furniture and Lighting - View 4"
+    ]),
+])
+def test_views_are_numbered_by_position(title, captions):
+    assert plan_section_images(Section(title, "Some text.")) == captions
+
+
+def test_title_only_sections_get_no_images():
+    assert plan_section_images(Section("Overview", "")) == []
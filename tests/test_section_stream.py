@@ -0,0 +1,89 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+import interior_design_generator as idg
+from interior_design_generator import SectionStreamParser, parse_sections
+
+REPORT = """Intro before any header.
+
+## Overall Concept and Style
+A calm, warm living room.
+
+## Color Scheme and Materials
+- Oak and linen
+- Warm whites
+
+## Furniture Recommendations
+A low sofa.
+
+## Lighting Plan
+Layered lamps.
+"""
+
+
+def _titles(sections):
+    return [section.title for section in sections]
+
+
+def _feed_all(chunks):
+    parser = SectionStreamParser()
+    sections = []
+    for chunk in chunks:
+        sections += parser.feed(chunk)
+    return sections + parser.close()
+
+
+def test_one_chunk_matches_parse_sections():
+    assert _feed_all([REPORT]) == parse_sections(REPORT)
+    assert _titles(parse_sections(REPORT)) == [
+        "Intro before any header.", "Overall Concept and Style", "Color Scheme and Materials",
+        "Furniture Recommendations", "Lighting Plan"
+    ]
+
+
+@pytest.mark.parametrize("split", range(1, len(REPORT)))
+def test_any_chunk_boundary_gives_the_same_sections(split):
+    # Covers boundaries inside "\n## " and inside the header lines themselves
+    assert _feed_all([REPORT[:split], REPORT[split:]]) == parse_sections(REPORT)
+
+
+def test_character_by_character_stream():
+    assert _feed_all(list(REPORT)) == parse_sections(REPORT)
+
+
+def test_a_section_is_only_emitted_once_the_next_header_arrives():
+    parser = SectionStreamParser()
+    assert parser.feed("## Lighting Plan\nLayered lamps.\n#") == []
+    assert parser.pending_title == "Lighting Plan"
+    assert _titles(parser.feed("# Decorative Elements\nA rug.")) == ["Lighting Plan"]
+    assert _titles(parser.close()) == ["Decorative Elements"]
+
+
+class ChunkedTextModel:
+    """Text model streaming a fixed response in fixed-size chunks."""
+
+    def __init__(self, text, chunk_size):
+        self.chunks = [text[i:i + chunk_size] for i in range(0, len(text), chunk_size)]
+
+    async def generate_content_async(self, contents, stream=False, **kwargs):
+        async def chunks():
+            for chunk in self.chunks:
+                await asyncio.sleep(0)
+                yield SimpleNamespace(text=chunk)
+        return chunks()
+
+
+@pytest.mark.parametrize("chunk_size", [1, 3, 7, 64])
+def test_stream_and_process_sections_keeps_order(tmp_path, chunk_size):
+    done = []
+    text, sections = asyncio.run(idg.stream_and_process_sections(
+        ChunkedTextModel(REPORT, chunk_size), "prompt", "Living Room", "Japandi", "Warm neutrals", str(tmp_path),
+        on_section_done=lambda index, section, started: done.append((index, section.title))
+    ))
+    assert text == REPORT
+    assert _titles(sections) == _titles(parse_sections(REPORT))
+    # Every section reports its own index once, whatever order the images finish in
+    assert sorted(done) == list(enumerate(_titles(sections)))
+    assert all(section.images for section in sections if section.body)
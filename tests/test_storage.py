@@ -0,0 +1,69 @@
+import os
+import time
+
+import pytest
+
+from storage import collect_garbage, create_job_dir, job_dir, job_usage, touch_job, validate_job_id
+
+DAY = 86400
+
+
+def _backdate(path, seconds):
+    when = time.time() - seconds
+    os.utime(path, (when, when))
+
+
+def _old_job(root, job_id, age, files=("generated.html",), size=100):
+    """A job directory whose files and directory were all last modified age seconds ago."""
+    path = create_job_dir(job_id, str(root))
+    for name in files:
+        with open(os.path.join(path, name), "wb") as f:
+            f.write(b"x" * size)
+        _backdate(os.path.join(path, name), age)
+    _backdate(path, age)
+    return path
+
+
+def test_job_ids_are_validated():
+    assert validate_job_id("20250101_120000_abcdef12") == "20250101_120000_abcdef12"
+    assert job_dir("20250101_120000_abcdef12", "root") == os.path.join("root", "2025", "01", "01", "20250101_120000_abcdef12")
+    for bad in ("../../x", "20250101_120000_abcdef12/..", "", None):
+        with pytest.raises(ValueError):
+            validate_job_id(bad)
+
+
+def test_usage_counts_the_newest_file(tmp_path):
+    path = _old_job(tmp_path, "20250101_120000_00000001", 10 * DAY, files=("a.jpeg", "generated.html"))
+    # Appending doesn't change the directory's mtime
+    with open(os.path.join(path, "generated.html"), "ab") as f:
+        f.write(b"y" * 50)
+    last_used, size = job_usage(path)
+    assert time.time() - last_used < 60
+    assert size == 250
+
+
+def test_expired_jobs_are_deleted_but_active_ones_kept(tmp_path):
+    expired = _old_job(tmp_path, "20250101_120000_00000001", 10 * DAY)
+    still_writing = _old_job(tmp_path, "20250101_120000_00000002", 10 * DAY)
+    viewed = _old_job(tmp_path, "20250101_120000_00000003", 10 * DAY)
+    with open(os.path.join(still_writing, "generated.html"), "a") as f:
+        f.write("<h2>Another section</h2>")
+    touch_job(viewed)
+
+    stats = collect_garbage(str(tmp_path), retention_days=7, quota_bytes=0, min_age=3600)
+    assert stats['deleted'] == 1
+    assert not os.path.exists(expired)
+    assert os.path.exists(still_writing) and os.path.exists(viewed)
+
+
+def test_quota_deletes_least_recently_used_first(tmp_path):
+    older = _old_job(tmp_path, "20250101_120000_00000001", 3 * DAY, size=1000)
+    newer = _old_job(tmp_path, "20250102_120000_00000002", 2 * DAY, size=1000)
+    # Created first, but viewed since
+    _backdate(older, 2 * 3600)
+
+    stats = collect_garbage(str(tmp_path), retention_days=0, quota_bytes=1500, min_age=3600)
+    assert stats['deleted'] == 1 and stats['total_bytes'] == 1000
+    assert os.path.exists(older) and not os.path.exists(newer)
+    # The emptied date directories go too
+    assert not os.path.exists(os.path.join(str(tmp_path), "2025", "01", "02"))
@@ -0,0 +1,37 @@
+import asyncio
+
+import interior_design_generator as idg
+
+from conftest import ROOM
+
+
+def _prompt() -> str:
+    return idg.TEXT_GENERATION_PROMPT_TEMPLATE.format(
+        user_room_type=ROOM[0],
+        user_design_style=ROOM[1],
+        user_color_scheme=ROOM[2],
+        user_key_design_elements=ROOM[3],
+        user_inspirational_photo_details=ROOM[4]
+    )
+
+
+def test_test_mode_never_writes_the_response_cache(text_cache, tmp_path, monkeypatch):
+    monkeypatch.setattr(idg, "TEST_MODE", True)
+    report = asyncio.run(idg.generate_report(*ROOM, output_dir=str(tmp_path / "test_mode")))
+    assert report['markdown_content'].count("This is a test response") == 1
+    assert text_cache.stats()['writes'] == 0
+
+    monkeypatch.setattr(idg, "TEST_MODE", False)
+    assert idg.get_cached_text_response(idg.get_text_cache_key(_prompt())) is None
+
+
+def test_fake_backend_text_is_not_served_to_vertex(text_cache, tmp_path, monkeypatch):
+    monkeypatch.setattr(idg, "MODEL_BACKEND", "fake")
+    asyncio.run(idg.generate_report(*ROOM, output_dir=str(tmp_path / "fake")))
+    fake_key = idg.get_text_cache_key(_prompt())
+    assert idg.get_cached_text_response(fake_key)
+
+    monkeypatch.setattr(idg, "MODEL_BACKEND", "vertex")
+    vertex_key = idg.get_text_cache_key(_prompt())
+    assert vertex_key != fake_key
+    assert idg.get_cached_text_response(vertex_key) is None
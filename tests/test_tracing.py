@@ -0,0 +1,76 @@
+import json
+import threading
+
+from tracing import TRACE_FILE_NAME, span, trace_request
+
+
+def _stages(output_dir):
+    with open(output_dir / TRACE_FILE_NAME, "r", encoding="utf-8") as f:
+        trace = json.load(f)
+    return trace["request_id"], [record["stage"] for record in trace["spans"]]
+
+
+def test_continued_trace_adds_to_the_timeline(tmp_path):
+    with trace_request(str(tmp_path), "job1"):
+        with span("report"):
+            pass
+    with trace_request(str(tmp_path)):
+        with span("zip_build"):
+            pass
+    assert _stages(tmp_path) == ("job1", ["report", "zip_build"])
+
+
+def test_ui_spans_saved_while_the_job_runs_are_kept(tmp_path):
+    job_started = threading.Event()
+    ui_saved = threading.Event()
+
+    def job():
+        with trace_request(str(tmp_path), "job1"):
+            with span("report"):
+                job_started.set()
+                ui_saved.wait(5)
+
+    worker = threading.Thread(target=job)
+    worker.start()
+    job_started.wait(5)
+    # The UI builds a partial archive while the job's trace is still open
+    with trace_request(str(tmp_path)):
+        with span("zip_build"):
+            pass
+    ui_saved.set()
+    worker.join()
+
+    request_id, stages = _stages(tmp_path)
+    assert request_id == "job1"
+    assert sorted(stages) == ["report", "zip_build"]
+
+
+def test_saving_twice_does_not_duplicate_spans(tmp_path):
+    with trace_request(str(tmp_path), "job1") as trace:
+        with span("report"):
+            pass
+        trace.save()
+    assert _stages(tmp_path) == ("job1", ["report"])
+
+
+def test_ui_trace_saved_after_the_job_keeps_the_job_id(tmp_path):
+    job_saved = threading.Event()
+    ui_started = threading.Event()
+
+    def ui():
+        # Opened before the job has written anything
+        with trace_request(str(tmp_path)):
+            ui_started.set()
+            job_saved.wait(5)
+            with span("zip_build"):
+                pass
+
+    worker = threading.Thread(target=ui)
+    worker.start()
+    ui_started.wait(5)
+    with trace_request(str(tmp_path), "job1"):
+        with span("report"):
+            pass
+    job_saved.set()
+    worker.join()
+    assert _stages(tmp_path) == ("job1", ["report", "zip_build"])
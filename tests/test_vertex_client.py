@@ -0,0 +1,159 @@
+import asyncio
+import socket
+import time
+
+import pytest
+
+import vertex_client
+from vertex_client import (
+    QuotaDeadlineExceeded, TokenBucket, acall_with_retry, backoff_delay, call_with_retry, get_bucket,
+    is_retryable, parse_rate_limits,
+)
+
+
+class ApiError(Exception):
+    def __init__(self, code):
+        super().__init__(f"HTTP {code}")
+        self.code = code
+
+
+class Flaky:
+    """Raise each of errors in turn, then return "ok"; counts the calls."""
+
+    def __init__(self, *errors):
+        self.errors = list(errors)
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return "ok"
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(vertex_client, "VERTEX_BACKOFF_BASE", 0.0)
+
+
+def test_is_retryable():
+    assert is_retryable(ApiError(429))
+    assert is_retryable(ApiError(503))
+    assert is_retryable(socket.timeout("read timed out"))
+    assert not is_retryable(ApiError(400))
+    assert not is_retryable(ValueError("bad prompt"))
+    assert not is_retryable(QuotaDeadlineExceeded("out of time"))
+
+
+def test_backoff_delay_is_capped(monkeypatch):
+    monkeypatch.setattr(vertex_client, "VERTEX_BACKOFF_BASE", 1.0)
+    monkeypatch.setattr(vertex_client, "VERTEX_BACKOFF_MAX", 4.0)
+    for attempt in range(8):
+        assert 0.0 <= backoff_delay(attempt) <= min(4.0, 2 ** attempt)
+
+
+def test_retryable_errors_are_retried():
+    fn = Flaky(ApiError(429), ApiError(503))
+    assert call_with_retry("model", fn) == "ok"
+    assert fn.calls == 3
+
+
+def test_other_errors_are_raised_at_once():
+    fn = Flaky(ApiError(400))
+    with pytest.raises(ApiError):
+        call_with_retry("model", fn)
+    assert fn.calls == 1
+
+
+def test_gives_up_after_max_retries():
+    fn = Flaky(*[ApiError(429)] * 5)
+    with pytest.raises(ApiError):
+        call_with_retry("model", fn, max_retries=2)
+    assert fn.calls == 3
+
+
+def test_no_retry_that_would_overrun_the_deadline(monkeypatch):
+    monkeypatch.setattr(vertex_client, "backoff_delay", lambda attempt: 60.0)
+    fn = Flaky(ApiError(429))
+    with pytest.raises(ApiError):
+        call_with_retry("model", fn, timeout=5)
+    assert fn.calls == 1
+
+
+def test_timeout_raised_by_the_call_is_retried():
+    fn = Flaky(TimeoutError("read timed out"), socket.timeout("read timed out"))
+    assert call_with_retry("model", fn, timeout=5) == "ok"
+    assert fn.calls == 3
+
+
+def test_timeout_raised_by_the_call_is_retried_async():
+    fn = Flaky(TimeoutError("read timed out"), socket.timeout("read timed out"))
+    assert asyncio.run(acall_with_retry("model", fn, timeout=5)) == "ok"
+    assert fn.calls == 3
+
+    async def coroutine_fn():
+        return fn()
+
+    fn = Flaky(TimeoutError("read timed out"))
+    assert asyncio.run(acall_with_retry("model", coroutine_fn, timeout=5)) == "ok"
+    assert fn.calls == 2
+
+
+def test_slow_call_hits_the_deadline():
+    started = time.monotonic()
+    with pytest.raises(QuotaDeadlineExceeded, match="did not finish"):
+        call_with_retry("model", time.sleep, 2, timeout=0.2)
+    assert time.monotonic() - started < 1.0
+
+
+def test_slow_call_hits_the_deadline_async():
+    started = time.monotonic()
+    with pytest.raises(QuotaDeadlineExceeded, match="did not finish"):
+        asyncio.run(acall_with_retry("model", asyncio.sleep, 2, timeout=0.2))
+    assert time.monotonic() - started < 1.0
+
+
+def test_parse_rate_limits():
+    assert parse_rate_limits(None) == {}
+    assert parse_rate_limits("gemini=5:10, imagen=0.5,bogus") == {"gemini": (5.0, 10), "imagen": (0.5, 1)}
+
+
+def test_unlimited_models_have_no_bucket(monkeypatch):
+    monkeypatch.setattr(vertex_client, "RATE_LIMITS", {"limited": (1.0, 1)})
+    monkeypatch.setattr(vertex_client, "_buckets", {})
+    assert get_bucket("unlimited") is None
+    assert get_bucket("limited") is get_bucket("limited")
+
+
+def test_bucket_allows_a_burst_then_waits():
+    bucket = TokenBucket(rate=10.0, burst=3)
+    assert [bucket.try_acquire() for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert 0.0 < bucket.try_acquire() <= 0.1
+
+
+def test_bucket_wait_past_the_deadline_raises():
+    bucket = TokenBucket(rate=0.1, burst=1)
+    bucket.acquire()
+    with pytest.raises(QuotaDeadlineExceeded):
+        bucket.acquire(deadline=time.monotonic() + 1.0)
+    with pytest.raises(QuotaDeadlineExceeded):
+        asyncio.run(bucket.acquire_async(deadline=time.monotonic() + 1.0))
+
+
+def test_file_backed_buckets_share_their_tokens(tmp_path):
+    state_path = str(tmp_path / "model.bucket")
+    first = TokenBucket(rate=0.1, burst=2, state_path=state_path)
+    second = TokenBucket(rate=0.1, burst=2, state_path=state_path)
+    assert first.try_acquire() == 0.0
+    assert second.try_acquire() == 0.0
+    assert first.try_acquire() > 0.0
+
+
+def test_rate_limited_calls_wait_for_quota(monkeypatch):
+    monkeypatch.setattr(vertex_client, "RATE_LIMITS", {"model": (20.0, 1)})
+    monkeypatch.setattr(vertex_client, "_buckets", {})
+    started = time.monotonic()
+    for _ in range(3):
+        call_with_retry("model", lambda: None)
+    # One call from the burst, then one every 50ms
+    assert time.monotonic() - started >= 0.09
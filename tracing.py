@@ -0,0 +1,283 @@
+"""
+Per-request stage tracing and Prometheus-style latency metrics.
+
+Wrap a request in trace_request() and each stage in span(stage). Every span
+inside a request shares its correlation id, follows it into asyncio tasks and
+to_thread workers, and is written to <output_dir>/trace.json as a timeline.
+Every span also feeds the in-process histograms, which start_metrics_server()
+exposes on METRICS_PORT in the Prometheus text format.
+"""
+import os
+import json
+import time
+import uuid
+import tempfile
+import threading
+import logging
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from file_lock import file_lock
+
+logger = logging.getLogger(__name__)
+
+TRACE_FILE_NAME = "trace.json"
+
+# Port for the /metrics endpoint; unset or 0 leaves it off
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0") or "0")
+
+# Histogram bucket upper bounds in seconds, from fast local steps to slow model calls
+LATENCY_BUCKETS: Tuple[float, ...] = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+
+class StageHistograms:
+    """Thread-safe latency histograms and error counts keyed by stage."""
+
+    def __init__(self, buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._counts: Dict[str, List[int]] = {}
+        self._sums: Dict[str, float] = {}
+        self._errors: Dict[str, int] = {}
+
+    def observe(self, stage: str, seconds: float, error: bool = False):
+        with self._lock:
+            counts = self._counts.setdefault(stage, [0] * (len(self.buckets) + 1))
+            for index, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    counts[index] += 1
+                    break
+            else:
+                counts[-1] += 1
+            self._sums[stage] = self._sums.get(stage, 0.0) + seconds
+            if error:
+                self._errors[stage] = self._errors.get(stage, 0) + 1
+
+    def render_prometheus(self) -> str:
+        """Render the histograms in the Prometheus text exposition format."""
+        lines = [
+            "# HELP interior_stage_duration_seconds Time spent in each generation stage.",
+            "# TYPE interior_stage_duration_seconds histogram",
+        ]
+        with self._lock:
+            stages = sorted(self._counts)
+            for stage in stages:
+                cumulative = 0
+                for bound, count in zip(self.buckets, self._counts[stage]):
+                    cumulative += count
+                    lines.append(f'interior_stage_duration_seconds_bucket{{stage="{stage}",le="{bound:g}"}} {cumulative}')
+                cumulative += self._counts[stage][-1]
+                lines.append(f'interior_stage_duration_seconds_bucket{{stage="{stage}",le="+Inf"}} {cumulative}')
+                lines.append(f'interior_stage_duration_seconds_sum{{stage="{stage}"}} {self._sums[stage]:.6f}')
+                lines.append(f'interior_stage_duration_seconds_count{{stage="{stage}"}} {cumulative}')
+            lines.append("# HELP interior_stage_errors_total Stage runs that raised an exception.")
+            lines.append("# TYPE interior_stage_errors_total counter")
+            for stage in stages:
+                lines.append(f'interior_stage_errors_total{{stage="{stage}"}} {self._errors.get(stage, 0)}')
+        return "\n".join(lines) + "\n"
+
+
+stage_histograms = StageHistograms()
+
+
+class Trace:
+    """The spans recorded for one request."""
+
+    def __init__(self, request_id: str, output_dir: Optional[str] = None):
+        self.request_id = request_id
+        self.output_dir = output_dir
+        self.started_at = time.time()
+        self.spans: List[Dict[str, Any]] = []
+        self._loaded_spans = 0
+        # Set when this trace continues whatever timeline output_dir already has
+        self.continues_existing = False
+        self._lock = threading.Lock()
+
+    def add_span(self, record: Dict[str, Any]):
+        with self._lock:
+            self.spans.append(record)
+
+    def _read_existing(self) -> Optional[Dict[str, Any]]:
+        try:
+            with open(os.path.join(self.output_dir, TRACE_FILE_NAME), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def load_existing(self):
+        """Continue the timeline already written to output_dir, keeping its id and start time."""
+        self.continues_existing = True
+        existing = self._read_existing()
+        if existing is None:
+            return
+        self.request_id = existing.get("request_id", self.request_id)
+        self.started_at = existing.get("started_at_epoch", self.started_at)
+        with self._lock:
+            self.spans = existing.get("spans", []) + self.spans
+            self._loaded_spans = len(existing.get("spans", []))
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            spans = sorted(self.spans, key=lambda record: record["start_s"])
+        stages: Dict[str, Dict[str, Any]] = {}
+        for record in spans:
+            summary = stages.setdefault(record["stage"], {"count": 0, "total_s": 0.0, "max_s": 0.0})
+            summary["count"] += 1
+            summary["total_s"] = round(summary["total_s"] + record["duration_s"], 6)
+            summary["max_s"] = max(summary["max_s"], record["duration_s"])
+        return {
+            "request_id": self.request_id,
+            "started_at": datetime.fromtimestamp(self.started_at, timezone.utc).isoformat(),
+            "started_at_epoch": self.started_at,
+            "stages": stages,
+            "spans": spans,
+        }
+
+    def save(self) -> Optional[str]:
+        """
+        Atomically add this trace's new spans to output_dir/trace.json.
+
+        The file is re-read under a lock, so spans another trace of the same
+        directory saved meanwhile (e.g. the UI's ZIP build while the job is
+        still running) are kept rather than overwritten.
+        """
+        if not self.output_dir or not os.path.isdir(self.output_dir):
+            return None
+        with self._lock:
+            new_spans = self.spans[self._loaded_spans:]
+        if not new_spans:
+            return None
+        path = os.path.join(self.output_dir, TRACE_FILE_NAME)
+        with file_lock(path + ".lock"):
+            existing = self._read_existing()
+            with self._lock:
+                if existing is not None:
+                    if self.continues_existing:
+                        self.request_id = existing.get("request_id", self.request_id)
+                    self.started_at = min(self.started_at, existing.get("started_at_epoch", self.started_at))
+                    self.spans = existing.get("spans", []) + new_spans
+                self._loaded_spans = len(self.spans)
+            fd, tmp_path = tempfile.mkstemp(dir=self.output_dir, prefix=".", suffix=".part")
+            try:
+                with os.fdopen(fd, "w", encoding="utf-8") as f:
+                    json.dump(self.to_dict(), f, indent=2)
+                os.replace(tmp_path, path)
+            except BaseException:
+                try:
+                    os.remove(tmp_path)
+                except OSError:
+                    pass
+                raise
+        return path
+
+
+_current_trace: ContextVar[Optional[Trace]] = ContextVar("current_trace", default=None)
+
+
+def new_request_id() -> str:
+    return uuid.uuid4().hex[:12]
+
+
+def current_trace() -> Optional[Trace]:
+    return _current_trace.get()
+
+
+def current_request_id() -> Optional[str]:
+    trace = _current_trace.get()
+    return trace.request_id if trace else None
+
+
+@contextmanager
+def trace_request(output_dir: Optional[str] = None, request_id: Optional[str] = None) -> Iterator[Trace]:
+    """
+    Collect the spans of one request and write them to output_dir/trace.json on exit.
+
+    output_dir may also be set on the yielded Trace once it is known. Without a
+    request_id, an existing trace.json in output_dir is continued, so later
+    stages (e.g. the ZIP build on download) land on the same timeline.
+    """
+    trace = Trace(request_id or new_request_id(), output_dir)
+    if output_dir and not request_id:
+        trace.load_existing()
+    token = _current_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        _current_trace.reset(token)
+        try:
+            trace.save()
+        except OSError as e:
+            logger.warning(f"[{trace.request_id}] Could not write trace: {e}")
+
+
+@contextmanager
+def span(stage: str, **attributes: Any) -> Iterator[Dict[str, Any]]:
+    """
+    Time a stage. The yielded dict can take extra attributes (e.g. cache hit/miss).
+
+    Works in sync and async code; outside a trace_request the timing only feeds
+    the metrics.
+    """
+    trace = _current_trace.get()
+    started = time.time()
+    start = time.perf_counter()
+    status = "ok"
+    try:
+        yield attributes
+    except BaseException:
+        status = "error"
+        raise
+    finally:
+        duration = time.perf_counter() - start
+        stage_histograms.observe(stage, duration, error=status == "error")
+        if trace is not None:
+            trace.add_span({
+                "stage": stage,
+                "start_s": round(started - trace.started_at, 6),
+                "duration_s": round(duration, 6),
+                "status": status,
+                "thread": threading.current_thread().name,
+                "attributes": {key: value for key, value in attributes.items() if value is not None},
+            })
+            logger.debug(f"[{trace.request_id}] {stage} took {duration * 1000:.1f}ms ({status})")
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?", 1)[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = stage_histograms.render_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args: Any):
+        # Scrapes every few seconds would drown the application log
+        pass
+
+
+_metrics_server: Optional[ThreadingHTTPServer] = None
+_metrics_server_lock = threading.Lock()
+
+
+def start_metrics_server(port: int = METRICS_PORT) -> Optional[ThreadingHTTPServer]:
+    """Serve /metrics from a daemon thread, once per process; a port of 0 disables it."""
+    global _metrics_server
+    if not port:
+        return None
+    with _metrics_server_lock:
+        if _metrics_server is None:
+            try:
+                _metrics_server = ThreadingHTTPServer(("", port), _MetricsHandler)
+            except OSError as e:
+                logger.warning(f"Could not start metrics server on port {port}: {e}")
+                return None
+            threading.Thread(target=_metrics_server.serve_forever, name="metrics-server", daemon=True).start()
+            logger.info(f"Serving metrics on :{port}/metrics")
+        return _metrics_server
@@ -0,0 +1,260 @@
+import os
+import json
+import time
+import random
+import asyncio
+import inspect
+import contextvars
+import threading
+import logging
+from concurrent.futures import ThreadPoolExecutor, wait as wait_futures
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from file_lock import file_lock
+
+try:
+    from google.api_core import exceptions as api_exceptions
+    _RETRYABLE_EXCEPTIONS: Tuple[type, ...] = (
+        api_exceptions.TooManyRequests,
+        api_exceptions.ResourceExhausted,
+        api_exceptions.ServiceUnavailable,
+        api_exceptions.InternalServerError,
+        api_exceptions.BadGateway,
+        api_exceptions.GatewayTimeout,
+        api_exceptions.DeadlineExceeded,
+    )
+except ImportError:
+    _RETRYABLE_EXCEPTIONS = ()
+
+logger = logging.getLogger(__name__)
+
+# HTTP status codes worth retrying: quota (429) and transient server errors
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+# Requests per second and burst size for each model, e.g.
+# VERTEX_RATE_LIMITS="gemini-2.0-flash-001=5:10,imagegeneration@006=1:4"
+# Quotas are per project and region, so nothing is limited by default: a guessed
+# Imagen limit serializes the concurrent section fan-out. Set the limits from the
+# project's Vertex AI quota page; 429s are retried with backoff either way.
+DEFAULT_RATE_LIMITS: Dict[str, Tuple[float, int]] = {}
+
+# When set, every process on the host shares its token buckets through this directory
+VERTEX_QUOTA_DIR = os.getenv("VERTEX_QUOTA_DIR")
+
+VERTEX_MAX_RETRIES = int(os.getenv("VERTEX_MAX_RETRIES", "5"))
+VERTEX_BACKOFF_BASE = float(os.getenv("VERTEX_BACKOFF_BASE", "1.0"))
+VERTEX_BACKOFF_MAX = float(os.getenv("VERTEX_BACKOFF_MAX", "30.0"))
+# Overall time budget for one call, including waiting for quota and retries;
+# an attempt still running when it runs out is abandoned
+VERTEX_CALL_TIMEOUT = float(os.getenv("VERTEX_CALL_TIMEOUT", "300"))
+# Threads running blocking calls for call_with_retry, so they can be timed out
+VERTEX_CALL_WORKERS = int(os.getenv("VERTEX_CALL_WORKERS", "16"))
+
+
+class QuotaDeadlineExceeded(TimeoutError):
+    """Raised when a call can't get quota or a successful response before its deadline."""
+
+
+_call_executor = ThreadPoolExecutor(max_workers=max(1, VERTEX_CALL_WORKERS), thread_name_prefix="vertex-call")
+
+
+def parse_rate_limits(spec: Optional[str]) -> Dict[str, Tuple[float, int]]:
+    """Parse "model=rate[:burst],..." into {model: (rate, burst)}."""
+    limits = dict(DEFAULT_RATE_LIMITS)
+    if not spec:
+        return limits
+    for item in spec.split(","):
+        if "=" not in item:
+            continue
+        model_name, value = item.split("=", 1)
+        rate, _, burst = value.partition(":")
+        limits[model_name.strip()] = (float(rate), int(burst) if burst else max(1, int(float(rate))))
+    return limits
+
+
+RATE_LIMITS = parse_rate_limits(os.getenv("VERTEX_RATE_LIMITS"))
+
+
+class TokenBucket:
+    """
+    Token bucket limiting how often a model may be called.
+
+    With a state_path the bucket's state lives in a small JSON file guarded by a
+    file lock, so all processes on the host draw from the same quota.
+    """
+
+    def __init__(self, rate: float, burst: int, state_path: Optional[str] = None):
+        self.rate = rate
+        self.burst = burst
+        self.state_path = state_path
+        self._lock = threading.Lock()
+        self._tokens = float(burst)
+        self._updated = time.time()
+
+    def _take(self, tokens: float, updated: float) -> Tuple[float, float, float]:
+        """Refill, then try to take one token; returns (tokens, updated, seconds to wait)."""
+        now = time.time()
+        tokens = min(float(self.burst), tokens + (now - updated) * self.rate)
+        if tokens >= 1.0:
+            return tokens - 1.0, now, 0.0
+        return tokens, now, (1.0 - tokens) / self.rate
+
+    def try_acquire(self) -> float:
+        """Take a token if one is available; otherwise return how long to wait for one."""
+        if not self.state_path:
+            with self._lock:
+                self._tokens, self._updated, wait = self._take(self._tokens, self._updated)
+                return wait
+
+        with file_lock(self.state_path + ".lock"):
+            try:
+                with open(self.state_path, "r", encoding="utf-8") as f:
+                    state = json.load(f)
+                tokens, updated = float(state["tokens"]), float(state["updated"])
+            except (FileNotFoundError, ValueError, KeyError):
+                tokens, updated = float(self.burst), time.time()
+            tokens, updated, wait = self._take(tokens, updated)
+            with open(self.state_path, "w", encoding="utf-8") as f:
+                json.dump({"tokens": tokens, "updated": updated}, f)
+            return wait
+
+    def acquire(self, deadline: Optional[float] = None):
+        """Block until a token is available or the (time.monotonic) deadline passes."""
+        while True:
+            wait = self.try_acquire()
+            if wait <= 0:
+                return
+            if deadline is not None and time.monotonic() + wait > deadline:
+                raise QuotaDeadlineExceeded("Deadline exceeded while waiting for model quota")
+            time.sleep(wait)
+
+    async def acquire_async(self, deadline: Optional[float] = None):
+        """Like acquire, but waits without blocking the event loop."""
+        while True:
+            wait = self.try_acquire()
+            if wait <= 0:
+                return
+            if deadline is not None and time.monotonic() + wait > deadline:
+                raise QuotaDeadlineExceeded("Deadline exceeded while waiting for model quota")
+            await asyncio.sleep(wait)
+
+
+_buckets: Dict[str, TokenBucket] = {}
+_buckets_lock = threading.Lock()
+
+
+def get_bucket(model_name: str) -> Optional[TokenBucket]:
+    """Return the shared token bucket for a model, or None if it isn't rate limited."""
+    if model_name not in RATE_LIMITS:
+        return None
+    with _buckets_lock:
+        bucket = _buckets.get(model_name)
+        if bucket is None:
+            rate, burst = RATE_LIMITS[model_name]
+            state_path = None
+            if VERTEX_QUOTA_DIR:
+                os.makedirs(VERTEX_QUOTA_DIR, exist_ok=True)
+                safe_name = "".join(c if c.isalnum() else "_" for c in model_name)
+                state_path = os.path.join(VERTEX_QUOTA_DIR, f"{safe_name}.bucket")
+            bucket = _buckets[model_name] = TokenBucket(rate, burst, state_path)
+        return bucket
+
+
+def is_retryable(error: BaseException) -> bool:
+    """Whether an error from a model call is worth retrying (quota, transient server or network error)."""
+    if isinstance(error, TimeoutError) and not isinstance(error, QuotaDeadlineExceeded):
+        # e.g. a socket read timeout inside the client library
+        return True
+    if _RETRYABLE_EXCEPTIONS and isinstance(error, _RETRYABLE_EXCEPTIONS):
+        return True
+    code = getattr(error, "code", None) or getattr(error, "status_code", None)
+    if callable(code):
+        # grpc errors expose code() returning a StatusCode enum
+        code = getattr(code(), "name", None)
+        return code in ("RESOURCE_EXHAUSTED", "UNAVAILABLE", "INTERNAL", "DEADLINE_EXCEEDED")
+    try:
+        return int(code) in RETRYABLE_STATUS_CODES
+    except (TypeError, ValueError):
+        return False
+
+
+def backoff_delay(attempt: int) -> float:
+    """Exponential backoff with full jitter for the given retry attempt (0-based)."""
+    return random.uniform(0, min(VERTEX_BACKOFF_MAX, VERTEX_BACKOFF_BASE * (2 ** attempt)))
+
+
+def _retry_delay(model_name: str, error: BaseException, attempt: int, max_retries: int, deadline: float) -> float:
+    """Return how long to sleep before retrying, or re-raise if we shouldn't retry."""
+    if not is_retryable(error) or attempt >= max_retries:
+        raise error
+    delay = backoff_delay(attempt)
+    if time.monotonic() + delay > deadline:
+        raise error
+    logger.warning(f"{model_name} call failed ({error}); retry {attempt + 1}/{max_retries} in {delay:.1f}s")
+    return delay
+
+
+def call_with_retry(model_name: str, fn: Callable[..., Any], *args: Any, timeout: float = VERTEX_CALL_TIMEOUT,
+                    max_retries: int = VERTEX_MAX_RETRIES, **kwargs: Any) -> Any:
+    """
+    Call a model method under its rate limit, retrying retryable errors with backoff.
+
+    Args:
+        model_name (str): Model the call is billed against; selects the token bucket.
+        fn (callable): The model method to call, e.g. model.generate_content.
+        timeout (float): Overall budget in seconds for quota waits, attempts and retries.
+            An attempt still running when it runs out is abandoned (its result is
+            discarded) and QuotaDeadlineExceeded is raised.
+        max_retries (int): Retries after the first attempt.
+    """
+    deadline = time.monotonic() + timeout
+    bucket = get_bucket(model_name)
+    attempt = 0
+    while True:
+        if bucket:
+            bucket.acquire(deadline)
+        # Run in the caller's context so tracing spans still attach to its request
+        future = _call_executor.submit(contextvars.copy_context().run, fn, *args, **kwargs)
+        # Wait separately from fetching the result: a TimeoutError raised by the call
+        # itself is an ordinary retryable error, not the deadline running out
+        done, _ = wait_futures([future], timeout=max(0.0, deadline - time.monotonic()))
+        if not done:
+            future.cancel()
+            raise QuotaDeadlineExceeded(f"{model_name} call did not finish within {timeout:g}s")
+        try:
+            return future.result()
+        except Exception as e:
+            time.sleep(_retry_delay(model_name, e, attempt, max_retries, deadline))
+            attempt += 1
+
+
+async def acall_with_retry(model_name: str, fn: Callable[..., Any], *args: Any, timeout: float = VERTEX_CALL_TIMEOUT,
+                           max_retries: int = VERTEX_MAX_RETRIES, **kwargs: Any) -> Any:
+    """
+    Async version of call_with_retry.
+
+    Coroutine functions are awaited directly; blocking functions run in a worker
+    thread so the event loop stays free while they wait on the network. An
+    attempt still running when the timeout budget runs out is cancelled.
+    """
+    deadline = time.monotonic() + timeout
+    bucket = get_bucket(model_name)
+    attempt = 0
+    while True:
+        if bucket:
+            await bucket.acquire_async(deadline)
+        call = fn(*args, **kwargs) if inspect.iscoroutinefunction(fn) else asyncio.to_thread(fn, *args, **kwargs)
+        task = asyncio.ensure_future(call)
+        try:
+            done, _ = await asyncio.wait({task}, timeout=max(0.0, deadline - time.monotonic()))
+        except asyncio.CancelledError:
+            task.cancel()
+            raise
+        if not done:
+            task.cancel()
+            raise QuotaDeadlineExceeded(f"{model_name} call did not finish within {timeout:g}s")
+        try:
+            return task.result()
+        except Exception as e:
+            await asyncio.sleep(_retry_delay(model_name, e, attempt, max_retries, deadline))
+            attempt += 1